@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import PHOTO_TIMEOUT, PHOTO_COALESCE_WINDOW, VIDEO_TIMEOUT_MARGIN
+from camera_handler import CameraHandler, CapturedPhoto
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+class AsyncCameraHandler:
+    """Awaitable facade over CameraHandler.
+
+    Camera work runs on a single dedicated worker thread, so the event loop
+    keeps processing other updates while a capture is in progress.
+
+    Photo requests are single-flight: requests arriving while a capture is
+    running, or within PHOTO_COALESCE_WINDOW seconds after it finished,
+    receive that capture's result instead of taking a new frame.
+    """
+
+    def __init__(self, camera: CameraHandler):
+        self.camera = camera
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera")
+        self._flights = {}       # capture method name -> shared in-flight task
+        self._last_results = {}  # capture method name -> (monotonic finish time, result)
+
+    async def _run(self, func, *args, timeout: float = None, stop_event: threading.Event = None):
+        """Run func on the camera thread and await its result.
+
+        On cancellation or timeout a job that has not started yet is dropped,
+        and a running one is asked to stop through stop_event.
+        """
+        future = self._executor.submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if not future.cancel() and stop_event is not None:
+                stop_event.set()
+            raise
+
+    async def _single_flight(self, func, timeout: float):
+        """Run func on the camera thread, sharing a running or recent result."""
+        last = self._last_results.get(func.__name__)
+        if last is not None:
+            finished_at, result = last
+            if time.monotonic() - finished_at <= PHOTO_COALESCE_WINDOW:
+                logger.debug(f"Reusing {func.__name__} result from {time.monotonic() - finished_at:.2f}s ago")
+                CACHE_LOOKUPS.labels('photo_coalesce', 'hit').inc()
+                return result
+
+        task = self._flights.get(func.__name__)
+        CACHE_LOOKUPS.labels('photo_coalesce', 'miss' if task is None else 'hit').inc()
+        if task is None:
+            task = asyncio.ensure_future(self._run(func, timeout=PHOTO_TIMEOUT))
+            task.add_done_callback(lambda t: self._flight_done(func.__name__, t))
+            self._flights[func.__name__] = task
+        else:
+            logger.debug(f"Joining {func.__name__} in progress")
+        # Shielded so one waiter timing out or being cancelled does not abort the shared capture
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _flight_done(self, name: str, task: asyncio.Task):
+        """Clear the in-flight capture and remember a successful result for PHOTO_COALESCE_WINDOW seconds."""
+        del self._flights[name]
+        if task.cancelled() or task.exception() is not None:
+            return
+        finished_at = time.monotonic()
+        self._last_results[name] = (finished_at, task.result())
+        # Drop the result once it can no longer be reused, so its JPEG is not kept in memory
+        asyncio.get_running_loop().call_later(PHOTO_COALESCE_WINDOW, self._forget_result, name, finished_at)
+
+    def _forget_result(self, name: str, finished_at: float):
+        last = self._last_results.get(name)
+        if last is not None and last[0] == finished_at:
+            del self._last_results[name]
+
+    async def capture_photo(self, timeout: float = PHOTO_TIMEOUT) -> str:
+        """Capture a photo to disk without blocking the event loop, joining any capture in flight."""
+        return await self._single_flight(self.camera.capture_photo, timeout)
+
+    async def capture_photo_data(self, timeout: float = PHOTO_TIMEOUT) -> CapturedPhoto:
+        """Capture a photo into memory, joining any capture in flight."""
+        return await self._single_flight(self.camera.capture_photo_data, timeout)
+
+    async def capture_snapshot(self, timeout: float = PHOTO_TIMEOUT) -> bytes:
+        """JPEG of the current video frame, waiting for the camera and joining any snapshot in flight."""
+        return await self._single_flight(self._snapshot_now, timeout)
+
+    def _snapshot_now(self) -> bytes:
+        return self.camera.capture_snapshot(wait=True)
+
+    async def capture_burst(self, count: int, keep: int = 1, timeout: float = PHOTO_TIMEOUT) -> list:
+        """Capture a burst and return its keep sharpest frames as CapturedPhoto tuples.
+
+        The frames are encoded after the camera thread is free for the next job.
+        """
+        photos = await self._run(self.camera.start_burst, count, keep, timeout=timeout)
+        return list(await asyncio.gather(*(asyncio.wrap_future(photo) for photo in photos)))
+
+    async def record_video(self, duration: int, timeout: float = None) -> str:
+        """Record a video without blocking the event loop."""
+        if timeout is None:
+            timeout = duration + VIDEO_TIMEOUT_MARGIN
+        stop_event = threading.Event()
+        return await self._run(
+            self.camera.record_video, duration, stop_event,
+            timeout=timeout, stop_event=stop_event
+        )
+
+    async def start_preroll(self):
+        """Start the pre-roll ring buffer on the camera thread."""
+        await self._run(self.camera.start_preroll, timeout=PHOTO_TIMEOUT)
+
+    async def save_preroll(self, seconds: float) -> str:
+        """Write the last seconds of pre-roll footage; does not wait for the camera thread."""
+        return await asyncio.to_thread(self.camera.save_preroll, seconds)
+
+    def close(self):
+        """Stop the worker thread and close the camera session."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.camera.close()
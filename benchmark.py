@@ -0,0 +1,684 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from config import (
+    FILE_DATE_FORMAT, PHOTO_SIZE, VIDEO_DIR, IMAGE_DIR, MIN_VIDEO_DURATION, MAX_VIDEO_DURATION,
+    SCHEDULER_MAX_QUEUE, SCHEDULER_MAX_JOBS_PER_USER, SCHEDULER_USER_RATE, SCHEDULER_USER_BURST,
+    SCHEDULER_PHOTO_ESTIMATE, SCHEDULER_BURST_ESTIMATE, SCHEDULER_VIDEO_OVERHEAD, MOTION_LORES_SIZE,
+    MOTION_DOWNSCALE, MOTION_FPS,
+    BROADCAST_CONCURRENCY, BROADCAST_RATE, LOG_QUEUE_SIZE, BURST_FRAMES, BURST_SCORE_STEP,
+    SNAPSHOT_FPS, SNAPSHOT_MAX_AGE, SNAPSHOT_IDLE_TIMEOUT
+)
+
+
+def _timed(func, repeat: int = 1) -> float:
+    """Return the median wall time of func in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _percentile(samples: list, percent: float) -> float:
+    """Nearest-rank percentile of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))]
+
+
+def _print_results(results: dict):
+    for key, value in results.items():
+        print(f"{key:<22} {value:.3f}" if isinstance(value, float) else f"{key:<22} {value}")
+
+
+def bench_file_index(args):
+    """Compare glob + getctime sorting with the in-memory MediaIndex."""
+    from file_manager import MediaIndex
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        start = datetime(2024, 1, 1)
+        for i in range(args.files):
+            name = (start + timedelta(seconds=i)).strftime(FILE_DATE_FORMAT)
+            (directory / f"{name}.jpg").touch()
+
+        def glob_latest():
+            return sorted(directory.glob("*.jpg"), key=os.path.getctime, reverse=True)[:4]
+
+        index = MediaIndex(directory, "*.jpg")
+        results = {
+            'files': args.files,
+            'glob_sort_latest_ms': _timed(glob_latest, args.repeat),
+            'index_build_ms': _timed(index.rescan, args.repeat),
+            'index_latest_ms': _timed(lambda: index.latest(4), args.repeat),
+        }
+
+        new_file = directory / f"{(start + timedelta(seconds=args.files)).strftime(FILE_DATE_FORMAT)}.jpg"
+        new_file.touch()
+        results['index_add_ms'] = _timed(lambda: index.add(new_file))
+        results['index_remove_ms'] = _timed(lambda: index.remove(new_file))
+        assert index.latest(1)[0] != new_file
+
+    _print_results(results)
+
+
+class _SimulatedCamera:
+    """Stands in for AsyncCameraHandler: photos sleep and share a capture in flight, videos sleep."""
+
+    def __init__(self, photo_seconds: float, speed: float):
+        self.photo_seconds = photo_seconds
+        self.speed = speed
+        self.photos = 0
+        self._flight = None
+
+    async def capture_photo(self):
+        if self._flight is None:
+            self.photos += 1
+            self._flight = asyncio.ensure_future(asyncio.sleep(self.photo_seconds / self.speed))
+            self._flight.add_done_callback(lambda _: setattr(self, '_flight', None))
+        await asyncio.shield(self._flight)
+
+    async def record_video(self, duration: int):
+        await asyncio.sleep((duration + 1) / self.speed)  # one second to set up and finish
+
+
+async def _scheduler_load(args) -> dict:
+    from camera_scheduler import CameraScheduler, CameraBusyError
+
+    rng = random.Random(args.seed)
+    camera = _SimulatedCamera(args.photo_seconds, args.speed)
+    # The scheduler runs on the real clock, so its rates and estimates are scaled to simulated time
+    scheduler = CameraScheduler(
+        max_queue=args.max_queue, max_jobs_per_user=SCHEDULER_MAX_JOBS_PER_USER,
+        user_rate=SCHEDULER_USER_RATE * args.speed, user_burst=SCHEDULER_USER_BURST,
+        photo_estimate=SCHEDULER_PHOTO_ESTIMATE / args.speed,
+        burst_estimate=SCHEDULER_BURST_ESTIMATE / args.speed,
+        video_overhead=SCHEDULER_VIDEO_OVERHEAD / args.speed
+    )
+    scheduler.start()
+    waits = {'photo': [], 'video': []}
+    eta_errors = []
+    rejected = {'QueueFullError': 0, 'RateLimitedError': 0}
+
+    async def request(user_id: int, kind: str):
+        duration = rng.randint(MIN_VIDEO_DURATION, MAX_VIDEO_DURATION) if kind == 'video' else 0
+        run = camera.capture_photo if kind == 'photo' else (lambda: camera.record_video(duration))
+        try:
+            job = scheduler.submit(kind, user_id, run, duration / args.speed)
+        except CameraBusyError as e:
+            rejected[type(e).__name__] += 1
+            return
+        await job
+        wait = (job.started_at - job.submitted_at) * args.speed
+        waits[kind].append(wait)
+        eta_errors.append(abs(job.eta * args.speed - wait))
+
+    async def user(user_id: int):
+        tasks = []
+        for _ in range(args.requests):
+            await asyncio.sleep(rng.expovariate(args.rate) / args.speed)
+            kind = 'photo' if rng.random() < args.photo_share else 'video'
+            tasks.append(asyncio.ensure_future(request(user_id, kind)))
+        await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(user_id) for user_id in range(args.users)))
+    elapsed = (time.perf_counter() - start) * args.speed
+    await scheduler.stop()
+
+    results = {
+        'users': args.users,
+        'submitted': args.users * args.requests,
+        'completed': sum(len(samples) for samples in waits.values()),
+        'rejected_queue_full': rejected['QueueFullError'],
+        'rejected_rate_limit': rejected['RateLimitedError'],
+        'photo_captures': camera.photos,
+        'simulated_seconds': elapsed,
+    }
+    for kind, samples in waits.items():
+        if samples:
+            for percent in (50, 95, 99):
+                results[f"{kind}_wait_p{percent}_s"] = _percentile(samples, percent)
+    if eta_errors:
+        results['eta_error_p50_s'] = _percentile(eta_errors, 50)
+    return results
+
+
+def bench_metrics(args):
+    """Cost of the timing spans and counters left on in production."""
+    from metrics import MetricsRegistry, span, CACHE_LOOKUPS
+
+    def spans():
+        for _ in range(args.iterations):
+            with span('benchmark'):
+                pass
+
+    def counters():
+        for _ in range(args.iterations):
+            CACHE_LOOKUPS.labels('benchmark', 'hit').inc()
+
+    registry = MetricsRegistry()
+    for stage in range(20):
+        registry.histogram('benchmark_seconds', 'benchmark', ('stage',)).labels(str(stage)).observe(0.1)
+    _print_results({
+        'span_us': _timed(spans, args.repeat) * 1000 / args.iterations,
+        'counter_inc_us': _timed(counters, args.repeat) * 1000 / args.iterations,
+        'render_20_histograms_ms': _timed(registry.render, args.repeat),
+    })
+
+
+def bench_scheduler(args):
+    """Simulated camera load through CameraScheduler, reporting queue waits."""
+    _print_results(asyncio.run(_scheduler_load(args)))
+
+
+def bench_motion(args):
+    """Motion detector throughput and detections on recorded or synthetic lores frames."""
+    import numpy as np
+    from motion import MotionDetector
+    from synthetic_media import synthetic_motion_frames
+
+    if args.frames:
+        frames = np.load(args.frames)
+        moving = tuple(args.expect) if args.expect else None
+    else:
+        frames, moving = synthetic_motion_frames(args.count, tuple(args.size), args.seed)
+    detector = MotionDetector(downscale=args.downscale)
+    triggered = []
+    durations = []
+    for index, frame in enumerate(frames):
+        started = time.perf_counter()
+        detector.process(frame)
+        durations.append(time.perf_counter() - started)
+        if detector.triggered:
+            triggered.append(index)
+
+    per_frame_ms = statistics.median(durations) * 1000
+    results = {
+        'frames': len(frames),
+        'frame_size': "x".join(map(str, frames.shape[:0:-1])),
+        'frame_p50_ms': per_frame_ms,
+        'frame_p95_ms': _percentile(durations, 95) * 1000,
+        'max_fps': 1000 / per_frame_ms,
+        'triggered_frames': len(triggered),
+    }
+    if moving is not None:
+        first, last = moving
+        results['false_triggers'] = sum(1 for index in triggered if not first <= index < last + detector.trigger_frames)
+        hits = [index for index in triggered if first <= index]
+        results['detection_delay_frames'] = hits[0] - first if hits else "missed"
+    _print_results(results)
+
+
+def bench_motion_record(args):
+    """Record lores frames from the camera to a .npy file for the motion benchmark."""
+    import numpy as np
+    from camera_handler import CameraHandler
+
+    camera = CameraHandler()
+    frames = []
+    try:
+        while len(frames) < args.count:
+            started = time.monotonic()
+            frame = camera.capture_lores()
+            if frame is not None:
+                frames.append(np.array(frame))
+            time.sleep(max(0.0, 1 / args.fps - (time.monotonic() - started)))
+    finally:
+        camera.close()
+    np.save(args.output, np.stack(frames))
+    print(f"Saved {len(frames)} frames to {args.output}")
+
+
+def bench_burst(args):
+    """Time to score a burst for sharpness, and whether the sharpest frame wins, on stored or synthetic frames."""
+    import numpy as np
+    from sharpness import SharpestFrames
+    from synthetic_media import synthetic_burst_frames
+
+    if args.frames:
+        frames = np.load(args.frames)
+        sharpest = args.expect
+    else:
+        frames, sharpest = synthetic_burst_frames(args.count, tuple(args.size), args.seed)
+    results = {'frames': len(frames), 'frame_size': "x".join(map(str, frames.shape[2:0:-1]))}
+    for step in sorted({1, args.step}):
+        durations = []
+        for _ in range(args.repeat):
+            selector = SharpestFrames(1, step)
+            started = time.perf_counter()
+            for frame in frames:
+                selector.add(frame)
+            durations.append(time.perf_counter() - started)
+        (_, picked, _), = selector.best()
+        results[f'step{step}_burst_ms'] = statistics.median(durations) * 1000
+        results[f'step{step}_frame_ms'] = results[f'step{step}_burst_ms'] / len(frames)
+        results[f'step{step}_picked'] = picked
+    if sharpest is not None:
+        results['sharpest'] = sharpest
+    _print_results(results)
+
+
+def bench_snapshot(args):
+    """Hit rate and served age of the snapshot cache for sessions of requests separated by idle gaps.
+
+    All times are divided by --speed to run faster than real time; results are in real-time seconds.
+    """
+    from snapshot import SnapshotCache
+
+    rng = random.Random(args.seed)
+    captures = []
+
+    def frame_source():
+        time.sleep(args.capture_time / args.speed)
+        if rng.random() < args.busy_share:
+            return None
+        captures.append(time.monotonic())
+        return b"jpeg"
+
+    cache = SnapshotCache(frame_source, args.fps * args.speed, args.max_age / args.speed,
+                          args.idle_timeout / args.speed)
+    cache.start()
+    ages = []
+    started = time.monotonic()
+    try:
+        for _ in range(args.sessions):
+            for _ in range(args.requests):
+                snapshot = cache.get()
+                if snapshot is not None:
+                    ages.append(snapshot[1] * args.speed)
+                time.sleep(rng.expovariate(1 / args.request_interval) / args.speed)
+            time.sleep(args.gap / args.speed)
+    finally:
+        cache.stop()
+    elapsed = (time.monotonic() - started) * args.speed
+    _print_results({
+        'requests': cache.hits + cache.misses,
+        'hit_rate': cache.hits / (cache.hits + cache.misses),
+        'served_age_p50_s': _percentile(ages, 50) if ages else "n/a",
+        'served_age_max_s': max(ages) if ages else "n/a",
+        'frames_captured': len(captures),
+        'frames_always_on': int(elapsed * args.fps),
+        'skipped_busy': cache.skipped,
+    })
+
+
+async def _broadcast(args) -> dict:
+    from telegram import Bot
+    from broadcast import Broadcaster
+    from fake_telegram import FakeBotAPI
+    from media_cache import FileIdCache
+    from subscriptions import SubscriptionStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photo = Path(tmp) / "photo.jpg"
+        photo.write_bytes(os.urandom(args.photo_bytes))
+        subscriptions = SubscriptionStore(Path(tmp) / "subscriptions.db")
+        chats = list(range(1, args.subscribers + 1))
+        for chat_id in chats:
+            subscriptions.add(chat_id, 'photos')
+        blocked = set(random.Random(args.seed).sample(chats, int(len(chats) * args.blocked_share)))
+        api = FakeBotAPI(bandwidth=args.bandwidth, latency=args.latency,
+                         global_rate=args.api_rate, chat_rate=args.api_chat_rate, blocked=blocked)
+        bot = Bot("123:benchmark", request=api, get_updates_request=FakeBotAPI())
+        await bot.initialize()
+        file_ids = FileIdCache(Path(tmp) / "file_ids.db")
+        broadcaster = Broadcaster(bot, subscriptions, file_ids, concurrency=args.concurrency, rate=args.rate)
+        try:
+            results = await broadcaster.broadcast('photos', photo, 'photo')
+            # A second broadcast right away runs into the per-chat limits
+            repeat = await broadcaster.broadcast('photos', photo, 'photo')
+        finally:
+            await bot.shutdown()
+            subscriptions.close()
+            file_ids.close()
+
+    uploads = [size for method, _, size in api.calls if size]
+    one_upload = args.latency + args.photo_bytes / args.bandwidth
+    return {
+        'subscribers': args.subscribers,
+        'sent': results['sent'],
+        'unsubscribed': results['unsubscribed'],
+        'failed': results['failed'],
+        'seconds': results['seconds'],
+        'sends_per_second': results['sent'] / results['seconds'],
+        'uploads': len(uploads),
+        'uploaded_bytes': sum(uploads),
+        'rejected_429': api.rejected[429],
+        'repeat_seconds': repeat['seconds'],
+        'repeat_sent': repeat['sent'],
+        'upload_per_chat_s': one_upload * (args.subscribers - len(blocked)),
+    }
+
+
+def bench_broadcast(args):
+    """One photo to many subscribers through a fake Bot API with Telegram-like flood limits."""
+    _print_results(asyncio.run(_broadcast(args)))
+
+
+def _logging_handlers(directory: Path, log_format: str, write_delay: float) -> list:
+    """The console and file handlers of the bot, with the console going nowhere.
+
+    write_delay seconds are added to every file write, like a slow SD card.
+    """
+    import logging
+    from logging.handlers import RotatingFileHandler
+    from logger_config import JsonFormatter, TEXT_FORMAT
+
+    class SlowFileHandler(RotatingFileHandler):
+        def emit(self, record):
+            time.sleep(write_delay)
+            super().emit(record)
+
+    formatter = JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    console_handler = logging.StreamHandler(open(os.devnull, 'w'))
+    console_handler.setLevel(logging.INFO)
+    file_handler = (SlowFileHandler if write_delay else RotatingFileHandler)(directory / 'bot.log', maxBytes=10 * 1024 * 1024, backupCount=5,
+                                       encoding='utf-8')
+    file_handler.setLevel(logging.DEBUG)
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+    return [console_handler, file_handler]
+
+
+def bench_logging(args):
+    """Latency of a logging call with the handlers run inline versus behind the log queue."""
+    import logging
+    from logger_config import DROPPED_RECORDS, setup_logging, stop_logging
+
+    logger = logging.getLogger('benchmark')
+    root = logging.getLogger()
+
+    def measure() -> list:
+        samples = []
+        for index in range(args.records):
+            started = time.perf_counter()
+            if index % 10:
+                logger.debug("Captured frame %d in %.1f ms", index, 12.5)
+            else:
+                logger.info(f"Photo sent successfully: /images/{index}.jpg")
+            samples.append(time.perf_counter() - started)
+            if args.pause:
+                time.sleep(args.pause)
+        return samples
+
+    results = {'records': args.records}
+    with tempfile.TemporaryDirectory() as tmp:
+        handlers = _logging_handlers(Path(tmp), args.format, args.write_delay)
+        root.setLevel(logging.DEBUG)
+        for handler in handlers:
+            root.addHandler(handler)
+        try:
+            inline = measure()
+        finally:
+            for handler in handlers:
+                root.removeHandler(handler)
+                handler.close()
+
+        dropped = DROPPED_RECORDS.value
+        setup_logging(_logging_handlers(Path(tmp), args.format, args.write_delay), args.format, {}, args.queue_size)
+        try:
+            queued = measure()
+        finally:
+            started = time.perf_counter()
+            stop_logging()
+            results['queue_drain_ms'] = (time.perf_counter() - started) * 1000
+
+    for name, samples in (('inline', inline), ('queued', queued)):
+        for percent in (50, 99):
+            results[f"{name}_p{percent}_us"] = _percentile(samples, percent) * 1e6
+        results[f"{name}_max_us"] = max(samples) * 1e6
+    results['queued_dropped'] = DROPPED_RECORDS.value - dropped
+    _print_results(results)
+
+
+# Bot flows: handler name and the message text that triggers it
+BOT_FLOWS = {
+    'photo': ('handle_photo', "📸 Capture Photo"),
+    'video': ('handle_video_duration', str(MIN_VIDEO_DURATION)),
+    'latest-photo': ('handle_latest_photo', "🖼️ Show Latest Photo"),
+    'latest-video': ('handle_latest_video', "🎥 Show Latest Video"),
+}
+
+
+def _message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Bot API JSON of a private text message from user_id."""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"User {user_id}"}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': user_id, 'type': 'private'}, 'from': user,
+        },
+    }
+
+
+async def _bot_load(args) -> list:
+    from telegram import Update
+    from telegram.ext import CallbackContext
+    from bot import PiCameraBot
+    from camera_backend import FakeCameraBackend
+    from fake_telegram import FakeBotAPI, MEDIA_METHODS
+    from synthetic_media import sample_jpeg
+
+    jpeg = sample_jpeg(PHOTO_SIZE)
+    api = FakeBotAPI(bandwidth=args.bandwidth, latency=args.latency)
+    backend = FakeCameraBackend(capture_delay=args.capture_delay, encode_delay=args.encode_delay, jpeg_sample=jpeg)
+    bot = PiCameraBot(backend=backend, request=api)
+    application = bot.application
+    await application.initialize()
+    await bot.post_init(application)
+
+    # Something for the latest-* flows to send even before a capture succeeded
+    name = datetime.now().strftime(FILE_DATE_FORMAT)
+    bot.file_manager.save_in_background(IMAGE_DIR / f"{name}.jpg", jpeg).result()
+    bot.file_manager.save_in_background(VIDEO_DIR / f"{name}_now.mp4", os.urandom(args.video_bytes)).result()
+
+    ids = itertools.count(1)
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            for flow in args.flows:
+                handler_name, text = BOT_FLOWS[flow]
+                handler = getattr(bot, handler_name)
+                latencies = []
+                failed = 0
+                slots = asyncio.Semaphore(concurrency)
+
+                async def request():
+                    nonlocal failed
+                    async with slots:
+                        user_id = next(ids)
+                        update = Update.de_json(_message_update(user_id, user_id, text), application.bot)
+                        context = CallbackContext.from_update(update, application)
+                        started = time.perf_counter()
+                        await handler(update, context)
+                        if MEDIA_METHODS.intersection(api.sent.pop(user_id, ())):
+                            latencies.append((time.perf_counter() - started) * 1000)
+                        else:
+                            failed += 1
+
+                started = time.perf_counter()
+                await asyncio.gather(*(request() for _ in range(args.requests)))
+                elapsed = time.perf_counter() - started
+                result = {
+                    'flow': flow, 'concurrency': concurrency, 'requests': args.requests,
+                    'completed': len(latencies), 'failed': failed,
+                    'throughput_rps': len(latencies) / elapsed,
+                }
+                for percent in (50, 95, 99):
+                    result[f"p{percent}_ms"] = _percentile(latencies, percent) if latencies else None
+                results.append(result)
+                print(json.dumps(result))
+    finally:
+        await bot.post_shutdown(application)
+        await application.shutdown()
+        bot.close()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: list, baseline_file: str):
+    """Print p95 latency and throughput next to a stored run."""
+    baseline = {
+        (result['flow'], result['concurrency']): result
+        for result in json.loads(Path(baseline_file).read_text())['results']
+    }
+    print(f"{'flow':<14}{'conc':>6}{'p95 ms':>12}{'was':>12}{'rps':>10}{'was':>10}")
+    for result in results:
+        old = baseline.get((result['flow'], result['concurrency']))
+        if old is None:
+            continue
+        print(f"{result['flow']:<14}{result['concurrency']:>6}"
+              f"{result['p95_ms'] or 0:>12.1f}{old['p95_ms'] or 0:>12.1f}"
+              f"{result['throughput_rps']:>10.2f}{old['throughput_rps']:>10.2f}")
+
+
+def bench_bot_load(args):
+    """Drive PiCameraBot handlers with synthetic updates, a fake camera and a fake Bot API."""
+    if 'PICAMERA_BOT_DATA_DIR' not in os.environ:
+        # Run in a child process whose media and databases live in a scratch directory
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, 'PICAMERA_BOT_DATA_DIR': tmp}
+            sys.exit(subprocess.run([sys.executable, *sys.argv], env=env).returncode)
+
+    results = asyncio.run(_bot_load(args))
+    report = {
+        'commit': _git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'parameters': {key: value for key, value in vars(args).items() if key != 'func'},
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+    if args.compare:
+        _compare(results, args.compare)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pi Camera Bot benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    file_index = subparsers.add_parser("file-index", help="latest-file lookups on large media directories")
+    file_index.add_argument("--files", type=int, default=20000)
+    file_index.add_argument("--repeat", type=int, default=5)
+    file_index.set_defaults(func=bench_file_index)
+
+    metrics = subparsers.add_parser("metrics", help="overhead of timing spans and counters")
+    metrics.add_argument("--iterations", type=int, default=100000)
+    metrics.add_argument("--repeat", type=int, default=5)
+    metrics.set_defaults(func=bench_metrics)
+
+    scheduler = subparsers.add_parser("scheduler", help="queue waits of the camera job scheduler under load")
+    scheduler.add_argument("--users", type=int, default=20)
+    scheduler.add_argument("--requests", type=int, default=10, help="requests per user")
+    scheduler.add_argument("--rate", type=float, default=0.01, help="requests per second per user")
+    scheduler.add_argument("--photo-share", type=float, default=0.8)
+    scheduler.add_argument("--photo-seconds", type=float, default=1.5, help="simulated capture time")
+    scheduler.add_argument("--max-queue", type=int, default=SCHEDULER_MAX_QUEUE)
+    scheduler.add_argument("--speed", type=float, default=50, help="simulated seconds per real second")
+    scheduler.add_argument("--seed", type=int, default=1)
+    scheduler.set_defaults(func=bench_scheduler)
+
+    bot_load = subparsers.add_parser("bot-load", help="latency and throughput of the bot's flows under concurrency")
+    bot_load.add_argument("--flows", nargs="+", choices=BOT_FLOWS, default=list(BOT_FLOWS))
+    bot_load.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    bot_load.add_argument("--requests", type=int, default=50, help="requests per flow and concurrency level")
+    bot_load.add_argument("--capture-delay", type=float, default=0.3, help="seconds per still capture")
+    bot_load.add_argument("--encode-delay", type=float, default=0.2, help="seconds to encode a still or finish a video")
+    bot_load.add_argument("--bandwidth", type=float, default=2_000_000, help="upload bytes per second")
+    bot_load.add_argument("--latency", type=float, default=0.05, help="seconds per Bot API call")
+    bot_load.add_argument("--video-bytes", type=int, default=4 * 1024 * 1024, help="size of the seeded latest video")
+    bot_load.add_argument("--output", help="write the results to this JSON file")
+    bot_load.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    bot_load.set_defaults(func=bench_bot_load)
+
+    motion = subparsers.add_parser("motion", help="motion detector speed and detections on lores frames")
+    motion.add_argument("--frames", help=".npy file of recorded frames (see motion-record); default synthetic")
+    motion.add_argument("--expect", type=int, nargs=2, metavar=("FIRST", "LAST"),
+                        help="frame range that contains motion in the recorded frames")
+    motion.add_argument("--count", type=int, default=600, help="synthetic frames")
+    motion.add_argument("--size", type=int, nargs=2, default=list(MOTION_LORES_SIZE), metavar=("WIDTH", "HEIGHT"))
+    motion.add_argument("--downscale", type=int, default=MOTION_DOWNSCALE)
+    motion.add_argument("--seed", type=int, default=1)
+    motion.set_defaults(func=bench_motion)
+
+    motion_record = subparsers.add_parser("motion-record", help="record lores frames from the camera for the motion benchmark")
+    motion_record.add_argument("output", help=".npy file to write")
+    motion_record.add_argument("--count", type=int, default=300)
+    motion_record.add_argument("--fps", type=float, default=MOTION_FPS)
+    motion_record.set_defaults(func=bench_motion_record)
+
+    burst = subparsers.add_parser("burst", help="sharpness scoring of burst frames and picking the sharpest")
+    burst.add_argument("--frames", help=".npy file of stored frames, shape (count, height, width[, 3]); default synthetic")
+    burst.add_argument("--expect", type=int, help="index of the sharpest of the stored frames")
+    burst.add_argument("--count", type=int, default=BURST_FRAMES, help="synthetic frames")
+    burst.add_argument("--size", type=int, nargs=2, default=list(PHOTO_SIZE), metavar=("WIDTH", "HEIGHT"))
+    burst.add_argument("--step", type=int, default=BURST_SCORE_STEP, help="score every n-th pixel")
+    burst.add_argument("--repeat", type=int, default=3)
+    burst.add_argument("--seed", type=int, default=1)
+    burst.set_defaults(func=bench_burst)
+
+    snapshot = subparsers.add_parser("snapshot", help="hit rate and age of instant snapshots, and frames captured")
+    snapshot.add_argument("--sessions", type=int, default=3, help="bursts of requests separated by --gap")
+    snapshot.add_argument("--requests", type=int, default=20, help="requests per session")
+    snapshot.add_argument("--request-interval", type=float, default=10, help="mean seconds between requests")
+    snapshot.add_argument("--gap", type=float, default=2 * SNAPSHOT_IDLE_TIMEOUT, help="idle seconds between sessions")
+    snapshot.add_argument("--fps", type=float, default=SNAPSHOT_FPS)
+    snapshot.add_argument("--max-age", type=float, default=SNAPSHOT_MAX_AGE)
+    snapshot.add_argument("--idle-timeout", type=float, default=SNAPSHOT_IDLE_TIMEOUT)
+    snapshot.add_argument("--capture-time", type=float, default=0.05, help="seconds per frame capture")
+    snapshot.add_argument("--busy-share", type=float, default=0.1, help="share of frames the camera is busy for")
+    snapshot.add_argument("--speed", type=float, default=50, help="run this many times faster than real time")
+    snapshot.add_argument("--seed", type=int, default=1)
+    snapshot.set_defaults(func=bench_snapshot)
+
+    broadcast = subparsers.add_parser("broadcast", help="fan-out of one photo to many subscribers")
+    broadcast.add_argument("--subscribers", type=int, default=1000)
+    broadcast.add_argument("--blocked-share", type=float, default=0.05, help="share of chats that blocked the bot")
+    broadcast.add_argument("--photo-bytes", type=int, default=300_000)
+    broadcast.add_argument("--concurrency", type=int, default=BROADCAST_CONCURRENCY)
+    broadcast.add_argument("--rate", type=float, default=BROADCAST_RATE, help="broadcaster messages per second")
+    broadcast.add_argument("--api-rate", type=float, default=30, help="fake API flood limit, messages per second")
+    broadcast.add_argument("--api-chat-rate", type=float, default=1, help="fake API flood limit per chat")
+    broadcast.add_argument("--bandwidth", type=float, default=2_000_000, help="upload bytes per second")
+    broadcast.add_argument("--latency", type=float, default=0.05, help="seconds per Bot API call")
+    broadcast.add_argument("--seed", type=int, default=1)
+    broadcast.set_defaults(func=bench_broadcast)
+
+    logging_parser = subparsers.add_parser("logging", help="latency of logging calls, inline versus queued handlers")
+    logging_parser.add_argument("--records", type=int, default=20000)
+    logging_parser.add_argument("--format", choices=['text', 'json'], default='text')
+    logging_parser.add_argument("--queue-size", type=int, default=LOG_QUEUE_SIZE)
+    logging_parser.add_argument("--pause", type=float, default=0.0, help="seconds between records")
+    logging_parser.add_argument("--write-delay", type=float, default=0.0, help="extra seconds per file write")
+    logging_parser.set_defaults(func=bench_logging)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,113 @@
+import asyncio
 import logging
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton, LabeledPrice
+import secrets
+import signal
+from pathlib import Path
+from concurrent.futures import Future
+from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton, LabeledPrice, InputMediaPhoto
+from telegram.error import BadRequest
+from telegram.request import BaseRequest
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, filters,
-    ContextTypes, ConversationHandler, PreCheckoutQueryHandler, CallbackQueryHandler
+    ContextTypes, ConversationHandler, PreCheckoutQueryHandler, CallbackQueryHandler, TypeHandler
 )
 from config import (
     TOKEN, MIN_VIDEO_DURATION, MAX_VIDEO_DURATION,
-    IMAGE_DIR, VIDEO_DIR
+    IMAGE_DIR, VIDEO_DIR, BURST_DIR, PHOTO_IN_MEMORY, PREROLL_ENABLED, PREROLL_SECONDS,
+    METRICS_PORT, METRICS_HOST, ADMIN_USER_IDS, UPDATE_MODE, WEBHOOK_LISTEN, WEBHOOK_PORT,
+    WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET, CONCURRENT_UPDATES, DRAIN_TIMEOUT,
+    MOTION_ENABLED, MOTION_CAPTURE, MOTION_CLIP_SECONDS,
+    TIMELAPSE_INTERVAL, TIMELAPSE_FRAMERATE, TIMELAPSE_DEFAULT_MINUTES, TIMELAPSE_MAX_MINUTES,
+    BURST_FRAMES, BURST_MAX_SEND, SNAPSHOT_ENABLED
 )
+from camera_backend import CameraBackend
 from camera_handler import CameraHandler
-from file_manager import FileManager
+from async_camera import AsyncCameraHandler
+from broadcast import Broadcaster
+from camera_scheduler import CameraScheduler, CameraBusyError
+from media_cache import FileIdCache
+from interaction_log import InteractionRecorder
+from derivatives import DerivativeGenerator
+from metrics import REGISTRY, STAGE_ERRORS, UPLOAD_BYTES, MetricsServer, span, timed
+from startup import STARTUP
+from snapshot import SnapshotCache
+from subscriptions import SubscriptionStore
+from timelapse import Timelapse
+from update_processor import PerChatUpdateProcessor
+from video_output import video_reply_kwargs
 
 logger = logging.getLogger(__name__)
 
 # Conversation states
 WAITING_FOR_DURATION = 1
 
+# Subscription topics and what their subscribers receive
+SUBSCRIPTION_TOPICS = {
+    'photos': "photos broadcast by the admins",
+    'motion': "captures of detected motion",
+}
+
 class PiCameraBot:
-    def __init__(self):
-        self.camera = CameraHandler()
-        self.file_manager = FileManager()
-        self.application = Application.builder().token(TOKEN).build()
+    def __init__(self, backend: CameraBackend = None, request: BaseRequest = None, camera: CameraHandler = None):
+        """backend and request replace the configured camera and the Bot API connection, e.g. in benchmarks.
+
+        camera is an existing session, e.g. one already warming up; its file manager is shared.
+        """
+        if camera is None:
+            camera = CameraHandler(backend=backend)
+        self.file_manager = camera.file_manager
+        self.file_ids = FileIdCache()
+        self.file_manager.add_delete_listener(self.file_ids.invalidate)
+        self.interactions = InteractionRecorder()
+        self.derivatives = DerivativeGenerator(self.file_manager, self.file_ids)
+        self.camera = AsyncCameraHandler(camera)
+        self.scheduler = CameraScheduler()
+        self.subscriptions = SubscriptionStore()
+        self.motion = None
+        if MOTION_ENABLED:
+            from motion import MotionMonitor
+            self.motion = MotionMonitor(self.camera.camera.capture_lores, self.on_motion)
+        self.snapshots = SnapshotCache(self.camera.camera.capture_snapshot) if SNAPSHOT_ENABLED else None
+        self._loop = None
+        self.timelapse = None
+        self._timelapse_sender = None
+        self.metrics_server = None
+        REGISTRY.gauge('picamera_queue_depth', 'Camera jobs waiting to start', lambda: self.scheduler.queue_depth)
+        REGISTRY.gauge('picamera_camera_open', 'Whether the camera session is open',
+                       lambda: int(self.camera.camera.is_open))
+        REGISTRY.gauge('picamera_interactions_dropped', 'Interaction log events dropped',
+                       lambda: self.interactions.dropped)
+        if self.snapshots is not None:
+            REGISTRY.gauge('picamera_snapshot_age_seconds', 'Age of the cached snapshot frame', self.snapshots.age)
+        builder = (
+            Application.builder().token(TOKEN)
+            .concurrent_updates(PerChatUpdateProcessor(CONCURRENT_UPDATES))
+            .post_init(self.post_init).post_shutdown(self.post_shutdown)
+        )
+        if request is not None:
+            builder = builder.request(request)
+        self.application = builder.build()
+        self.broadcaster = Broadcaster(self.application.bot, self.subscriptions, self.file_ids)
 
     def create_main_keyboard(self):
         """Create the main menu keyboard."""
         keyboard = [
             ["📹 Record Video", "📸 Capture Photo"],
-            ["🎥 Show Latest Video", "🖼️ Show Latest Photo"]
+            ["🎥 Show Latest Video", "🖼️ Show Latest Photo"],
+            ["🎯 Sharpest of Burst"]
         ]
+        if SNAPSHOT_ENABLED:
+            keyboard[-1].append("⚡ Instant Snapshot")
+        if PREROLL_ENABLED:
+            keyboard.append([f"⏪ Last {PREROLL_SECONDS} Seconds"])
         markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
         return markup
 
+    def create_full_resolution_keyboard(self, photo_path):
+        """Create inline keyboard offering the full-resolution photo as a document."""
+        keyboard = [[InlineKeyboardButton("📄 Full resolution", callback_data=f"full:{Path(photo_path).name}")]]
+        return InlineKeyboardMarkup(keyboard)
+
     def create_star_keyboard(self):
         """Create inline keyboard with star payment button."""
         keyboard = [[InlineKeyboardButton("⭐ Feed the fish", callback_data="star")]]
@@ -70,6 +147,149 @@ class PiCameraBot:
             "Thank you for feeding the fish! 🐠 Your star has been received! ⭐"
         )
 
+    async def _reply_media(self, message, path, kind: str, data: bytes = None, saved: Future = None, **kwargs):
+        """Send a photo, video or document, reusing the Telegram file_id of an earlier upload.
+
+        When data is given it is uploaded directly instead of reading path, and
+        the file_id is cached once the background write tracked by saved is done.
+        Extra keyword arguments are passed on to the reply method.
+        """
+        send = {
+            'photo': message.reply_photo,
+            'video': message.reply_video,
+            'document': message.reply_document,
+        }[kind]
+        file_id = self.file_ids.get(path)
+        if file_id is not None:
+            try:
+                return await send(file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Cached file_id for {path} was rejected, uploading again: {e}")
+                self.file_ids.invalidate(path)
+
+        if kind == 'video':
+            # Duration, size and thumbnail let clients show the video before it is downloaded
+            with span('video_metadata'):
+                kwargs = {**await asyncio.to_thread(video_reply_kwargs, path), **kwargs}
+        with span(f"upload_{kind}"):
+            if data is not None:
+                sent = await send(data, **kwargs)
+                UPLOAD_BYTES.labels(kind).inc(len(data))
+            else:
+                with open(path, 'rb') as media_file:
+                    sent = await send(media_file, **kwargs)
+                    UPLOAD_BYTES.labels(kind).inc(media_file.tell())
+        media = sent.photo[-1] if kind == 'photo' and sent.photo else getattr(sent, kind)
+        if media is not None:
+            self._cache_file_id(path, media.file_id, saved)
+        return sent
+
+    def _cache_file_id(self, path, file_id: str, saved: Future = None):
+        """Remember the file_id of an upload of path, once the background write tracked by saved is done."""
+        if saved is None:
+            self.file_ids.put(path, file_id)
+            return
+
+        def cache_when_saved(future: Future):
+            if not future.cancelled() and future.exception() is None:
+                self.file_ids.put(path, file_id)
+        saved.add_done_callback(cache_when_saved)
+
+    async def post_init(self, application: Application):
+        """Start background work once the application is initialized."""
+        logger.info(f"Ready to serve updates {STARTUP.elapsed():.2f}s after start")
+        self.file_manager.start_retention()
+        self.interactions.start()
+        self.scheduler.start()
+        if METRICS_PORT is not None:
+            try:
+                self.metrics_server = MetricsServer(METRICS_PORT, METRICS_HOST)
+                self.metrics_server.start()
+            except OSError as e:
+                logger.error(f"Could not start the metrics endpoint: {e}")
+        if PREROLL_ENABLED:
+            await self.camera.start_preroll()
+        if self.snapshots is not None:
+            self.snapshots.start()
+        if self.motion is not None:
+            self._loop = asyncio.get_running_loop()
+            self.camera.camera.motion_active = True
+            self.motion.start()
+
+    async def post_shutdown(self, application: Application):
+        """Stop motion detection and snapshots, and fail camera jobs still queued when the application stops.
+
+        A running timelapse is ended and encoded up to its last frame.
+        """
+        if self.motion is not None:
+            await asyncio.to_thread(self.motion.stop)
+        if self.snapshots is not None:
+            await asyncio.to_thread(self.snapshots.stop)
+        if self.timelapse is not None:
+            self.timelapse.stop()
+            try:
+                await asyncio.wrap_future(self.timelapse.done)
+            except Exception as e:
+                logger.error(f"Timelapse failed: {e}")
+            finally:
+                # The bot can no longer send it; the video stays in TIMELAPSE_DIR
+                self._timelapse_sender.cancel()
+        await self.scheduler.stop()
+
+    def on_motion(self, changed: float):
+        """Motion monitor callback; runs on the monitor thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._handle_motion(changed), self._loop)
+
+    async def _handle_motion(self, changed: float):
+        """Capture a photo or clip of the motion and send it to the subscribed chats."""
+        try:
+            if MOTION_CAPTURE == 'video':
+                job = self.scheduler.submit(
+                    'video', 'motion', lambda: self.camera.record_video(MOTION_CLIP_SECONDS), MOTION_CLIP_SECONDS
+                )
+            else:
+                job = self.scheduler.submit('photo', 'motion', self.camera.capture_photo)
+            path = await job
+        except CameraBusyError as e:
+            logger.warning(f"Skipping motion capture: {e}")
+            return
+        except Exception as e:
+            STAGE_ERRORS.labels('motion_capture').inc()
+            logger.error(f"Error capturing motion: {e}", exc_info=True)
+            return
+        logger.info(f"Motion capture saved: {path}")
+        await self.broadcaster.broadcast(
+            'motion', path, MOTION_CAPTURE, caption=f"Motion detected ({changed:.0%} of the view changed)"
+        )
+
+    async def _run_camera_job(self, message, kind: str, run, duration: int = 0):
+        """Queue a camera job, tell the user their place in line, and await the result.
+
+        Raises CameraBusyError if the job is not admitted.
+        """
+        job = self.scheduler.submit(kind, message.from_user.id, run, duration)
+        if job.position:
+            await message.reply_text(f"You are #{job.position + 1} in line, about {job.eta:.0f} s to wait...")
+        return await job
+
+    async def record_interaction(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Queue every incoming update for the interactions table."""
+        user = update.effective_user
+        if user is None:
+            return
+        if update.callback_query:
+            command = f"callback:{update.callback_query.data}"
+        elif update.pre_checkout_query:
+            command = "pre_checkout"
+        elif update.message and update.message.successful_payment:
+            command = "successful_payment"
+        elif update.message and update.message.text:
+            command = update.message.text
+        else:
+            command = "other"
+        self.interactions.record(user.username or user.id, command)
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send a message when the command /start is issued."""
         await update.message.reply_text(
@@ -78,12 +298,186 @@ class PiCameraBot:
             reply_markup=self.create_main_keyboard()
         )
 
+    async def handle_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Send pipeline timings and counters to an admin."""
+        lines = [
+            REGISTRY.summary() or "No metrics recorded yet",
+            f"retention: {self.file_manager.retention.stats()}",
+            f"interactions: {self.interactions.stats()}",
+        ]
+        if self.motion is not None:
+            lines.append(f"motion: {self.motion.stats()}")
+        if self.snapshots is not None:
+            lines.append(f"snapshots: {self.snapshots.stats()}")
+        # Telegram rejects messages longer than 4096 characters
+        await update.message.reply_text("\n".join(lines)[:4096])
+
+    async def handle_timelapse(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Start a timelapse of the given minutes, or end the running one with /timelapse stop."""
+        args = context.args or []
+        running = self.timelapse is not None and not self.timelapse.done.done()
+        if args and args[0].lower() == 'stop':
+            if not running:
+                await update.message.reply_text("No timelapse is running.")
+                return
+            self.timelapse.stop()
+            await update.message.reply_text("Stopping the timelapse, the video follows shortly.")
+            return
+        if running:
+            await update.message.reply_text(
+                f"A timelapse is already running, {self.timelapse.remaining_seconds / 60:.0f} min left. "
+                "Send /timelapse stop to end it."
+            )
+            return
+        try:
+            minutes = float(args[0]) if args else TIMELAPSE_DEFAULT_MINUTES
+        except ValueError:
+            minutes = 0
+        if not 0 < minutes <= TIMELAPSE_MAX_MINUTES:
+            await update.message.reply_text(
+                f"Usage: /timelapse [minutes], from 1 to {TIMELAPSE_MAX_MINUTES}, or /timelapse stop"
+            )
+            return
+
+        frames = max(1, int(minutes * 60 / TIMELAPSE_INTERVAL))
+        self.timelapse = Timelapse(self.camera.camera, self.file_manager, frames)
+        self.timelapse.start()
+        await update.message.reply_text(
+            f"Timelapse started: a frame every {TIMELAPSE_INTERVAL} s for {minutes:g} min, "
+            f"about {frames / TIMELAPSE_FRAMERATE:.0f} s of video."
+        )
+        # Not an application task: Application.stop() would wait for the whole timelapse
+        self._timelapse_sender = asyncio.create_task(self._send_timelapse(update.message, self.timelapse))
+
+    async def _send_timelapse(self, message, timelapse: Timelapse):
+        """Wait for a timelapse to finish and send it to the chat that started it."""
+        try:
+            path = await asyncio.wrap_future(timelapse.done)
+            if path is None:
+                await message.reply_text("The timelapse ended before any frame was taken.")
+                return
+            await self._reply_media(
+                message, path, 'video',
+                caption=f"Timelapse: {timelapse.captured} frames, {timelapse.skipped} skipped"
+            )
+        except Exception as e:
+            STAGE_ERRORS.labels('handler_timelapse').inc()
+            logger.error(f"Error sending timelapse: {e}", exc_info=True)
+            await message.reply_text("An error occurred while making the timelapse")
+
+    async def handle_subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Subscribe the chat to a topic, 'photos' by default."""
+        topic = context.args[0].lower() if context.args else 'photos'
+        if topic not in SUBSCRIPTION_TOPICS:
+            topics = ", ".join(SUBSCRIPTION_TOPICS)
+            await update.message.reply_text(f"Usage: /subscribe [topic], where topic is one of: {topics}")
+            return
+        if await asyncio.to_thread(self.subscriptions.add, update.effective_chat.id, topic):
+            text = f"Subscribed to {SUBSCRIPTION_TOPICS[topic]}. Send /unsubscribe {topic} to stop."
+            if topic == 'motion' and not MOTION_ENABLED:
+                text += "\nMotion detection is currently switched off on this camera."
+        else:
+            text = f"This chat already gets {SUBSCRIPTION_TOPICS[topic]}."
+        await update.message.reply_text(text)
+
+    async def handle_unsubscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Unsubscribe the chat from a topic, or from all of them."""
+        topics = [context.args[0].lower()] if context.args else list(SUBSCRIPTION_TOPICS)
+        removed = [
+            topic for topic in topics
+            if await asyncio.to_thread(self.subscriptions.remove, update.effective_chat.id, topic)
+        ]
+        if removed:
+            await update.message.reply_text(f"Unsubscribed from {', '.join(removed)}.")
+        else:
+            await update.message.reply_text("This chat was not subscribed.")
+
+    @timed('handler_broadcast')
+    async def handle_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Take a photo and send it to every chat subscribed to 'photos'."""
+        try:
+            photo_path = await self._run_camera_job(update.message, 'photo', self.camera.capture_photo)
+            preview = await self.derivatives.preview(photo_path)
+            if preview.saved is not None:
+                await asyncio.wrap_future(preview.saved)
+            caption = " ".join(context.args) or None
+            results = await self.broadcaster.broadcast('photos', preview.path, 'photo', caption=caption)
+            await update.message.reply_text(
+                f"Sent to {results['sent']} of {results['chats']} chats in {results['seconds']:.1f} s "
+                f"({results['failed']} failed, {results['unsubscribed']} unsubscribed)."
+            )
+        except CameraBusyError as e:
+            await update.message.reply_text(str(e))
+        except Exception as e:
+            STAGE_ERRORS.labels('handler_broadcast').inc()
+            logger.error(f"Error broadcasting photo: {e}", exc_info=True)
+            await update.message.reply_text("An error occurred while broadcasting the photo")
+
+    async def handle_motion_subscription(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Toggle motion alerts for the chat."""
+        chat_id = update.effective_chat.id
+        if await asyncio.to_thread(self.subscriptions.add, chat_id, 'motion'):
+            text = "You will get a photo whenever the camera sees motion. Send /motion again to stop."
+            if MOTION_CAPTURE == 'video':
+                text = "You will get a clip whenever the camera sees motion. Send /motion again to stop."
+            if not MOTION_ENABLED:
+                text += "\nMotion detection is currently switched off on this camera."
+        else:
+            await asyncio.to_thread(self.subscriptions.remove, chat_id, 'motion')
+            text = "Motion alerts are off."
+        await update.message.reply_text(text)
+
+    async def _reply_photo_preview(self, message, photo_path, data: bytes = None):
+        """Send the Telegram-sized preview of a photo with a button for the full-resolution file."""
+        with span('preview'):
+            preview = await self.derivatives.preview(photo_path, data)
+        await self._reply_media(
+            message, preview.path, 'photo', data=preview.data, saved=preview.saved,
+            reply_markup=self.create_full_resolution_keyboard(photo_path)
+        )
+
+    @timed('handler_full_resolution')
+    async def handle_full_resolution(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Send a full-resolution photo as a document."""
+        query = update.callback_query
+        await query.answer()
+        try:
+            name = query.data.split(":", 1)[1]
+            # Only a bare file name is accepted, so the callback data cannot point outside the photo directories
+            photo_path = None
+            if Path(name).name == name and name not in ('', '.', '..'):
+                # Photos from bursts are kept apart from the others
+                photo_path = next(
+                    (directory / name for directory in (IMAGE_DIR, BURST_DIR) if (directory / name).is_file()), None
+                )
+            if photo_path is None:
+                await query.message.reply_text("This photo is no longer available.")
+                return
+            thumbnail = self.derivatives.paths(photo_path).thumbnail
+            if thumbnail.exists():
+                with open(thumbnail, 'rb') as thumbnail_file:
+                    await self._reply_media(query.message, photo_path, 'document', thumbnail=thumbnail_file)
+            else:
+                await self._reply_media(query.message, photo_path, 'document')
+            logger.info(f"Full-resolution photo sent successfully: {photo_path}")
+        except Exception as e:
+            STAGE_ERRORS.labels('handler_full_resolution').inc()
+            logger.error(f"Error sending full-resolution photo: {e}", exc_info=True)
+            await query.message.reply_text("An error occurred while sending the full-resolution photo")
+
+    @timed('handler_photo')
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle capturing a photo."""
         try:
             await update.message.reply_text("Taking a photo...", reply_markup=ReplyKeyboardRemove())
-            photo_path = self.camera.capture_photo()
-            await update.message.reply_photo(open(photo_path, 'rb'))
+            if PHOTO_IN_MEMORY:
+                # Upload straight from memory; the file is written in the background
+                photo = await self._run_camera_job(update.message, 'photo', self.camera.capture_photo_data)
+                photo_path = photo.path
+                await self._reply_photo_preview(update.message, photo_path, photo.data)
+            else:
+                photo_path = await self._run_camera_job(update.message, 'photo', self.camera.capture_photo)
+                await self._reply_photo_preview(update.message, photo_path)
             # Send ready message with star button
             await update.message.reply_text(
                 "Your photo is ready!",
@@ -94,13 +488,91 @@ class PiCameraBot:
                 reply_markup=self.create_main_keyboard()
             )
             logger.info(f"Photo sent successfully: {photo_path}")
+        except CameraBusyError as e:
+            await update.message.reply_text(str(e), reply_markup=self.create_main_keyboard())
         except Exception as e:
+            STAGE_ERRORS.labels('handler_photo').inc()
             logger.error(f"Error taking photo: {e}", exc_info=True)
             await update.message.reply_text(
                 "An error occurred while taking the photo",
                 reply_markup=self.create_main_keyboard()
             )
 
+    @timed('handler_snapshot')
+    async def handle_snapshot(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Send the cached frame of the video stream if it is fresh enough, else a frame taken now."""
+        try:
+            snapshot = self.snapshots.get()
+            if snapshot is None:
+                # A video frame, so a miss neither pays for nor starts the still-mode hold
+                data = await self._run_camera_job(update.message, 'photo', self.camera.capture_snapshot)
+                age = 0.0
+            else:
+                data, age = snapshot
+            with span('upload_photo'):
+                await update.message.reply_photo(
+                    data, caption=f"{age:.1f} s ago", reply_markup=self.create_main_keyboard()
+                )
+                UPLOAD_BYTES.labels('photo').inc(len(data))
+        except CameraBusyError as e:
+            await update.message.reply_text(str(e), reply_markup=self.create_main_keyboard())
+        except Exception as e:
+            STAGE_ERRORS.labels('handler_snapshot').inc()
+            logger.error(f"Error sending snapshot: {e}", exc_info=True)
+            await update.message.reply_text(
+                "An error occurred while sending the snapshot",
+                reply_markup=self.create_main_keyboard()
+            )
+
+    @timed('handler_burst')
+    async def handle_burst(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Take a burst and send its sharpest photo, or with /burst N its N sharpest as an album."""
+        try:
+            keep = int(context.args[0]) if context.args else 1
+        except ValueError:
+            keep = 0
+        if not 1 <= keep <= BURST_MAX_SEND:
+            await update.message.reply_text(f"Usage: /burst [number of photos, from 1 to {BURST_MAX_SEND}]")
+            return
+        try:
+            await update.message.reply_text(f"Taking {BURST_FRAMES} photos...", reply_markup=ReplyKeyboardRemove())
+            photos = await self._run_camera_job(
+                update.message, 'burst', lambda: self.camera.capture_burst(BURST_FRAMES, keep)
+            )
+            if len(photos) == 1:
+                await self._reply_photo_preview(update.message, photos[0].path, photos[0].data)
+            else:
+                await self._reply_preview_album(update.message, photos)
+            await update.message.reply_text(
+                f"The sharpest of {BURST_FRAMES} photos.",
+                reply_markup=self.create_main_keyboard()
+            )
+            logger.info(f"Burst sent successfully: {[photo.path for photo in photos]}")
+        except CameraBusyError as e:
+            await update.message.reply_text(str(e), reply_markup=self.create_main_keyboard())
+        except Exception as e:
+            STAGE_ERRORS.labels('handler_burst').inc()
+            logger.error(f"Error taking burst: {e}", exc_info=True)
+            await update.message.reply_text(
+                "An error occurred while taking the photos",
+                reply_markup=self.create_main_keyboard()
+            )
+
+    async def _reply_preview_album(self, message, photos: list):
+        """Send the previews of several captured photos as one media group."""
+        with span('preview'):
+            previews = await asyncio.gather(*(self.derivatives.preview(photo.path, photo.data) for photo in photos))
+        media = []
+        for preview in previews:
+            data = preview.data if preview.data is not None else await asyncio.to_thread(Path(preview.path).read_bytes)
+            media.append(InputMediaPhoto(data))
+        with span('upload_album'):
+            sent = await message.reply_media_group(media)
+            UPLOAD_BYTES.labels('photo').inc(sum(len(item.media.input_file_content) for item in media))
+        for preview, sent_message in zip(previews, sent):
+            if sent_message.photo:
+                self._cache_file_id(preview.path, sent_message.photo[-1].file_id, preview.saved)
+
     async def handle_video_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start video recording process."""
         await update.message.reply_text(
@@ -109,6 +581,7 @@ class PiCameraBot:
         )
         return WAITING_FOR_DURATION
 
+    @timed('handler_video')
     async def handle_video_duration(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle video duration input."""
         try:
@@ -120,8 +593,10 @@ class PiCameraBot:
                 return WAITING_FOR_DURATION
 
             await update.message.reply_text(f"Recording video for {duration} seconds...")
-            video_path = self.camera.record_video(duration)
-            await update.message.reply_video(open(video_path, 'rb'))
+            video_path = await self._run_camera_job(
+                update.message, 'video', lambda: self.camera.record_video(duration), duration
+            )
+            await self._reply_media(update.message, video_path, 'video')
             # Send ready message with star button
             await update.message.reply_text(
                 "Your video is ready!",
@@ -138,7 +613,10 @@ class PiCameraBot:
                 reply_markup=ReplyKeyboardRemove()
             )
             return WAITING_FOR_DURATION
+        except CameraBusyError as e:
+            await update.message.reply_text(str(e), reply_markup=self.create_main_keyboard())
         except Exception as e:
+            STAGE_ERRORS.labels('handler_video').inc()
             logger.error(f"Error recording video: {e}", exc_info=True)
             await update.message.reply_text(
                 "An error occurred while recording the video",
@@ -148,6 +626,35 @@ class PiCameraBot:
             if 'duration' in locals() and MIN_VIDEO_DURATION <= duration <= MAX_VIDEO_DURATION:
                 return ConversationHandler.END
 
+    @timed('handler_preroll_video')
+    async def handle_preroll_video(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Send the footage buffered before the request."""
+        try:
+            await update.message.reply_text(
+                f"Saving the last {PREROLL_SECONDS} seconds...",
+                reply_markup=ReplyKeyboardRemove()
+            )
+            video_path = await self.camera.save_preroll(PREROLL_SECONDS)
+            await self._reply_media(update.message, video_path, 'video')
+            # Send ready message with star button
+            await update.message.reply_text(
+                "Your video is ready!",
+                reply_markup=self.create_star_keyboard()
+            )
+            await update.message.reply_text(
+                "Choose an option:",
+                reply_markup=self.create_main_keyboard()
+            )
+            logger.info(f"Pre-roll video sent successfully: {video_path}")
+        except Exception as e:
+            STAGE_ERRORS.labels('handler_preroll_video').inc()
+            logger.error(f"Error sending pre-roll video: {e}", exc_info=True)
+            await update.message.reply_text(
+                "An error occurred while saving the recent footage",
+                reply_markup=self.create_main_keyboard()
+            )
+
+    @timed('handler_latest_video')
     async def handle_latest_video(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show latest video."""
         try:
@@ -160,7 +667,7 @@ class PiCameraBot:
                 return
 
             latest_video = latest_videos[0]
-            await update.message.reply_video(open(latest_video, 'rb'))
+            await self._reply_media(update.message, latest_video, 'video')
             # Send ready message with star button
             await update.message.reply_text(
                 "Your video is ready!",
@@ -172,12 +679,14 @@ class PiCameraBot:
             )
             logger.info(f"Latest video sent successfully: {latest_video}")
         except Exception as e:
+            STAGE_ERRORS.labels('handler_latest_video').inc()
             logger.error(f"Error sending latest video: {e}", exc_info=True)
             await update.message.reply_text(
                 "An error occurred while getting the latest video",
                 reply_markup=self.create_main_keyboard()
             )
 
+    @timed('handler_latest_photo')
     async def handle_latest_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show latest photo."""
         try:
@@ -190,7 +699,7 @@ class PiCameraBot:
                 return
 
             latest_photo = latest_photos[0]
-            await update.message.reply_photo(open(latest_photo, 'rb'))
+            await self._reply_photo_preview(update.message, latest_photo)
             # Send ready message with star button
             await update.message.reply_text(
                 "Your photo is ready!",
@@ -202,6 +711,7 @@ class PiCameraBot:
             )
             logger.info(f"Latest photo sent successfully: {latest_photo}")
         except Exception as e:
+            STAGE_ERRORS.labels('handler_latest_photo').inc()
             logger.error(f"Error sending latest photo: {e}", exc_info=True)
             await update.message.reply_text(
                 "An error occurred while getting the latest photo",
@@ -210,16 +720,45 @@ class PiCameraBot:
 
     def setup_handlers(self):
         """Set up command handlers."""
+        # Interaction logging runs before, and independently of, all other handlers
+        self.application.add_handler(TypeHandler(Update, self.record_interaction), group=-1)
+
         # Start command
         self.application.add_handler(CommandHandler("start", self.start))
+        # Metrics for admins only
+        self.application.add_handler(
+            CommandHandler("stats", self.handle_stats, filters=filters.User(user_id=ADMIN_USER_IDS))
+        )
+        self.application.add_handler(CommandHandler("motion", self.handle_motion_subscription))
+        self.application.add_handler(CommandHandler("subscribe", self.handle_subscribe))
+        self.application.add_handler(CommandHandler("unsubscribe", self.handle_unsubscribe))
+        self.application.add_handler(CommandHandler(
+            "broadcast", self.handle_broadcast, filters=filters.User(user_id=ADMIN_USER_IDS), block=False
+        ))
+        self.application.add_handler(
+            CommandHandler("timelapse", self.handle_timelapse, filters=filters.User(user_id=ADMIN_USER_IDS))
+        )
 
         # Button handlers
-        self.application.add_handler(MessageHandler(filters.Regex("^📸 Capture Photo$"), self.handle_photo))
+        # Camera handlers run as background tasks so other updates are not blocked
+        self.application.add_handler(MessageHandler(filters.Regex("^📸 Capture Photo$"), self.handle_photo, block=False))
         self.application.add_handler(MessageHandler(filters.Regex("^🎥 Show Latest Video$"), self.handle_latest_video))
+        if PREROLL_ENABLED:
+            self.application.add_handler(
+                MessageHandler(filters.Regex("^⏪ Last \\d+ Seconds$"), self.handle_preroll_video, block=False)
+            )
         self.application.add_handler(MessageHandler(filters.Regex("^🖼️ Show Latest Photo$"), self.handle_latest_photo))
+        self.application.add_handler(MessageHandler(filters.Regex("^🎯 Sharpest of Burst$"), self.handle_burst, block=False))
+        self.application.add_handler(CommandHandler("burst", self.handle_burst, block=False))
+        if SNAPSHOT_ENABLED:
+            self.application.add_handler(
+                MessageHandler(filters.Regex("^⚡ Instant Snapshot$"), self.handle_snapshot, block=False)
+            )
+            self.application.add_handler(CommandHandler("snapshot", self.handle_snapshot, block=False))
 
         # Star payment handlers
         self.application.add_handler(CallbackQueryHandler(self.handle_star_callback, pattern="^star$"))
+        self.application.add_handler(CallbackQueryHandler(self.handle_full_resolution, pattern="^full:"))
         self.application.add_handler(PreCheckoutQueryHandler(self.pre_checkout_callback))
         self.application.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, self.successful_payment_callback))
 
@@ -227,13 +766,77 @@ class PiCameraBot:
         video_handler = ConversationHandler(
             entry_points=[MessageHandler(filters.Regex("^📹 Record Video$"), self.handle_video_start)],
             states={
-                WAITING_FOR_DURATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_video_duration)]
+                WAITING_FOR_DURATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_video_duration, block=False)]
             },
             fallbacks=[],
         )
         self.application.add_handler(video_handler)
 
+    async def serve_webhook(self, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                            secret_token: str = None, stop_event: asyncio.Event = None):
+        """Receive updates on a local HTTP server until stop_event is set or SIGINT/SIGTERM.
+
+        Requests without the secret token are rejected. On shutdown no new
+        updates are accepted, queued camera jobs get DRAIN_TIMEOUT seconds to
+        finish, and the updates already received are processed before returning.
+        """
+        if UPDATE_MODE == 'webhook' and not WEBHOOK_URL:
+            # Telegram only accepts HTTPS webhooks, so the local address cannot be registered
+            raise ValueError("UPDATE_MODE is 'webhook' but WEBHOOK_URL is not set; set it to the public HTTPS URL")
+        application = self.application
+        secret_token = secret_token or WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        stop_event = stop_event or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(stop_signal, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # not supported on this platform or thread
+
+        await application.initialize()
+        try:
+            await self.post_init(application)
+            await application.updater.start_webhook(
+                listen=listen, port=port, url_path=WEBHOOK_PATH, webhook_url=WEBHOOK_URL,
+                secret_token=secret_token
+            )
+            await application.start()
+            logger.info(f"Receiving updates on http://{listen}:{port}/{WEBHOOK_PATH}")
+            await stop_event.wait()
+
+            logger.info("Stopping: draining queued camera jobs")
+            await application.updater.stop()
+            await self.scheduler.drain(DRAIN_TIMEOUT)
+            await self.scheduler.stop()
+            await application.stop()
+        finally:
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            await application.shutdown()
+            await self.post_shutdown(application)
+
     def run(self):
         """Run the bot."""
         self.setup_handlers()
-        self.application.run_polling() 
\ No newline at end of file
+        try:
+            if UPDATE_MODE == 'webhook':
+                asyncio.run(self.serve_webhook())
+            else:
+                self.application.run_polling()
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the camera and stop the background workers."""
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.motion is not None:
+            self.motion.stop()
+        self.camera.close()
+        self.file_manager.close()
+        self.interactions.close()
+        self.derivatives.close()
+        self.file_ids.close()
+        self.subscriptions.close() 
\ No newline at end of file
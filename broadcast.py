@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from config import BROADCAST_CONCURRENCY, BROADCAST_RATE, BROADCAST_CHAT_RATE, BROADCAST_MAX_RETRIES
+from metrics import REGISTRY, UPLOAD_BYTES, span
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_SENDS = REGISTRY.counter(
+    'picamera_broadcast_sends_total', 'Broadcast deliveries by result', ('result',)
+)
+
+
+async def _acquire(bucket: TokenBucket):
+    while not bucket.try_acquire():
+        await asyncio.sleep(bucket.delay())
+
+
+class Broadcaster:
+    """Sends a photo or video to every chat subscribed to a topic.
+
+    The file is uploaded once, to the first chat that accepts it, and then
+    sent to the remaining chats by its Telegram file_id. Sends run on at most
+    concurrency workers and are paced by a global and a per-chat token bucket
+    matching Telegram's limits. A RetryAfter pauses every worker for the time
+    Telegram asks for, and chats that blocked the bot are unsubscribed.
+    """
+
+    def __init__(self, bot, subscriptions, file_ids=None, concurrency: int = BROADCAST_CONCURRENCY,
+                 rate: float = BROADCAST_RATE, chat_rate: float = BROADCAST_CHAT_RATE,
+                 max_retries: int = BROADCAST_MAX_RETRIES):
+        self.bot = bot
+        self.subscriptions = subscriptions
+        self.file_ids = file_ids
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(rate, max(1, rate))
+        self._chat_buckets = {}
+        self._resume_at = 0.0  # monotonic time until which Telegram asked us to wait
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+        return bucket
+
+    async def _send(self, chat_id, kind: str, media, **kwargs):
+        """Send media to chat_id within the rate limits, waiting and retrying when Telegram asks to."""
+        send = self.bot.send_video if kind == 'video' else self.bot.send_photo
+        for _ in range(self.max_retries + 1):
+            await _acquire(self._chat_bucket(chat_id))
+            await _acquire(self._bucket)
+            while (wait := self._resume_at - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+            try:
+                if hasattr(media, 'seek'):
+                    media.seek(0)
+                return await send(chat_id, media, **kwargs)
+            except RetryAfter as e:
+                BROADCAST_SENDS.labels('retry').inc()
+                logger.warning(f"Flood limit reached sending to {chat_id}, waiting {e.retry_after}s")
+                self._resume_at = max(self._resume_at, time.monotonic() + e.retry_after)
+        raise RuntimeError(f"Still rate limited after {self.max_retries} retries")
+
+    async def _deliver(self, chat_id, topic: str, kind: str, media, results: dict, reraise: tuple = (), **kwargs):
+        """Send to one chat and count the outcome in results; returns the message if it was sent.
+
+        Errors of the types in reraise are not counted but raised to the caller.
+        """
+        try:
+            sent = await self._send(chat_id, kind, media, **kwargs)
+        except reraise:
+            raise
+        except Forbidden:
+            logger.info(f"Chat {chat_id} blocked the bot, unsubscribing it from {topic}")
+            await asyncio.to_thread(self.subscriptions.remove, chat_id, topic)
+            result = 'unsubscribed'
+        except (TelegramError, RuntimeError) as e:
+            logger.error(f"Error broadcasting to {chat_id}: {e}")
+            result = 'failed'
+        except Exception as e:
+            logger.error(f"Error broadcasting to {chat_id}: {e}", exc_info=True)
+            result = 'failed'
+        else:
+            result = 'sent'
+        results[result] += 1
+        BROADCAST_SENDS.labels(result).inc()
+        return sent if result == 'sent' else None
+
+    async def _upload(self, chats: list, topic: str, path, kind: str, results: dict, **kwargs):
+        """Upload the file to the first chat that accepts it; return (file_id, chats left to send to).
+
+        Gives up after max_retries chats failed for other reasons than blocking
+        the bot, as the file itself is then likely the problem.
+        """
+        for index, chat_id in enumerate(chats):
+            with span(f"upload_{kind}"), open(path, 'rb') as media_file:
+                sent = await self._deliver(chat_id, topic, kind, media_file, results, **kwargs)
+                UPLOAD_BYTES.labels(kind).inc(media_file.tell())
+            if sent is not None:
+                media = sent.photo[-1] if kind == 'photo' and sent.photo else getattr(sent, kind)
+                return media.file_id, chats[index + 1:]
+            if results['failed'] > self.max_retries:
+                break
+        return None, []
+
+    async def broadcast(self, topic: str, path, kind: str = 'photo', **kwargs) -> dict:
+        """Send the photo or video at path to the chats subscribed to topic; return delivery counts."""
+        started = time.monotonic()
+        chats = await asyncio.to_thread(self.subscriptions.chats, topic)
+        results = {'chats': len(chats), 'sent': 0, 'failed': 0, 'unsubscribed': 0}
+        # Chats whose bucket is full again are idle; forget them so the dict stays small
+        self._chat_buckets = {chat: bucket for chat, bucket in self._chat_buckets.items() if not bucket.is_full()}
+
+        file_id = self.file_ids.get(path) if self.file_ids is not None else None
+        pending = chats
+        if file_id is not None and chats:
+            # Try the cached file_id on one chat before sending it to all of them
+            try:
+                await self._deliver(chats[0], topic, kind, file_id, results, reraise=(BadRequest,), **kwargs)
+                pending = chats[1:]
+            except BadRequest as e:
+                logger.warning(f"Cached file_id for {path} was rejected, uploading again: {e}")
+                self.file_ids.invalidate(path)
+                file_id = None
+        if file_id is None and pending:
+            file_id, pending = await self._upload(pending, topic, path, kind, results, **kwargs)
+            if file_id is not None and self.file_ids is not None:
+                self.file_ids.put(path, file_id)
+
+        queue = iter(pending)
+
+        async def worker():
+            for chat_id in queue:
+                await self._deliver(chat_id, topic, kind, file_id, results, **kwargs)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+        results['failed'] += len(chats) - sum(results[key] for key in ('sent', 'failed', 'unsubscribed'))
+        results['seconds'] = time.monotonic() - started
+        logger.info(f"Broadcast of {path} to {topic}: {results}")
+        return results
@@ -0,0 +1,312 @@
+import io
+import logging
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Smallest valid JPEG (1x1 grey pixel) written by the fake backend
+FAKE_JPEG = bytes.fromhex(
+    'ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f'
+    '141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101'
+    '011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303020403'
+    '050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a1617'
+    '18191a25262728292a3435363738393a434445464748494a535455565758595a636465666768696a737475767778797a83'
+    '8485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7'
+    'd8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9'
+)
+
+
+class CameraBackend:
+    """Interface between CameraHandler and the camera hardware."""
+
+    def open(self):
+        """Acquire the camera device."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the camera device."""
+        raise NotImplementedError
+
+    def configure_still(self, size: tuple):
+        """Configure and start the camera for full-resolution stills."""
+        raise NotImplementedError
+
+    def configure_video(self, size: tuple, framerate: float, lores_size: tuple = None):
+        """Configure and start the camera for video recording, optionally with a low-resolution stream."""
+        raise NotImplementedError
+
+    def capture_file(self, path: str):
+        """Capture a JPEG from the running camera into path."""
+        raise NotImplementedError
+
+    def capture_jpeg(self) -> bytes:
+        """Capture a JPEG from the running camera into memory."""
+        raise NotImplementedError
+
+    def capture_array(self):
+        """Return the current frame of the main stream as an array, without encoding it."""
+        raise NotImplementedError
+
+    def encode_jpeg(self, frame, quality: int) -> bytes:
+        """Encode a frame returned by capture_array as a JPEG."""
+        raise NotImplementedError
+
+    def capture_lores(self):
+        """Return the luminance of the current low-resolution frame as a 2D uint8 array."""
+        raise NotImplementedError
+
+    def record_h264(self, path: str, duration: float, bitrate: int, stop_event: threading.Event = None):
+        """Record a raw H.264 stream from the running camera for duration seconds."""
+        raise NotImplementedError
+
+    def start_frame_encoder(self, sink, bitrate: int, framerate: float):
+        """Feed H.264 frames from the running video configuration to sink.write_frame."""
+        raise NotImplementedError
+
+    def stop_frame_encoder(self):
+        """Stop the encoder started by start_frame_encoder."""
+        raise NotImplementedError
+
+
+class Picamera2Backend(CameraBackend):
+    """Backend driving a real camera through picamera2."""
+
+    def __init__(self):
+        self._camera = None
+        self._frame_encoder = None
+        self._lores_size = None
+
+    def open(self):
+        from picamera2 import Picamera2
+        self._camera = Picamera2()
+
+    def close(self):
+        if self._camera is not None:
+            try:
+                self.stop_frame_encoder()
+                self._camera.close()
+            finally:
+                self._camera = None
+
+    def _configure(self, config):
+        if self._camera.started:
+            self._camera.stop()
+        self._camera.configure(config)
+        self._camera.start()
+
+    def configure_still(self, size: tuple):
+        self._configure(self._camera.create_still_configuration(main={"size": size}))
+
+    def configure_video(self, size: tuple, framerate: float, lores_size: tuple = None):
+        # The lores stream is produced by the ISP alongside the main one, so it costs no CPU
+        lores = {"size": lores_size, "format": "YUV420"} if lores_size else None
+        self._configure(self._camera.create_video_configuration(
+            main={"size": size}, lores=lores, controls={"FrameRate": framerate}
+        ))
+        self._lores_size = lores_size
+
+    def capture_file(self, path: str):
+        self._camera.capture_file(path)
+
+    def capture_jpeg(self) -> bytes:
+        buffer = io.BytesIO()
+        self._camera.capture_file(buffer, format='jpeg')
+        return buffer.getvalue()
+
+    def capture_array(self):
+        return self._camera.capture_array("main")
+
+    def encode_jpeg(self, frame, quality: int) -> bytes:
+        import simplejpeg
+        # The frame may be encoded after the camera was reconfigured, so its layout is
+        # taken from its shape: the default still (BGR888) and video (XBGR8888) formats,
+        # named by little-endian word order, are R, G, B[, X] in memory
+        colorspace = "RGBX" if frame.shape[2] == 4 else "RGB"
+        return simplejpeg.encode_jpeg(frame, quality=quality, colorspace=colorspace)
+
+    def capture_lores(self):
+        if self._lores_size is None:
+            raise RuntimeError("The camera is not configured with a lores stream")
+        width, height = self._lores_size
+        # YUV420 planes are stacked vertically; the first height rows are the luminance
+        return self._camera.capture_array("lores")[:height, :width]
+
+    def record_h264(self, path: str, duration: float, bitrate: int, stop_event: threading.Event = None):
+        from picamera2.encoders import H264Encoder
+        from picamera2.outputs import FileOutput
+
+        encoder = H264Encoder(bitrate=bitrate, repeat=True)
+        self._camera.start_encoder(encoder, FileOutput(path))
+        try:
+            (stop_event or threading.Event()).wait(duration)
+        finally:
+            # Only the encoder is stopped so the camera stays warm for the next request
+            self._camera.stop_encoder(encoder)
+
+    def start_frame_encoder(self, sink, bitrate: int, framerate: float):
+        from picamera2.encoders import H264Encoder
+        from picamera2.outputs import Output
+
+        class SinkOutput(Output):
+            # Newer picamera2 releases pass more arguments (packet, audio); they are not needed here
+            def outputframe(self, frame, keyframe=True, timestamp=None, *args, **kwargs):
+                sink.write_frame(frame, keyframe)
+
+        # One keyframe per second bounds how far "last N seconds" can overshoot
+        encoder = H264Encoder(bitrate=bitrate, repeat=True, iperiod=int(framerate))
+        self._camera.start_encoder(encoder, SinkOutput())
+        self._frame_encoder = encoder
+
+    def stop_frame_encoder(self):
+        if self._frame_encoder is not None:
+            encoder, self._frame_encoder = self._frame_encoder, None
+            self._camera.stop_encoder(encoder)
+
+
+class FakeCameraBackend(CameraBackend):
+    """In-memory camera with configurable delays, for tests and benchmarks without a Pi.
+
+    Captures return jpeg_sample (a 1x1 image by default). Recordings contain
+    zero bytes unless h264_sample, the path of a raw H.264 stream recorded
+    earlier, is given. encode_delay is added to every still capture and to
+    the end of every recording. Lores frames are taken in turn from
+    lores_frames, an array of recorded 2D uint8 frames, or are black. Likewise
+    capture_array() returns burst_frames in turn, or mid-grey frames, and
+    encode_jpeg() returns jpeg_sample.
+    """
+
+    def __init__(self, open_delay: float = 0.0, configure_delay: float = 0.0,
+                 capture_delay: float = 0.0, h264_sample: str = None,
+                 encode_delay: float = 0.0, jpeg_sample: bytes = FAKE_JPEG, lores_frames=None,
+                 burst_frames=None):
+        self.open_delay = open_delay
+        self.configure_delay = configure_delay
+        self.capture_delay = capture_delay
+        self.encode_delay = encode_delay
+        self.h264_sample = h264_sample
+        self.jpeg_sample = jpeg_sample
+        self.lores_frames = lores_frames
+        self.burst_frames = burst_frames
+        self._burst_index = 0
+        self._lores_size = None
+        self._lores_index = 0
+        self.is_open = False
+        self.mode = None
+        self.open_count = 0
+        self.configure_count = 0
+        self.capture_count = 0
+        self.record_count = 0
+        self._frame_thread = None
+        self._frame_stop = threading.Event()
+
+    def _check_open(self):
+        if not self.is_open:
+            raise RuntimeError("Fake camera is not open")
+
+    def open(self):
+        if self.is_open:
+            raise RuntimeError("Fake camera is already open")
+        time.sleep(self.open_delay)
+        self.is_open = True
+        self.open_count += 1
+
+    def close(self):
+        self.stop_frame_encoder()
+        self.is_open = False
+        self.mode = None
+
+    def configure_still(self, size: tuple):
+        self._check_open()
+        time.sleep(self.configure_delay)
+        self.mode = ('still', size)
+        self.configure_count += 1
+
+    def configure_video(self, size: tuple, framerate: float, lores_size: tuple = None):
+        self._check_open()
+        time.sleep(self.configure_delay)
+        self._lores_size = lores_size
+        self.mode = ('video', size)
+        self.configure_count += 1
+
+    def capture_file(self, path: str):
+        Path(path).write_bytes(self.capture_jpeg())
+
+    def capture_jpeg(self) -> bytes:
+        self._check_open()
+        time.sleep(self.capture_delay + self.encode_delay)
+        self.capture_count += 1
+        return self.jpeg_sample
+
+    def capture_array(self):
+        self._check_open()
+        time.sleep(self.capture_delay)
+        self.capture_count += 1
+        if self.burst_frames is None:
+            import numpy as np
+            return np.full((240, 320, 3), 128, dtype=np.uint8)
+        frame = self.burst_frames[self._burst_index % len(self.burst_frames)]
+        self._burst_index += 1
+        return frame
+
+    def encode_jpeg(self, frame, quality: int) -> bytes:
+        time.sleep(self.encode_delay)
+        return self.jpeg_sample
+
+    def capture_lores(self):
+        self._check_open()
+        if self._lores_size is None:
+            raise RuntimeError("Fake camera is not configured with a lores stream")
+        if self.lores_frames is None:
+            import numpy as np
+            width, height = self._lores_size
+            return np.zeros((height, width), dtype=np.uint8)
+        frame = self.lores_frames[self._lores_index % len(self.lores_frames)]
+        self._lores_index += 1
+        return frame
+
+    def record_h264(self, path: str, duration: float, bitrate: int, stop_event: threading.Event = None):
+        self._check_open()
+        started = time.monotonic()
+        (stop_event or threading.Event()).wait(duration)
+        time.sleep(self.encode_delay)
+        if self.h264_sample is not None:
+            Path(path).write_bytes(Path(self.h264_sample).read_bytes())
+        else:
+            Path(path).write_bytes(bytes(int(bitrate / 8 * (time.monotonic() - started))))
+        self.record_count += 1
+
+    def start_frame_encoder(self, sink, bitrate: int, framerate: float):
+        self._check_open()
+        frame_size = max(1, int(bitrate / 8 / framerate))
+
+        def produce():
+            index = 0
+            while not self._frame_stop.wait(1 / framerate):
+                sink.write_frame(bytes(frame_size), index % int(framerate) == 0)
+                index += 1
+
+        self._frame_stop.clear()
+        self._frame_thread = threading.Thread(target=produce, name="fake-encoder", daemon=True)
+        self._frame_thread.start()
+
+    def stop_frame_encoder(self):
+        if self._frame_thread is not None:
+            self._frame_stop.set()
+            self._frame_thread.join()
+            self._frame_thread = None
+
+
+BACKENDS = {
+    'picamera2': Picamera2Backend,
+    'fake': FakeCameraBackend,
+}
+
+
+def create_backend(name: str) -> CameraBackend:
+    """Create a camera backend by its configured name."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown camera backend: {name}") from None
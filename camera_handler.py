@@ -1,20 +1,60 @@
 import threading
+import time
 from datetime import datetime
-from picamera2 import Picamera2
-from picamera2.encoders import Quality
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
 from config import (
-    VIDEO_SIZE, PHOTO_SIZE, CAMERA_TIMEOUT, CAMERA_WARMUP,
-    VIDEO_DIR, IMAGE_DIR, FILE_DATE_FORMAT
+    VIDEO_SIZE, VIDEO_FRAMERATE, PHOTO_SIZE, CAMERA_TIMEOUT, CAMERA_IDLE_TIMEOUT, CAMERA_BACKEND,
+    VIDEO_DIR, IMAGE_DIR, BURST_DIR, FILE_DATE_FORMAT, PREROLL_ENABLED, PREROLL_SECONDS,
+    PREROLL_MAX_BYTES, PREROLL_BITRATE, MOTION_ENABLED, MOTION_LORES_SIZE, BURST_JPEG_QUALITY,
+    CAMERA_STILL_HOLD, SNAPSHOT_JPEG_QUALITY
 )
+from camera_backend import CameraBackend, create_backend
 from file_manager import FileManager
+from metrics import span
+from preroll import FrameRingBuffer, write_mp4
+from video_output import mux_h264, target_bitrate
 
 logger = logging.getLogger(__name__)
 
+class CapturedPhoto(NamedTuple):
+    """JPEG captured into memory; saved is resolved once the file is on disk."""
+    data: bytes
+    path: str
+    saved: Future
+
+
 class CameraHandler:
-    def __init__(self):
+    """Long-lived camera session shared by all requests.
+
+    The camera is opened on first use, switched between still and video
+    configurations as needed and closed after CAMERA_IDLE_TIMEOUT seconds
+    without requests.
+
+    With PREROLL_ENABLED the session instead stays in video mode with a
+    low-bitrate encoder feeding a ring buffer, so videos can include footage
+    from before the request. Still captures pause the ring buffer, and it is
+    restarted in the background afterwards.
+
+    With MOTION_ENABLED video mode also produces a low-resolution stream
+    which capture_lores() reads for motion detection between requests.
+    """
+
+    def __init__(self, backend: CameraBackend = None, file_manager: FileManager = None):
         self.camera_lock = threading.Lock()
-        self.file_manager = FileManager()
+        self.file_manager = file_manager or FileManager()
+        self.backend = backend or create_backend(CAMERA_BACKEND)
+        self._is_open = False
+        self._mode = None
+        self._last_used = time.monotonic()
+        self._still_used_at = float('-inf')
+        self._idle_timer = None
+        self.preroll = FrameRingBuffer(PREROLL_SECONDS, PREROLL_MAX_BYTES) if PREROLL_ENABLED else None
+        self._preroll_running = False
+        self.motion_active = False
+        # Encodes the frames kept from bursts off the camera thread
+        self._burst_encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="burst-encode")
         self._ensure_directories()
 
     def _ensure_directories(self):
@@ -22,58 +62,400 @@ class CameraHandler:
         VIDEO_DIR.mkdir(exist_ok=True)
         IMAGE_DIR.mkdir(exist_ok=True)
 
-    def _get_camera(self):
-        """Get camera instance with lock."""
-        if not self.camera_lock.acquire(timeout=CAMERA_TIMEOUT):
+    @property
+    def is_open(self) -> bool:
+        """Whether the camera session is currently running."""
+        return self._is_open
+
+    def _get_camera(self, mode: str, hold_still: bool = True) -> CameraBackend:
+        """Get the running camera in the requested mode, holding the lock."""
+        with span('camera_lock_wait'):
+            acquired = self.camera_lock.acquire(timeout=CAMERA_TIMEOUT)
+        if not acquired:
             raise RuntimeError("Camera is currently in use")
-        return Picamera2()
+        return self._prepare_camera(mode, hold_still)
+
+    def _prepare_camera(self, mode: str, hold_still: bool = True) -> CameraBackend:
+        """Open and configure the camera; the caller must hold camera_lock, which is released on error.
+
+        Still captures start the CAMERA_STILL_HOLD unless hold_still is False.
+        """
+        try:
+            self._cancel_idle_timer()
+            if mode == 'still' and hold_still:
+                self._still_used_at = time.monotonic()
+            if not self._is_open:
+                with span('camera_open'):
+                    self.backend.open()
+                self._is_open = True
+                logger.info("Camera session opened")
+            if self._mode != mode:
+                self._stop_preroll_encoder()
+                # Forget the mode first so a failed reconfiguration is retried next time
+                self._mode = None
+                with span('camera_configure'):
+                    if mode == 'video':
+                        lores_size = MOTION_LORES_SIZE if MOTION_ENABLED else None
+                        self.backend.configure_video(VIDEO_SIZE, VIDEO_FRAMERATE, lores_size)
+                    else:
+                        self.backend.configure_still(PHOTO_SIZE)
+                self._mode = mode
+                logger.debug(f"Camera configured for {mode}")
+            return self.backend
+        except Exception:
+            self._close_session()
+            self.camera_lock.release()
+            raise
+
+    def _release_camera(self, resume_preroll: bool = True):
+        """Release the lock and keep the session warm until the idle timeout."""
+        try:
+            self._last_used = time.monotonic()
+            self._schedule_idle_timer()
+            resume_preroll = resume_preroll and self.preroll is not None and not self._preroll_running
+        finally:
+            self.camera_lock.release()
+        if resume_preroll:
+            threading.Thread(target=self._resume_preroll, name="preroll-resume", daemon=True).start()
+
+    def _start_preroll_encoder(self):
+        """Start feeding the ring buffer; the camera must be locked in video mode."""
+        if not self._preroll_running:
+            self.backend.start_frame_encoder(self.preroll, PREROLL_BITRATE, VIDEO_FRAMERATE)
+            self._preroll_running = True
+            logger.debug("Pre-roll recording started")
+
+    def _stop_preroll_encoder(self):
+        """Stop feeding the ring buffer; its footage is no longer continuous."""
+        if self._preroll_running:
+            self._preroll_running = False
+            self.backend.stop_frame_encoder()
+            self.preroll.clear()
+            logger.debug("Pre-roll recording paused")
+
+    def start_preroll(self):
+        """Put the camera in video mode and start the pre-roll ring buffer."""
+        self._get_camera('video')
+        try:
+            self._start_preroll_encoder()
+        finally:
+            self._release_camera(resume_preroll=False)
+
+    def warm_up(self):
+        """Open and configure the camera ahead of the first request.
+
+        Uses the configuration the first request most likely needs: video
+        when pre-roll or motion detection keep the camera in video mode,
+        still otherwise. The session then idles as after any request, without
+        holding still mode against snapshots and motion detection.
+        """
+        mode = 'video' if self.preroll is not None or MOTION_ENABLED else 'still'
+        self._get_camera(mode, hold_still=False)
+        self._release_camera(resume_preroll=False)
+
+    def capture_test_jpeg(self) -> bytes:
+        """Capture a still into memory without saving it, to check that the camera works."""
+        camera = self._get_camera('still', hold_still=False)
+        try:
+            with span('capture'):
+                return camera.capture_jpeg()
+        finally:
+            self._release_camera()
+
+    def capture_frame(self, timeout: float) -> bytes:
+        """JPEG of the video stream, e.g. for a timelapse; None if the camera stays busy for timeout seconds.
+
+        Uses the video configuration so frames never force a switch away
+        from pre-roll recording or motion detection.
+        """
+        with span('camera_lock_wait'):
+            if not self.camera_lock.acquire(timeout=timeout):
+                return None
+        camera = self._prepare_camera('video')
+        try:
+            with span('capture_frame'):
+                return camera.capture_jpeg()
+        finally:
+            self._release_camera()
+
+    def capture_snapshot(self, quality: int = SNAPSHOT_JPEG_QUALITY, wait: bool = False) -> bytes:
+        """JPEG of the current video frame, or None while a request is using the camera.
+
+        Like capture_lores it never waits for the lock and leaves the camera
+        in still mode for CAMERA_STILL_HOLD seconds after a photo, unless wait
+        is set, as for a snapshot asked for while none is cached. The frame
+        is encoded after the camera is released.
+        """
+        if wait:
+            camera = self._get_camera('video')
+        else:
+            if not self.camera_lock.acquire(blocking=False):
+                return None
+            if self._holding_still():
+                self.camera_lock.release()
+                return None
+            camera = self._prepare_camera('video')
+        try:
+            with span('capture_frame'):
+                frame = camera.capture_array()
+        finally:
+            self._release_camera()
+        with span('snapshot_encode'):
+            return camera.encode_jpeg(frame, quality)
+
+    def _holding_still(self) -> bool:
+        """Whether the camera is in still mode and took a photo in the last CAMERA_STILL_HOLD seconds.
+
+        Background readers leave it in still mode then, so a following photo
+        does not pay for switching back.
+        """
+        return self._mode == 'still' and time.monotonic() - self._still_used_at < CAMERA_STILL_HOLD
+
+    def capture_lores(self):
+        """Current low-resolution luminance frame, or None while a request is using the camera.
+
+        Never waits for the lock, so motion detection simply skips frames
+        while photos and videos are taken, and for CAMERA_STILL_HOLD seconds
+        after a photo.
+        """
+        if not self.camera_lock.acquire(blocking=False):
+            return None
+        if self._holding_still():
+            self.camera_lock.release()
+            return None
+        if self._mode != 'video':
+            self._prepare_camera('video')
+        try:
+            if self.preroll is not None and not self._preroll_running:
+                self._start_preroll_encoder()
+            return self.backend.capture_lores()
+        finally:
+            self._last_used = time.monotonic()
+            self.camera_lock.release()
+
+    def _resume_preroll(self):
+        try:
+            self.start_preroll()
+        except Exception as e:
+            logger.error(f"Error resuming pre-roll recording: {e}", exc_info=True)
+
+    def _schedule_idle_timer(self):
+        """(Re)start the timer that closes an unused camera session."""
+        self._cancel_idle_timer()
+        if CAMERA_IDLE_TIMEOUT is None or self.preroll is not None or self.motion_active:
+            return
+        self._idle_timer = threading.Timer(CAMERA_IDLE_TIMEOUT, self._close_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
 
-    def _release_camera(self, camera):
-        """Release camera resources and lock."""
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _close_if_idle(self):
+        """Idle timer callback; skipped if the camera is busy or was used recently."""
+        if not self.camera_lock.acquire(blocking=False):
+            return
         try:
-            camera.close()
+            if time.monotonic() - self._last_used >= CAMERA_IDLE_TIMEOUT:
+                logger.info("Closing idle camera session")
+                self._close_session()
         finally:
             self.camera_lock.release()
 
-    def record_video(self, duration: int) -> str:
+    def _close_session(self):
+        """Close the backend; the caller must hold camera_lock."""
+        self._mode = None
+        if self._preroll_running:
+            self._preroll_running = False
+            self.preroll.clear()
+        if not self._is_open:
+            return
+        self._is_open = False
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.error(f"Error closing camera: {e}", exc_info=True)
+
+    def close(self):
+        """Shut down the camera session."""
+        self._cancel_idle_timer()
+        with self.camera_lock:
+            self._close_session()
+
+    def record_video(self, duration: int, stop_event: threading.Event = None) -> str:
         """Record a video for the specified duration."""
         timestamp = datetime.now().strftime(FILE_DATE_FORMAT)
         output_file = VIDEO_DIR / f"{timestamp}_now.mp4"
+        if self.preroll is not None:
+            return self._record_from_preroll(output_file, PREROLL_SECONDS, duration, stop_event)
 
-        camera = self._get_camera()
+        # Record the raw stream under the lock, then mux it into an MP4 without holding the camera
+        h264_file = VIDEO_DIR / f".{timestamp}_now.h264"
+        camera = self._get_camera('video')
         try:
-            camera.video_configuration.size = VIDEO_SIZE
-            logger.debug("Camera initialized for video recording")
-            
-            camera.start_and_record_video(str(output_file), duration=duration, quality=Quality.VERY_HIGH)
-            self.file_manager.cleanup_old_files()  # Clean up old files after recording
-            return str(output_file)
-
+            with span('record'):
+                camera.record_h264(str(h264_file), duration, target_bitrate(duration), stop_event)
         except Exception as e:
             logger.error(f"Error during video recording: {e}", exc_info=True)
+            self._close_session()
+            h264_file.unlink(missing_ok=True)
             raise
         finally:
-            camera.stop_recording()
-            self._release_camera(camera)
+            self._release_camera()
+
+        try:
+            with span('mux'):
+                mux_h264(h264_file, output_file, VIDEO_FRAMERATE)
+        except Exception as e:
+            logger.error(f"Error writing video: {e}", exc_info=True)
+            raise
+        finally:
+            h264_file.unlink(missing_ok=True)
+        self.file_manager.add_file(output_file)
+        self.file_manager.request_cleanup()
+        return str(output_file)
+
+    def _record_from_preroll(self, output_file, preroll: float, duration: float,
+                             stop_event: threading.Event = None) -> str:
+        """Write the last preroll seconds plus duration seconds of live footage from the ring buffer."""
+        self._get_camera('video')
+        try:
+            self._start_preroll_encoder()
+            tap = self.preroll.start_tap(preroll)
+            try:
+                (stop_event or threading.Event()).wait(duration)
+            finally:
+                self.preroll.stop_tap(tap)
+        finally:
+            self._release_camera()
+
+        try:
+            with span('mux'):
+                write_mp4(tap, output_file, VIDEO_FRAMERATE)
+        except Exception as e:
+            logger.error(f"Error writing pre-roll video: {e}", exc_info=True)
+            raise
+        self.file_manager.add_file(output_file)
+        self.file_manager.request_cleanup()
+        return str(output_file)
+
+    def save_preroll(self, seconds: float) -> str:
+        """Write the last seconds of buffered footage to a video without waiting for new frames."""
+        if self.preroll is None:
+            raise RuntimeError("Pre-roll recording is disabled")
+        frames = self.preroll.snapshot(seconds)
+        if not frames:
+            raise RuntimeError("No pre-roll footage available yet")
+        timestamp = datetime.now().strftime(FILE_DATE_FORMAT)
+        output_file = VIDEO_DIR / f"{timestamp}_last.mp4"
+        write_mp4(frames, output_file, VIDEO_FRAMERATE)
+        self.file_manager.add_file(output_file)
+        self.file_manager.request_cleanup()
+        return str(output_file)
 
     def capture_photo(self) -> str:
         """Capture a single photo."""
         timestamp = datetime.now().strftime(FILE_DATE_FORMAT)
         photo_path = IMAGE_DIR / f"{timestamp}.jpg"
 
-        camera = self._get_camera()
+        camera = self._get_camera('still')
         try:
-            camera_config = camera.create_still_configuration(main={"size": PHOTO_SIZE})
-            camera.configure(camera_config)
-            camera.start()
-            logger.debug("Camera initialized for photo capture")
-            
-            camera.capture_file(str(photo_path))
-            self.file_manager.cleanup_old_files()  # Clean up old files after capturing
+            with span('capture'):
+                camera.capture_file(str(photo_path))
+            self.file_manager.add_file(photo_path)
+            self.file_manager.request_cleanup()
             return str(photo_path)
 
         except Exception as e:
             logger.error(f"Error capturing photo: {e}", exc_info=True)
+            self._close_session()
+            raise
+        finally:
+            self._release_camera()
+
+    def start_burst(self, count: int, keep: int = 1) -> list:
+        """Capture count frames in quick succession and keep the keep sharpest, sharpest first.
+
+        Frames are scored as they arrive, and each frame that makes the cut
+        is handed to the burst encoder right away, so only frames waiting to
+        be encoded are held in full and encoding never blocks the camera.
+        Returns futures of CapturedPhoto tuples, saved to disk in the
+        background once encoded.
+        """
+        from sharpness import SharpestFrames
+
+        timestamp = datetime.now().strftime(FILE_DATE_FORMAT)
+        frames = SharpestFrames(keep)
+        camera = self._get_camera('still')
+
+        def encode(frame) -> Future:
+            return self._burst_encoder.submit(self._encode_burst_frame, camera, frame)
+
+        try:
+            for _ in range(count):
+                with span('capture'):
+                    frame = camera.capture_array()
+                with span('burst_score'):
+                    dropped = frames.add(frame, encode)
+                if dropped is not None:
+                    dropped.cancel()
+        except Exception as e:
+            logger.error(f"Error capturing burst: {e}", exc_info=True)
+            for _, _, encoded in frames.best():
+                encoded.cancel()
+            self._close_session()
+            raise
+        finally:
+            self._release_camera()
+        logger.debug(f"Burst sharpness scores: {[round(score) for score in frames.scores]}")
+
+        return [
+            self._save_when_encoded(encoded, BURST_DIR / f"{timestamp}_burst{index + 1:02d}.jpg")
+            for _, index, encoded in frames.best()
+        ]
+
+    def capture_burst(self, count: int, keep: int = 1) -> list:
+        """Like start_burst, but waits for the encoding and returns the CapturedPhoto tuples."""
+        return [photo.result() for photo in self.start_burst(count, keep)]
+
+    @staticmethod
+    def _encode_burst_frame(camera: CameraBackend, frame) -> bytes:
+        with span('burst_encode'):
+            return camera.encode_jpeg(frame, BURST_JPEG_QUALITY)
+
+    def _save_when_encoded(self, encoded: Future, path) -> Future:
+        """Future of the CapturedPhoto of an encoding frame, which is saved to path once encoded."""
+        photo = Future()
+
+        def save(encoded: Future):
+            if encoded.cancelled():
+                photo.cancel()
+            elif encoded.exception() is not None:
+                photo.set_exception(encoded.exception())
+            else:
+                data = encoded.result()
+                photo.set_result(CapturedPhoto(data, str(path), self.file_manager.save_in_background(path, data)))
+
+        encoded.add_done_callback(save)
+        return photo
+
+    def capture_photo_data(self) -> CapturedPhoto:
+        """Capture a photo into memory and save it to disk in the background."""
+        timestamp = datetime.now().strftime(FILE_DATE_FORMAT)
+        photo_path = IMAGE_DIR / f"{timestamp}.jpg"
+
+        camera = self._get_camera('still')
+        try:
+            with span('capture'):
+                data = camera.capture_jpeg()
+        except Exception as e:
+            logger.error(f"Error capturing photo: {e}", exc_info=True)
+            self._close_session()
             raise
         finally:
-            self._release_camera(camera) 
\ No newline at end of file
+            self._release_camera()
+
+        saved = self.file_manager.save_in_background(photo_path, data)
+        return CapturedPhoto(data, str(photo_path), saved)
@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from config import (
+    SCHEDULER_MAX_QUEUE, SCHEDULER_MAX_JOBS_PER_USER, SCHEDULER_USER_RATE,
+    SCHEDULER_USER_BURST, SCHEDULER_PHOTO_ESTIMATE, SCHEDULER_BURST_ESTIMATE,
+    SCHEDULER_VIDEO_OVERHEAD
+)
+from metrics import REGISTRY, STAGE_SECONDS
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+REJECTED_JOBS = REGISTRY.counter(
+    'picamera_scheduler_rejected_total', 'Camera jobs refused by admission control', ('reason',)
+)
+
+# Lower value runs first: short photos go before bursts, and bursts before long videos
+PRIORITIES = {'photo': 0, 'burst': 1, 'video': 2}
+
+# Weight of the newest sample in the running job-duration estimates
+_ESTIMATE_WEIGHT = 0.2
+
+
+class CameraBusyError(RuntimeError):
+    """A camera job was not admitted; the message can be shown to the user."""
+
+
+class QueueFullError(CameraBusyError):
+    """The camera queue is full."""
+
+
+class RateLimitedError(CameraBusyError):
+    """The user has too many jobs queued or submitted too many recently."""
+
+
+class CameraJob:
+    """A queued camera request; await it for the result."""
+
+    def __init__(self, kind: str, user_id, run, duration: float = 0):
+        self.kind = kind
+        self.user_id = user_id
+        self.duration = duration
+        self.run = run  # coroutine function producing the result
+        self.future = asyncio.get_running_loop().create_future()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.position = 0   # jobs ahead of this one when submitted, including the running ones
+        self.eta = 0.0      # estimated seconds until this job starts
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class CameraScheduler:
+    """Orders camera jobs in front of AsyncCameraHandler.
+
+    Jobs are served by priority (photos first) and round-robin between users
+    within a priority, so one user's burst cannot delay everybody else. The
+    queue is bounded and each user is limited to SCHEDULER_MAX_JOBS_PER_USER
+    pending jobs and a token-bucket submission rate. Queued photo jobs are
+    started together so they coalesce into a single capture; bursts do not
+    coalesce and run one at a time like videos.
+    """
+
+    def __init__(self, max_queue: int = SCHEDULER_MAX_QUEUE,
+                 max_jobs_per_user: int = SCHEDULER_MAX_JOBS_PER_USER,
+                 user_rate: float = SCHEDULER_USER_RATE, user_burst: float = SCHEDULER_USER_BURST,
+                 photo_estimate: float = SCHEDULER_PHOTO_ESTIMATE,
+                 burst_estimate: float = SCHEDULER_BURST_ESTIMATE,
+                 video_overhead: float = SCHEDULER_VIDEO_OVERHEAD):
+        self.max_queue = max_queue
+        self.max_jobs_per_user = max_jobs_per_user
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        # priority -> user_id -> deque of jobs; user order is the round-robin order
+        self._queues = {priority: OrderedDict() for priority in sorted(set(PRIORITIES.values()))}
+        self._queued = 0
+        self._running = set()
+        self._buckets = {}
+        self._estimates = {'photo': photo_estimate, 'burst': burst_estimate, 'video': video_overhead}
+        self._wakeup = asyncio.Event()
+        self._worker = None
+        self._stopped = False
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting to start."""
+        return self._queued
+
+    def start(self):
+        """Start dispatching jobs; call from the running event loop."""
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    async def drain(self, timeout: float):
+        """Wait up to timeout seconds for the queued and running jobs to finish."""
+        deadline = time.monotonic() + timeout
+        while (self._queued or self._running) and time.monotonic() < deadline:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+        if self._queued or self._running:
+            logger.warning(f"{self._queued} queued and {len(self._running)} running camera jobs left after draining")
+
+    async def stop(self):
+        """Stop dispatching, fail the jobs still queued and refuse new ones."""
+        self._stopped = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for users in self._queues.values():
+            for jobs in users.values():
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(CameraBusyError("The bot is restarting, please try again shortly"))
+            users.clear()
+        self._queued = 0
+
+    def _estimate(self, job: CameraJob) -> float:
+        """Expected run time of a job in seconds."""
+        if job.kind == 'video':
+            return job.duration + self._estimates['video']
+        return self._estimates[job.kind]
+
+    def _record_duration(self, job: CameraJob, seconds: float):
+        key = job.kind
+        sample = seconds - job.duration if job.kind == 'video' else seconds
+        self._estimates[key] += _ESTIMATE_WEIGHT * (sample - self._estimates[key])
+
+    def _user_pending(self, user_id) -> int:
+        queued = sum(len(users.get(user_id, ())) for users in self._queues.values())
+        return queued + sum(1 for job in self._running if job.user_id == user_id)
+
+    def _dispatch_order(self) -> list:
+        """Queued jobs in the order they will start."""
+        order = []
+        for users in self._queues.values():
+            queues = [list(jobs) for jobs in users.values()]
+            for round_index in range(max((len(jobs) for jobs in queues), default=0)):
+                order.extend(jobs[round_index] for jobs in queues if round_index < len(jobs))
+        return order
+
+    def submit(self, kind: str, user_id, run, duration: float = 0) -> CameraJob:
+        """Queue a camera job after admission control.
+
+        run is a coroutine function returning the job's result. Raises
+        QueueFullError or RateLimitedError if the job is not admitted.
+        """
+        if self._stopped:
+            raise CameraBusyError("The bot is restarting, please try again shortly")
+        if self._queued >= self.max_queue:
+            REJECTED_JOBS.labels('queue_full').inc()
+            raise QueueFullError("The camera is busy right now, please try again in a minute")
+        if self._user_pending(user_id) >= self.max_jobs_per_user:
+            REJECTED_JOBS.labels('user_pending').inc()
+            raise RateLimitedError("Please wait for your previous request to finish")
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        if not bucket.try_acquire():
+            REJECTED_JOBS.labels('user_rate').inc()
+            raise RateLimitedError(f"Too many requests, please try again in {bucket.delay():.0f} seconds")
+        # Forget buckets of users who have been quiet long enough to refill
+        for idle_user in [user for user, other in self._buckets.items() if other.is_full()]:
+            del self._buckets[idle_user]
+
+        job = CameraJob(kind, user_id, run, duration)
+        self._queues[PRIORITIES[kind]].setdefault(user_id, deque()).append(job)
+        self._queued += 1
+
+        now = time.monotonic()
+        running_left = max(
+            (self._estimate(other) - (now - other.started_at) for other in self._running), default=0
+        )
+        if job.kind == 'photo':
+            ahead = []  # queued photos start together with this one
+        else:
+            ahead = self._dispatch_order()
+            ahead = ahead[:ahead.index(job)]
+        job.position = len(self._running) + len(ahead)
+        # Queued photos start together, so they cost one capture however many there are
+        photos_ahead = any(other.kind == 'photo' for other in ahead)
+        job.eta = (max(running_left, 0) + photos_ahead * self._estimates['photo']
+                   + sum(self._estimate(other) for other in ahead if other.kind != 'photo'))
+        self._wakeup.set()
+        return job
+
+    def _pop_next(self) -> list:
+        """Take the next jobs to start: one video, or every queued photo."""
+        for priority, users in self._queues.items():
+            if not users:
+                continue
+            user_id, jobs = next(iter(users.items()))
+            job = jobs.popleft()
+            if jobs:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            batch = [job]
+            if job.kind == 'photo':
+                # Every queued photo shares the same capture, so start them together
+                for other_user in list(users):
+                    batch.extend(users.pop(other_user))
+            self._queued -= len(batch)
+            return batch
+        return []
+
+    async def _dispatch_loop(self):
+        while True:
+            if self._running or not self._queued:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = self._pop_next()
+            for job in batch:
+                job.started_at = time.monotonic()
+                STAGE_SECONDS.labels('queue_wait').observe(job.started_at - job.submitted_at)
+                self._running.add(job)
+            await asyncio.gather(*(self._execute(job) for job in batch))
+
+    async def _execute(self, job: CameraJob):
+        ran = False
+        try:
+            if job.future.done():  # cancelled while queued
+                return
+            ran = True
+            result = await job.run()
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            # stop() cancels running jobs; their awaiters must not wait forever
+            if not job.future.done():
+                job.future.set_exception(CameraBusyError("The bot is restarting, please try again shortly"))
+            self._running.discard(job)
+            # Jobs cancelled while queued never ran and would drag the estimate towards zero
+            if ran:
+                self._record_duration(job, time.monotonic() - job.started_at)
+                logger.debug(
+                    f"{job.kind} job for {job.user_id} waited {job.started_at - job.submitted_at:.2f}s, "
+                    f"ran {time.monotonic() - job.started_at:.2f}s"
+                )
+            self._wakeup.set()
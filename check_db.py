@@ -1,61 +1,170 @@
+import argparse
+import random
 import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from config import DB_FILE
+from deploy_db import migrate
 
-# Database file path
-DB_FILE = "bot_interactions.db"
 
-def fetch_last_five_rows():
-    """Fetch and display info about users."""
+def print_table(headers, rows):
+    """Print rows as an aligned text table."""
+    if not rows:
+        print("No data found.")
+        return
+
+    # Calculate column widths
+    col_widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
+    col_widths = [max(len(header), width) for header, width in zip(headers, col_widths)]
+
+    # Print the table header
+    header_row = " | ".join(f"{header:<{col_widths[i]}}" for i, header in enumerate(headers))
+    print(header_row)
+    print("-" * len(header_row))
+
+    # Print the table rows
+    for row in rows:
+        print(" | ".join(f"{str(row[i]):<{col_widths[i]}}" for i in range(len(headers))))
+
+
+def fetch_last_actions(conn, limit=None):
+    """Last action of every user, most recent first."""
+    return conn.execute(
+        "SELECT interaction_id, user_id, timestamp, command FROM user_last_action ORDER BY ts DESC LIMIT ?",
+        (-1 if limit is None else limit,)
+    ).fetchall()
+
+
+def fetch_top_users(conn, limit=10):
+    """Users with the most interactions."""
+    return conn.execute(
+        "SELECT user_id, total, timestamp FROM user_last_action ORDER BY total DESC, user_id LIMIT ?",
+        (limit,)
+    ).fetchall()
+
+
+def fetch_commands_per_hour(conn, hours=24):
+    """Command counts per hour for the last hours."""
+    since = (int(time.time()) - hours * 3600) // 3600 * 3600
+    return conn.execute(
+        """
+        SELECT strftime('%Y-%m-%d %H:00', hour, 'unixepoch', 'localtime'), command, count
+        FROM command_hourly
+        WHERE hour >= ?
+        ORDER BY hour DESC, count DESC
+        """,
+        (since,)
+    ).fetchall()
+
+
+def fetch_commands_per_day(conn, days=7):
+    """Command counts per day for the last days."""
+    return conn.execute(
+        """
+        SELECT day, command, count
+        FROM command_daily
+        WHERE day >= date('now', 'localtime', ?)
+        ORDER BY day DESC, count DESC
+        """,
+        (f"-{days - 1} days",)
+    ).fetchall()
+
+
+def fetch_last_actions_full_scan(conn):
+    """Last action of every user computed from the raw table (the pre-rollup query)."""
+    return conn.execute("""
+       SELECT id, user_id, timestamp, command
+       FROM (
+           SELECT id, user_id, timestamp, command,
+                  ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY TIMESTAMP DESC) AS rn
+           FROM interactions
+       ) t
+       WHERE rn = 1;
+    """).fetchall()
+
+
+def benchmark(rows: int, users: int):
+    """Compare the full-scan report with the rollup reports on a synthetic database."""
+    commands = ["/start", "📸 Capture Photo", "📹 Record Video", "🎥 Show Latest Video",
+                "🖼️ Show Latest Photo", "callback:star"]
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "bench.db")
+        migrate(conn)
+        now = int(time.time())
+        started = time.perf_counter()
+        batch = []
+        for i in range(rows):
+            ts = now - random.randrange(30 * 86400)
+            batch.append((f"user{random.randrange(users)}", time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)),
+                          ts, random.choice(commands)))
+            if len(batch) == 10000:
+                with conn:
+                    conn.executemany("INSERT INTO interactions (user_id, timestamp, ts, command) VALUES (?, ?, ?, ?)", batch)
+                batch = []
+        if batch:
+            with conn:
+                conn.executemany("INSERT INTO interactions (user_id, timestamp, ts, command) VALUES (?, ?, ?, ?)", batch)
+        insert_seconds = time.perf_counter() - started
+        print(f"Inserted {rows} rows for {users} users in {insert_seconds:.1f}s "
+              f"({rows / insert_seconds:.0f} rows/s including rollup triggers)")
+
+        reports = [
+            ("full scan (window function)", lambda: fetch_last_actions_full_scan(conn)),
+            ("last actions (rollup)", lambda: fetch_last_actions(conn)),
+            ("top users (rollup)", lambda: fetch_top_users(conn)),
+            ("commands per hour (rollup)", lambda: fetch_commands_per_hour(conn)),
+            ("commands per day (rollup)", lambda: fetch_commands_per_day(conn)),
+        ]
+        results = []
+        for name, report in reports:
+            started = time.perf_counter()
+            report()
+            results.append((name, f"{(time.perf_counter() - started) * 1000:.2f}"))
+        conn.close()
+    print_table(["Report", "Time, ms"], results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot interaction reports")
+    parser.add_argument("--db", default=str(DB_FILE), help="database file")
+    subparsers = parser.add_subparsers(dest="report")
+    last = subparsers.add_parser("last", help="last action of every user (default)")
+    last.add_argument("--limit", type=int)
+    top = subparsers.add_parser("top-users", help="users with the most interactions")
+    top.add_argument("--limit", type=int, default=10)
+    hourly = subparsers.add_parser("per-hour", help="commands per hour")
+    hourly.add_argument("--hours", type=int, default=24)
+    daily = subparsers.add_parser("per-day", help="commands per day")
+    daily.add_argument("--days", type=int, default=7)
+    bench = subparsers.add_parser("bench", help="benchmark reports on a synthetic database")
+    bench.add_argument("--rows", type=int, default=1_000_000)
+    bench.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.report == "bench":
+        benchmark(args.rows, args.users)
+        return
+
+    conn = None
     try:
-        # Connect to the SQLite database
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-           SELECT
-               id, 
-               user_id,
-               timestamp,
-               command
-           FROM
-               (
-                   SELECT
-                       id,
-                       user_id,
-                       timestamp,
-                       command,
-                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY TIMESTAMP DESC) AS rn
-                   FROM
-                       interactions
-               ) t
-           WHERE
-               rn = 1;
-        """)
-
-        # Fetch the rows and display them
-        rows = cursor.fetchall()
-        if rows:
-            # Define headers
-            headers = ["Last action ID", "User name", "Timestamp", "Command"]
-
-            # Calculate column widths
-            col_widths = [max(len(str(row[i])) for row in rows) for i in range(len(headers))]
-            col_widths = [max(len(header), width) for header, width in zip(headers, col_widths)]
-
-            # Print the table header
-            header_row = " | ".join(f"{header:<{col_widths[i]}}" for i, header in enumerate(headers))
-            print(header_row)
-            print("-" * len(header_row))
-
-            # Print the table rows
-            for row in rows:
-                print(" | ".join(f"{str(row[i]):<{col_widths[i]}}" for i in range(len(headers))))
+        conn = sqlite3.connect(args.db)
+        migrate(conn)
+        if args.report == "top-users":
+            print_table(["User name", "Interactions", "Last seen"], fetch_top_users(conn, args.limit))
+        elif args.report == "per-hour":
+            print_table(["Hour", "Command", "Count"], fetch_commands_per_hour(conn, args.hours))
+        elif args.report == "per-day":
+            print_table(["Day", "Command", "Count"], fetch_commands_per_day(conn, args.days))
         else:
-            print("No data found in the interactions table.")
-
+            print_table(["Last action ID", "User name", "Timestamp", "Command"],
+                        fetch_last_actions(conn, getattr(args, "limit", None)))
     except Exception as e:
         print(f"Error fetching data: {e}")
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
+
 
 if __name__ == "__main__":
-    fetch_last_five_rows()
+    main()
@@ -1,22 +1,159 @@
+import os
 from pathlib import Path
 
 # Base paths
 BASE_DIR = Path(__file__).resolve().parent
-IMAGE_DIR = BASE_DIR / 'images'
-VIDEO_DIR = BASE_DIR / 'videos'
+# Media and databases live here; PICAMERA_BOT_DATA_DIR moves them, e.g. for benchmarks
+DATA_DIR = Path(os.environ.get('PICAMERA_BOT_DATA_DIR', BASE_DIR))
+IMAGE_DIR = DATA_DIR / 'images'
+VIDEO_DIR = DATA_DIR / 'videos'
+TIMELAPSE_DIR = DATA_DIR / 'timelapses'
+BURST_DIR = DATA_DIR / 'bursts'
+DERIVED_DIR = IMAGE_DIR / 'derived'  # previews and thumbnails of photos
+DB_FILE = DATA_DIR / 'bot_interactions.db'
+LOG_DIR = DATA_DIR / 'logs'
 
 # Camera settings
 VIDEO_SIZE = (800, 600)
+VIDEO_FRAMERATE = 30
 PHOTO_SIZE = (2592, 1944)
 MIN_VIDEO_DURATION = 2
 MAX_VIDEO_DURATION = 30
 CAMERA_TIMEOUT = 10  # seconds
 CAMERA_WARMUP = 2    # seconds
+CAMERA_IDLE_TIMEOUT = 60  # seconds without requests before the camera is closed, None keeps it open
+PHOTO_TIMEOUT = 45   # seconds a photo capture may take once it has left the scheduler queue
+PHOTO_COALESCE_WINDOW = 1.5  # seconds after a capture during which new photo requests reuse it
+VIDEO_TIMEOUT_MARGIN = 30  # seconds allowed on top of the requested video duration
+PHOTO_IN_MEMORY = True  # send photos from memory and save them to disk in the background
+CAMERA_BACKEND = 'picamera2'  # 'picamera2' or 'fake' (in-memory camera for testing)
+CAMERA_PREWARM = True  # open the camera at startup, while the bot itself is loading
+CAMERA_STILL_HOLD = 30  # seconds after a photo before motion detection or snapshots may switch back to video
+
+# Camera job scheduler: photos run before videos, users take turns, and the
+# queue and each user's share of it are bounded
+SCHEDULER_MAX_QUEUE = 20          # queued jobs before new requests are refused
+SCHEDULER_MAX_JOBS_PER_USER = 2   # queued or running jobs per user
+SCHEDULER_USER_RATE = 0.2         # sustained requests per second per user
+SCHEDULER_USER_BURST = 3          # requests a user may make in quick succession
+SCHEDULER_PHOTO_ESTIMATE = 2.0    # initial guess of a photo's duration, refined as jobs run
+SCHEDULER_BURST_ESTIMATE = 5.0    # initial guess of a burst's duration
+SCHEDULER_VIDEO_OVERHEAD = 3.0    # initial guess of a video's time beyond its duration
+
+# Video output: the encoder bitrate is chosen so a clip of the requested
+# duration stays around VIDEO_TARGET_BYTES (Bot API uploads are limited to 50 MB)
+VIDEO_TARGET_BYTES = 16 * 1024 * 1024
+VIDEO_MIN_BITRATE = 500_000     # bits per second
+VIDEO_MAX_BITRATE = 8_000_000   # bits per second
+
+# Photo derivatives: Telegram recompresses photos anyway, so a downscaled
+# preview is sent and the full-resolution file is offered as a document
+PREVIEW_SIZE = (1280, 960)
+THUMBNAIL_SIZE = (320, 240)
+DERIVATIVE_QUALITY = 85
+DERIVATIVE_WORKERS = None  # worker processes, None = one per CPU core
+
+# Pre-roll ring buffer: an always-on low-bitrate recording so videos can
+# include footage from before the request
+PREROLL_ENABLED = False
+PREROLL_SECONDS = 10                  # seconds of footage kept in memory
+PREROLL_MAX_BYTES = 8 * 1024 * 1024   # hard cap on ring buffer memory
+PREROLL_BITRATE = 1_000_000           # bits per second
+
+# Burst photos: the sharpest of BURST_FRAMES frames is sent, or the sharpest few as an album
+BURST_FRAMES = 10
+BURST_MAX_SEND = 10      # Telegram albums hold at most 10 photos
+BURST_SCORE_STEP = 2     # sharpness is scored on every n-th pixel of the green channel
+BURST_JPEG_QUALITY = 90
+
+# Instant snapshots: the latest frame of the video stream, kept in memory and
+# refreshed at SNAPSHOT_FPS while snapshots are being asked for
+SNAPSHOT_ENABLED = True
+SNAPSHOT_FPS = 1
+SNAPSHOT_MAX_AGE = 3.0        # seconds a cached frame may be old to be sent, else a photo is taken
+SNAPSHOT_IDLE_TIMEOUT = 300   # seconds without a snapshot request before refreshing pauses
+SNAPSHOT_JPEG_QUALITY = 80
+
+# Motion detection on the camera's low-resolution stream; keeps the camera
+# open in video mode and pauses while a request is using the camera
+MOTION_ENABLED = False
+MOTION_LORES_SIZE = (320, 240)
+MOTION_FPS = 15
+MOTION_DOWNSCALE = 2            # analyse every n-th pixel of the lores frame
+MOTION_THRESHOLD = 25           # luminance change that counts a pixel as moving
+MOTION_MIN_AREA = 0.01          # share of the watched pixels that must move
+MOTION_MAX_AREA = 0.8           # larger changes are treated as lighting changes
+MOTION_TRIGGER_FRAMES = 3       # consecutive moving frames needed to trigger
+MOTION_BACKGROUND_ALPHA = 0.05  # how fast the background adapts, per frame
+MOTION_REGIONS = []             # watched (left, top, right, bottom) fractions, empty = whole frame
+MOTION_COOLDOWN = 60            # seconds between motion captures
+MOTION_CAPTURE = 'photo'        # 'photo' or 'video'
+MOTION_CLIP_SECONDS = 5
+
+# Timelapses: a frame of the video stream every TIMELAPSE_INTERVAL seconds,
+# encoded as it is captured and played back at TIMELAPSE_FRAMERATE
+TIMELAPSE_INTERVAL = 10          # seconds between frames
+TIMELAPSE_FRAMERATE = 25         # frames per second of the resulting video
+TIMELAPSE_DEFAULT_MINUTES = 60
+TIMELAPSE_MAX_MINUTES = 24 * 60
+TIMELAPSE_CODEC = 'libx264'      # ffmpeg encoder, e.g. 'h264_v4l2m2m' for the Pi's hardware encoder
+
+# Broadcasts to subscribed chats. Telegram allows about 30 messages per second
+# overall and one per second to the same chat
+BROADCAST_CONCURRENCY = 16   # sends in flight
+BROADCAST_RATE = 25          # messages per second overall
+BROADCAST_CHAT_RATE = 1      # messages per second to one chat
+BROADCAST_MAX_RETRIES = 3    # flood-control retries per message
 
 # File management
 FILES_LIMIT_VIDEO = 4
 FILES_LIMIT_IMAGE = 4
 FILE_DATE_FORMAT = '%Y%m%d_%H_%M_%S'
 
+# Retention, enforced by a background thread. Each kind may limit the number
+# of files, their total size in bytes and their age in seconds (None = no limit)
+RETENTION_POLICIES = {
+    'video': {'max_files': FILES_LIMIT_VIDEO, 'max_bytes': 500 * 1024 * 1024, 'max_age': None},
+    'image': {'max_files': FILES_LIMIT_IMAGE, 'max_bytes': 200 * 1024 * 1024, 'max_age': None},
+    'timelapse': {'max_files': 10, 'max_bytes': 500 * 1024 * 1024, 'max_age': 30 * 24 * 3600},
+    # Photos kept from bursts, so a /burst of BURST_MAX_SEND does not push out the other photos
+    'burst': {'max_files': 3 * BURST_MAX_SEND, 'max_bytes': 200 * 1024 * 1024, 'max_age': 7 * 24 * 3600},
+}
+RETENTION_INTERVAL = 300   # seconds between scheduled runs
+RETENTION_BATCH_SIZE = 50  # files deleted before yielding to other threads
+
+# Interaction log (SQLite interactions table)
+INTERACTION_QUEUE_SIZE = 10000     # events buffered in memory before new ones are dropped
+INTERACTION_BATCH_SIZE = 500       # events written per transaction
+INTERACTION_FLUSH_INTERVAL = 0.5   # seconds an event may wait before its batch is written
+
+# Logging: records are queued and written by a background thread
+LOG_FORMAT = 'text'           # 'text' or 'json' (one compact JSON object per line)
+LOG_CONSOLE_LEVEL = 'INFO'
+LOG_FILE_LEVEL = 'DEBUG'
+LOG_LEVELS = {}               # per-module overrides, e.g. {'httpx': 'WARNING', 'camera_handler': 'INFO'}
+LOG_QUEUE_SIZE = 10000        # records waiting to be written before new ones are dropped
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Metrics: Prometheus text format at http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_PORT = 9200         # None disables the endpoint
+METRICS_HOST = '127.0.0.1'  # '' listens on all interfaces
+ADMIN_USER_IDS = []         # Telegram user ids allowed to use /stats
+
+# Update delivery: 'polling', or 'webhook' to have Telegram post updates to a
+# local HTTP server (put a TLS-terminating proxy for WEBHOOK_URL in front of it)
+UPDATE_MODE = 'polling'
+WEBHOOK_LISTEN = '127.0.0.1'
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = 'telegram'
+WEBHOOK_URL = None          # public HTTPS URL registered with Telegram, required in webhook mode
+CONCURRENT_UPDATES = 32     # updates processed at once; updates of one chat stay in order
+DRAIN_TIMEOUT = 30          # seconds queued camera jobs may take to finish on shutdown
+
 # Bot settings
-from settings import TOKEN 
\ No newline at end of file
+from settings import TOKEN
+try:
+    from settings import WEBHOOK_SECRET
+except ImportError:
+    WEBHOOK_SECRET = None   # a random secret is generated for each start 
\ No newline at end of file
@@ -1,7 +1,5 @@
 import sqlite3
-
-# Database file name
-DB_FILE = "bot_interactions.db"
+from config import DB_FILE
 
 # SQL commands to create tables
 CREATE_TABLES = """
@@ -13,19 +11,104 @@ CREATE TABLE IF NOT EXISTS interactions (
 );
 """
 
+# Epoch seconds of a row, for rows written before the ts column existed
+_ROW_TS = "COALESCE({row}.ts, CAST(strftime('%s', {row}.timestamp, 'utc') AS INTEGER))"
+
+# Integer timestamps, a (user_id, ts) index and rollup tables that a trigger
+# keeps up to date on every insert, so reports never scan interactions
+ADD_ROLLUPS = f"""
+ALTER TABLE interactions ADD COLUMN ts INTEGER;
+UPDATE interactions SET ts = {_ROW_TS.format(row='interactions')};
+CREATE INDEX IF NOT EXISTS idx_interactions_user_ts ON interactions (user_id, ts);
+
+CREATE TABLE IF NOT EXISTS user_last_action (
+    user_id TEXT PRIMARY KEY,
+    interaction_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    command TEXT NOT NULL,
+    total INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS command_daily (
+    day TEXT NOT NULL,
+    command TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, command)
+);
+
+CREATE TABLE IF NOT EXISTS command_hourly (
+    hour INTEGER NOT NULL,
+    command TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, command)
+);
+
+INSERT INTO user_last_action (user_id, interaction_id, ts, timestamp, command, total)
+SELECT i.user_id, i.id, i.ts, i.timestamp, i.command, u.total
+FROM (SELECT user_id, MAX(ts) AS ts, COUNT(*) AS total FROM interactions GROUP BY user_id) u
+JOIN interactions i ON i.id = (
+    SELECT MAX(id) FROM interactions WHERE user_id = u.user_id AND ts = u.ts
+);
+
+INSERT INTO command_daily (day, command, count)
+SELECT date(ts, 'unixepoch', 'localtime'), command, COUNT(*) FROM interactions GROUP BY 1, 2;
+
+INSERT INTO command_hourly (hour, command, count)
+SELECT ts / 3600 * 3600, command, COUNT(*) FROM interactions GROUP BY 1, 2;
+
+CREATE TRIGGER IF NOT EXISTS interactions_rollup AFTER INSERT ON interactions
+BEGIN
+    INSERT INTO user_last_action (user_id, interaction_id, ts, timestamp, command, total)
+    VALUES (NEW.user_id, NEW.id, {_ROW_TS.format(row='NEW')}, NEW.timestamp, NEW.command, 1)
+    ON CONFLICT (user_id) DO UPDATE SET
+        total = total + 1,
+        interaction_id = CASE WHEN excluded.ts >= ts THEN excluded.interaction_id ELSE interaction_id END,
+        timestamp = CASE WHEN excluded.ts >= ts THEN excluded.timestamp ELSE timestamp END,
+        command = CASE WHEN excluded.ts >= ts THEN excluded.command ELSE command END,
+        ts = MAX(ts, excluded.ts);
+
+    INSERT INTO command_daily (day, command, count)
+    VALUES (date({_ROW_TS.format(row='NEW')}, 'unixepoch', 'localtime'), NEW.command, 1)
+    ON CONFLICT (day, command) DO UPDATE SET count = count + 1;
+
+    INSERT INTO command_hourly (hour, command, count)
+    VALUES ({_ROW_TS.format(row='NEW')} / 3600 * 3600, NEW.command, 1)
+    ON CONFLICT (hour, command) DO UPDATE SET count = count + 1;
+END;
+"""
+
+# Schema migrations; database version N has MIGRATIONS[:N] applied
+MIGRATIONS = [
+    CREATE_TABLES,
+    ADD_ROLLUPS,
+]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction; return the schema version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        version = number
+    return version
+
 
 def deploy_database():
     """Create and initialize the SQLite database."""
     try:
         # Connect to SQLite database
         conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
 
-        # Execute SQL to create tables
-        cursor.executescript(CREATE_TABLES)
-        conn.commit()
+        # Create tables and apply pending migrations
+        version = migrate(conn)
 
-        print(f"Database '{DB_FILE}' has been deployed successfully.")
+        print(f"Database '{DB_FILE}' has been deployed successfully (schema version {version}).")
     except Exception as e:
         print(f"Error deploying database: {e}")
     finally:
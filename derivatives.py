@@ -0,0 +1,116 @@
+import asyncio
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+from config import (
+    DERIVED_DIR, PREVIEW_SIZE, THUMBNAIL_SIZE, DERIVATIVE_QUALITY, DERIVATIVE_WORKERS
+)
+from file_manager import FileManager
+from media_cache import FileIdCache
+
+logger = logging.getLogger(__name__)
+
+class DerivativePaths(NamedTuple):
+    """Where the derivatives of a photo are cached."""
+    preview: Path
+    thumbnail: Path
+
+
+class Preview(NamedTuple):
+    """Send-size version of a photo; data and saved are None when it was already on disk."""
+    path: str
+    data: bytes
+    saved: Future
+
+
+def make_derivatives(data: bytes, preview_size: tuple, thumbnail_size: tuple, quality: int) -> tuple:
+    """Return (preview, thumbnail) JPEG bytes for a full-resolution JPEG.
+
+    Runs in a worker process, so Pillow is imported there.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder downscale while decoding, which is much cheaper than a full decode
+        image.draft('RGB', preview_size)
+        preview = image.convert('RGB')
+    preview.thumbnail(preview_size)
+    thumbnail = preview.copy()
+    thumbnail.thumbnail(thumbnail_size)
+
+    results = []
+    for derived in (preview, thumbnail):
+        buffer = io.BytesIO()
+        derived.save(buffer, format='JPEG', quality=quality, optimize=True)
+        results.append(buffer.getvalue())
+    return tuple(results)
+
+
+def _import_pillow():
+    importlib.import_module('PIL.JpegImagePlugin')
+
+
+class DerivativeGenerator:
+    """Creates Telegram-sized previews and thumbnails of photos in a process pool.
+
+    Derivatives are cached in DERIVED_DIR and deleted together with their
+    photo, along with their file_ids in file_ids.
+    """
+
+    def __init__(self, file_manager: FileManager, file_ids: FileIdCache = None, workers: int = DERIVATIVE_WORKERS):
+        self.file_manager = file_manager
+        self.file_ids = file_ids
+        self._workers = workers or os.cpu_count() or 1
+        # Forking would copy the camera, logging and database threads' locks in whatever state they are in
+        self._pool = ProcessPoolExecutor(
+            max_workers=self._workers, mp_context=multiprocessing.get_context('forkserver')
+        )
+        DERIVED_DIR.mkdir(parents=True, exist_ok=True)
+        file_manager.add_delete_listener(self.remove)
+
+    @staticmethod
+    def paths(photo_path) -> DerivativePaths:
+        """Cache locations of the derivatives of photo_path."""
+        stem = Path(photo_path).stem
+        return DerivativePaths(DERIVED_DIR / f"{stem}_preview.jpg", DERIVED_DIR / f"{stem}_thumb.jpg")
+
+    async def preview(self, photo_path, data: bytes = None) -> Preview:
+        """Return the preview of a photo, generating and caching it if needed.
+
+        data is the photo's JPEG when it is already in memory.
+        """
+        paths = self.paths(photo_path)
+        if paths.preview.exists():
+            return Preview(str(paths.preview), None, None)
+
+        if data is None:
+            data = await asyncio.to_thread(Path(photo_path).read_bytes)
+        loop = asyncio.get_running_loop()
+        preview, thumbnail = await loop.run_in_executor(
+            self._pool, make_derivatives, data, PREVIEW_SIZE, THUMBNAIL_SIZE, DERIVATIVE_QUALITY
+        )
+        # The writer thread is FIFO, so saved also covers the thumbnail
+        self.file_manager.save_in_background(paths.thumbnail, thumbnail)
+        saved = self.file_manager.save_in_background(paths.preview, preview)
+        return Preview(str(paths.preview), preview, saved)
+
+    def warm_up(self):
+        """Start the worker processes and import Pillow in them, so the first photo does not wait for it."""
+        for _ in range(self._workers):
+            self._pool.submit(_import_pillow)
+
+    def remove(self, photo_path):
+        """Delete listener: drop the derivatives of a deleted photo."""
+        for path in self.paths(photo_path):
+            path.unlink(missing_ok=True)
+            if self.file_ids is not None:
+                self.file_ids.invalidate(path)
+
+    def close(self):
+        """Shut down the worker processes."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,151 @@
+import asyncio
+import itertools
+import json
+import math
+import time
+from collections import defaultdict
+from telegram.request import BaseRequest, RequestData
+from rate_limit import TokenBucket
+
+# Methods whose result is the sent message, with the attribute holding the media
+_SEND_METHODS = {
+    'sendMessage': None,
+    'sendPhoto': 'photo',
+    'sendVideo': 'video',
+    'sendDocument': 'document',
+    'sendInvoice': None,
+}
+
+# Methods that deliver media to the chat
+MEDIA_METHODS = {'sendPhoto', 'sendVideo', 'sendDocument', 'sendMediaGroup'}
+
+
+class FakeBotAPI(BaseRequest):
+    """Local stand-in for the Telegram Bot API, for benchmarks and tests without a network.
+
+    Pass it to PiCameraBot(request=...). Every call takes latency seconds plus
+    the time to transmit its uploaded files at bandwidth bytes per second over
+    a single shared link, then answers with a plausible result. Calls are
+    recorded in calls and, per chat, in sent.
+
+    With global_rate or chat_rate set, calls beyond that many per second
+    (overall, or to one chat) are answered with 429 and a retry_after, like
+    Telegram's flood control. Chats in blocked answer 403, as if they
+    blocked the bot. Sending a file_id in invalid_file_ids answers 400, as
+    for a file_id Telegram no longer knows. All refusals are counted in
+    rejected.
+    """
+
+    def __init__(self, bandwidth: float = 1_000_000, latency: float = 0.05,
+                 global_rate: float = None, chat_rate: float = None, blocked=(), invalid_file_ids=()):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.calls = []               # (method, chat_id, uploaded bytes)
+        self.sent = defaultdict(list)  # chat_id -> methods called for that chat
+        self.blocked = set(blocked)
+        self.invalid_file_ids = set(invalid_file_ids)
+        self.rejected = defaultdict(int)  # HTTP status -> count
+        self._global_bucket = TokenBucket(global_rate, global_rate) if global_rate else None
+        self._chat_rate = chat_rate
+        self._chat_buckets = {}
+        self._link = asyncio.Lock()
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    @staticmethod
+    def _upload_size(request_data: RequestData) -> int:
+        if request_data is None or not request_data.contains_files:
+            return 0
+        return sum(
+            len(field[1]) if isinstance(field, tuple) else len(field)
+            for field in request_data.multipart_data.values()
+        )
+
+    def _message(self, chat_id, method: str, parameters: dict) -> dict:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+        }
+        if 'text' in parameters:
+            message['text'] = parameters['text']
+        media = _SEND_METHODS.get(method)
+        if media is None:
+            return message
+        file_id = parameters.get(media)
+        if not isinstance(file_id, str) or file_id.startswith('attach://'):
+            file_id = f"fake-{media}-{next(self._file_ids)}"
+        attributes = {'file_id': file_id, 'file_unique_id': file_id}
+        if media == 'photo':
+            message['photo'] = [{**attributes, 'width': 1280, 'height': 960}]
+        elif media == 'video':
+            message['video'] = {**attributes, 'width': 800, 'height': 600, 'duration': 1}
+        else:
+            message['document'] = attributes
+        return message
+
+    def _result(self, method: str, parameters: dict):
+        chat_id = parameters.get('chat_id')
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        if method == 'getUpdates':
+            return []
+        if method == 'sendMediaGroup':
+            return [self._message(chat_id, f"send{item['type'].capitalize()}", item)
+                    for item in parameters.get('media', [])]
+        if method in _SEND_METHODS:
+            return self._message(chat_id, method, parameters)
+        return True
+
+    def _refusal(self, chat_id, method: str, parameters: dict):
+        """Status and error body if a call to chat_id is refused, else None."""
+        if chat_id is None:
+            return None
+        if parameters.get(_SEND_METHODS.get(method)) in self.invalid_file_ids:
+            return 400, {'ok': False, 'error_code': 400,
+                         'description': "Bad Request: wrong file identifier/HTTP URL specified"}
+        if chat_id in self.blocked:
+            return 403, {'ok': False, 'error_code': 403, 'description': "Forbidden: bot was blocked by the user"}
+        buckets = [self._global_bucket]
+        if self._chat_rate:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self._chat_rate, 1)
+            buckets.append(bucket)
+        for bucket in filter(None, buckets):
+            if not bucket.try_acquire():
+                retry_after = math.ceil(bucket.delay())
+                return 429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': retry_after},
+                             'description': f"Too Many Requests: retry after {retry_after}"}
+        return None
+
+    async def do_request(self, url: str, method: str, request_data: RequestData = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        parameters = request_data.parameters if request_data is not None else {}
+        upload_size = self._upload_size(request_data)
+        chat_id = parameters.get('chat_id')
+        self.calls.append((api_method, chat_id, upload_size))
+        if chat_id is not None:
+            self.sent[chat_id].append(api_method)
+
+        await asyncio.sleep(self.latency)
+        refusal = self._refusal(chat_id, api_method, parameters)
+        if refusal is not None:
+            status, body = refusal
+            self.rejected[status] += 1
+            return status, json.dumps(body).encode()
+        if upload_size:
+            async with self._link:
+                await asyncio.sleep(upload_size / self.bandwidth)
+        return 200, json.dumps({'ok': True, 'result': self._result(api_method, parameters)}).encode()
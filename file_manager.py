@@ -1,47 +1,249 @@
+import bisect
 import os
+import threading
 from datetime import datetime
+from fnmatch import fnmatch
 from pathlib import Path
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from config import (
-    VIDEO_DIR, IMAGE_DIR, FILES_LIMIT_VIDEO, FILES_LIMIT_IMAGE,
+    VIDEO_DIR, IMAGE_DIR, TIMELAPSE_DIR, BURST_DIR, FILES_LIMIT_VIDEO, FILES_LIMIT_IMAGE,
     FILE_DATE_FORMAT
 )
+from metrics import span
+from retention import RetentionWorker
 
 logger = logging.getLogger(__name__)
 
+# Media kinds indexed at startup: kind -> (directory, pattern)
+MEDIA_KINDS = {
+    'video': (VIDEO_DIR, "*.mp4"),
+    'image': (IMAGE_DIR, "*.jpg"),
+    'timelapse': (TIMELAPSE_DIR, "*.mp4"),
+    'burst': (BURST_DIR, "*.jpg"),
+}
+
+# Length of a FILE_DATE_FORMAT timestamp, which prefixes every media file name
+_TIMESTAMP_LENGTH = len(datetime(2000, 1, 1).strftime(FILE_DATE_FORMAT))
+
+
+class MediaIndex:
+    """In-memory list of the files matching pattern in directory, ordered by capture time.
+
+    Files are ordered by the FILE_DATE_FORMAT timestamp at the start of their
+    name, falling back to their ctime. The index is updated by add and remove,
+    which also record the directory mtime left by the bot's own change. A
+    lookup costs one stat of the directory, and the directory is rescanned
+    when its mtime shows it was changed outside the bot since then.
+    """
+
+    def __init__(self, directory: Path, pattern: str):
+        self.directory = directory
+        self.pattern = pattern
+        self._entries = []  # sorted (timestamp, name) tuples, oldest first
+        self._by_name = {}  # name -> entry
+        self._dir_mtime = None
+        self._lock = threading.Lock()
+
+    def matches(self, path: Path) -> bool:
+        """Whether path belongs to this index."""
+        return path.parent == self.directory and fnmatch(path.name, self.pattern)
+
+    def _entry(self, name: str, stat_source=None) -> tuple:
+        """Sort key for name; stat_source (a DirEntry or Path) is only stat'ed for names without a timestamp."""
+        try:
+            timestamp = datetime.strptime(name[:_TIMESTAMP_LENGTH], FILE_DATE_FORMAT).timestamp()
+        except ValueError:
+            timestamp = (stat_source or self.directory / name).stat().st_ctime
+        return timestamp, name
+
+    def _directory_mtime(self):
+        try:
+            return self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def rescan(self):
+        """Rebuild the index from a directory listing."""
+        with self._lock:
+            self._rescan()
+
+    def _rescan(self):
+        self._dir_mtime = self._directory_mtime()
+        entries = []
+        with span('index_rescan'):
+            if self._dir_mtime is not None:
+                with os.scandir(self.directory) as scan:
+                    for item in scan:
+                        if fnmatch(item.name, self.pattern) and item.is_file():
+                            try:
+                                entries.append(self._entry(item.name, item))
+                            except FileNotFoundError:
+                                continue
+            entries.sort()
+        self._entries = entries
+        self._by_name = {entry[1]: entry for entry in entries}
+        logger.debug(f"Indexed {len(entries)} files in {self.directory}")
+
+    def _refresh_if_changed(self):
+        if self._directory_mtime() != self._dir_mtime:
+            self._rescan()
+
+    def add(self, path: Path):
+        """Record a file written by the bot."""
+        with self._lock:
+            if path.name not in self._by_name:
+                entry = self._entry(path.name)
+                bisect.insort(self._entries, entry)
+                self._by_name[path.name] = entry
+            self._dir_mtime = self._directory_mtime()
+
+    def remove(self, path: Path):
+        """Forget a file deleted by the bot."""
+        with self._lock:
+            entry = self._by_name.pop(path.name, None)
+            if entry is not None:
+                del self._entries[bisect.bisect_left(self._entries, entry)]
+            self._dir_mtime = self._directory_mtime()
+
+    def latest(self, limit: int = None) -> list:
+        """Return up to limit paths, newest first."""
+        with self._lock:
+            self._refresh_if_changed()
+            entries = self._entries if limit is None else self._entries[-limit:] if limit > 0 else []
+            return [self.directory / name for _, name in reversed(entries)]
+
+    def files(self) -> list:
+        """Return (timestamp, path) for every file, oldest first."""
+        with self._lock:
+            self._refresh_if_changed()
+            return [(timestamp, self.directory / name) for timestamp, name in self._entries]
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class FileManager:
     def __init__(self):
+        self._delete_listeners = []
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-writer")
         self._ensure_directories()
+        self._indexes = {}
+        for directory, pattern in MEDIA_KINDS.values():
+            self._get_index(directory, pattern)
+        self.retention = RetentionWorker(self)
+
+    def add_delete_listener(self, callback):
+        """Register callback(path) to be called after a media file is deleted."""
+        self._delete_listeners.append(callback)
+
+    def _notify_deleted(self, file: Path):
+        for callback in self._delete_listeners:
+            try:
+                callback(file)
+            except Exception as e:
+                logger.error(f"Error in delete listener for {file}: {e}")
 
     def _ensure_directories(self):
         """Ensure required directories exist."""
         VIDEO_DIR.mkdir(exist_ok=True)
         IMAGE_DIR.mkdir(exist_ok=True)
+        TIMELAPSE_DIR.mkdir(exist_ok=True)
+        BURST_DIR.mkdir(exist_ok=True)
 
-    def _get_file_list(self, directory: Path, pattern: str) -> list:
-        """Get list of files matching pattern in directory."""
-        return sorted(directory.glob(pattern), key=os.path.getctime, reverse=True)
+    def _get_index(self, directory: Path, pattern: str) -> MediaIndex:
+        """Get the index for a media kind, building it on first use."""
+        key = (Path(directory), pattern)
+        index = self._indexes.get(key)
+        if index is None:
+            index = MediaIndex(*key)
+            index.rescan()
+            self._indexes[key] = index
+        return index
 
-    def _cleanup_old_files(self, directory: Path, pattern: str, limit: int):
-        """Remove old files exceeding the limit."""
-        files = self._get_file_list(directory, pattern)
-        for file in files[limit:]:
-            try:
-                file.unlink()
-                logger.debug(f"Deleted old file: {file}")
-            except Exception as e:
-                logger.error(f"Error deleting file {file}: {e}")
+    def _get_file_list(self, directory: Path, pattern: str, limit: int = None) -> list:
+        """Get list of files matching pattern in directory, newest first."""
+        return self._get_index(directory, pattern).latest(limit)
+
+    def add_file(self, path):
+        """Record a media file written by the bot in its index."""
+        path = Path(path)
+        for index in self._indexes.values():
+            if index.matches(path):
+                index.add(path)
+
+    def delete_file(self, path) -> bool:
+        """Delete a media file, update its index and notify delete listeners."""
+        path = Path(path)
+        try:
+            path.unlink()
+            logger.debug(f"Deleted old file: {path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error deleting file {path}: {e}")
+            return False
+        for index in self._indexes.values():
+            if index.matches(path):
+                index.remove(path)
+        self._notify_deleted(path)
+        return True
+
+    def media_files(self, kind: str) -> list:
+        """Return (timestamp, path) for every file of a media kind, oldest first."""
+        return self._get_index(*MEDIA_KINDS[kind]).files()
+
+    def cleanup_old_files(self) -> tuple:
+        """Apply the retention policies now; return (files deleted, bytes reclaimed)."""
+        return self.retention.run_once()
+
+    def start_retention(self):
+        """Enforce the retention policies on a background thread from now on."""
+        self.retention.start()
+
+    def request_cleanup(self):
+        """Ask for the retention policies to be applied after new files were written.
+
+        Only wakes the retention thread when it is running, so callers never
+        wait for deletions.
+        """
+        with span('cleanup'):
+            if self.retention.is_running:
+                self.retention.trigger()
+            else:
+                self.cleanup_old_files()
+
+    def _save(self, path: Path, data: bytes):
+        # Written under a temporary name so listings never see a partial file
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with span('file_save'):
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        self.add_file(path)
+        logger.debug(f"Saved file: {path}")
+        self.request_cleanup()
+
+    def save_in_background(self, path: Path, data: bytes) -> Future:
+        """Write data to path on the writer thread; the future resolves once saved."""
+        future = self._writer.submit(self._save, Path(path), data)
+        future.add_done_callback(self._log_save_error)
+        return future
+
+    @staticmethod
+    def _log_save_error(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Error saving file: {future.exception()}", exc_info=future.exception())
 
-    def cleanup_old_files(self):
-        """Clean up old files in both video and image directories."""
-        self._cleanup_old_files(VIDEO_DIR, "*.mp4", FILES_LIMIT_VIDEO)
-        self._cleanup_old_files(IMAGE_DIR, "*.jpg", FILES_LIMIT_IMAGE)
+    def close(self):
+        """Wait for pending background writes to finish and stop the retention thread."""
+        self._writer.shutdown(wait=True)
+        self.retention.stop()
 
     def get_latest_files(self, directory: Path, pattern: str, limit: int = None) -> list:
         """Get list of latest files."""
         if limit is None:
             limit = FILES_LIMIT_VIDEO if pattern == "*.mp4" else FILES_LIMIT_IMAGE
-        return self._get_file_list(directory, pattern)[:limit]
+        return self._get_file_list(directory, pattern, limit)
 
     def get_file_info(self, file_path: Path) -> dict:
         """Get information about a file."""
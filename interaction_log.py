@@ -0,0 +1,120 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from config import (
+    DB_FILE, INTERACTION_QUEUE_SIZE, INTERACTION_BATCH_SIZE, INTERACTION_FLUSH_INTERVAL
+)
+from deploy_db import migrate
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class InteractionRecorder:
+    """Writes user interactions to the interactions table without blocking the caller.
+
+    record() only puts the event on a bounded in-memory queue; a background
+    thread flushes the queue to SQLite in one transaction per batch, every
+    INTERACTION_BATCH_SIZE events or INTERACTION_FLUSH_INTERVAL seconds. When
+    the queue is full new events are dropped and counted.
+    """
+
+    def __init__(self, db_file=DB_FILE, queue_size: int = INTERACTION_QUEUE_SIZE,
+                 batch_size: int = INTERACTION_BATCH_SIZE, flush_interval: float = INTERACTION_FLUSH_INTERVAL):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def start(self):
+        """Start the writer thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="interaction-log", daemon=True)
+        self._thread.start()
+
+    def record(self, user_id, command: str):
+        """Queue an interaction; never blocks."""
+        now = time.time()
+        event = (str(user_id), datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'), int(now), command)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Flush pending events and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_file))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        migrate(conn)
+        return conn
+
+    def _flush(self, conn: sqlite3.Connection, batch: list):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO interactions (user_id, timestamp, ts, command) VALUES (?, ?, ?, ?)", batch
+                )
+            self.recorded += len(batch)
+            self.flushes += 1
+        except sqlite3.Error as e:
+            logger.error(f"Error writing {len(batch)} interactions: {e}")
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            batch = []
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    event = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    event = None
+                if event is _STOP:
+                    break
+                if event is not None:
+                    batch.append(event)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    self._flush(conn, batch)
+                    batch = []
+                    deadline = None
+            # Drain whatever was queued before close()
+            while True:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is not _STOP:
+                    batch.append(event)
+            if batch:
+                self._flush(conn, batch)
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Counters describing the recorder's work so far."""
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'pending': self._queue.qsize(),
+        }
@@ -1,53 +1,117 @@
+import atexit
+import json
 import logging
 import logging.handlers
-import os
-from pathlib import Path
+import queue
+import sys
+from config import (
+    LOG_DIR, LOG_FORMAT, LOG_CONSOLE_LEVEL, LOG_FILE_LEVEL, LOG_LEVELS, LOG_QUEUE_SIZE,
+    LOG_MAX_BYTES, LOG_BACKUP_COUNT
+)
+from metrics import REGISTRY
 
-# Create logs directory if it doesn't exist
-LOG_DIR = Path(__file__).resolve().parent / 'logs'
-LOG_DIR.mkdir(exist_ok=True)
-
-# Log file path
 LOG_FILE = LOG_DIR / 'bot.log'
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-# Logging configuration
-LOGGING_CONFIG = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'standard': {
-            'format': '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
-        },
-        'detailed': {
-            'format': '%(asctime)s [%(levelname)s] %(name)s (%(filename)s:%(lineno)d): %(message)s'
-        }
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'standard',
-            'level': 'INFO',
-            'stream': 'ext://sys.stdout'
-        },
-        'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
-            'formatter': 'detailed',
-            'level': 'DEBUG',
-            'filename': str(LOG_FILE),
-            'maxBytes': 10485760,  # 10MB
-            'backupCount': 5
-        }
-    },
-    'loggers': {
-        '': {  # Root logger
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
-            'propagate': True
+DROPPED_RECORDS = REGISTRY.counter(
+    'picamera_log_records_dropped_total', 'Log records dropped because the log queue was full'
+).labels()
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line: time, level, logger, message and traceback if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
         }
-    }
-}
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on a bounded queue and never blocks; records that do not fit are counted and dropped."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments, which may change before the listener gets to
+        # them; formatting, tracebacks included, happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED_RECORDS.inc()
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: with a full queue put_nowait would fail and the thread never stop
+        self.queue.put(self._sentinel)
+
+
+def create_handlers(log_format: str = LOG_FORMAT) -> list:
+    """Console and rotating file handlers, as run by the listener thread."""
+    formatter = JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(LOG_CONSOLE_LEVEL)
+    console_handler.setFormatter(formatter)
+
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    file_handler.setLevel(LOG_FILE_LEVEL)
+    file_handler.setFormatter(formatter)
+    return [console_handler, file_handler]
+
+
+def setup_logging(handlers: list = None, log_format: str = LOG_FORMAT, levels: dict = LOG_LEVELS,
+                  queue_size: int = LOG_QUEUE_SIZE) -> logging.handlers.QueueListener:
+    """Route all logging through a bounded queue to handlers running on a background thread.
+
+    Logging calls only enqueue the record, so the event loop never waits for
+    formatting or the SD card. levels maps logger names to their own level,
+    e.g. {'httpx': 'WARNING'}. The queue is flushed when the process exits.
+    """
+    global _listener
+    stop_logging()
+    handlers = create_handlers(log_format) if handlers is None else handlers
+
+    queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+    # Records no handler wants are filtered before they reach the queue
+    queue_handler.setLevel(min(handler.level for handler in handlers))
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(queue_handler.level)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = _QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 
-def setup_logging():
-    """Configure logging for the application."""
-    logging.config.dictConfig(LOGGING_CONFIG)
-    return logging.getLogger(__name__) 
\ No newline at end of file
+atexit.register(stop_logging)
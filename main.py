@@ -1,42 +1,75 @@
 # -*- coding: utf-8 -*-
+from startup import STARTUP  # first, so the startup clock includes the imports below
+import argparse
 import logging
-from logging.handlers import RotatingFileHandler
-from pathlib import Path
-from bot import PiCameraBot
-from config import BASE_DIR
+import sys
+import threading
+from config import CAMERA_PREWARM
+from logger_config import setup_logging
 
-# Create logs directory if it doesn't exist
-log_dir = BASE_DIR / 'logs'
-log_dir.mkdir(exist_ok=True)
+logger = logging.getLogger(__name__)
 
-# Configure logging
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
+def warm_up_camera(camera):
+    """Open the camera in the background; a failure is logged and retried by the first request."""
+    try:
+        with STARTUP.phase('camera_warm_up'):
+            camera.warm_up()
+    except Exception as e:
+        logger.error(f"Camera warm-up failed: {e}", exc_info=True)
+
+def create_bot(prewarm: bool = CAMERA_PREWARM):
+    """Build the bot while the camera warms up; returns the bot and the warm-up thread, if any.
 
-# Console handler (INFO and above)
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
+    telegram and its dependencies make up most of the import time, so they
+    are imported only after the camera has started opening.
+    """
+    with STARTUP.phase('camera_session'):
+        from camera_handler import CameraHandler
+        camera = CameraHandler()
+    warm_up = None
+    if prewarm:
+        warm_up = threading.Thread(target=warm_up_camera, args=(camera,), name="camera-warm-up", daemon=True)
+        warm_up.start()
+    with STARTUP.phase('import_bot'):
+        from bot import PiCameraBot
+    with STARTUP.phase('build_bot'):
+        bot = PiCameraBot(camera=camera)
+        bot.derivatives.warm_up()
+    return bot, warm_up
 
-# File handler (DEBUG and above)
-file_handler = RotatingFileHandler(
-    log_dir / 'bot.log',
-    maxBytes=10*1024*1024,  # 10MB
-    backupCount=5,
-    encoding='utf-8'
-)
-file_handler.setLevel(logging.DEBUG)
-file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+def check() -> bool:
+    """Measure startup up to a first test capture, without connecting to Telegram."""
+    bot, warm_up = create_bot()
+    try:
+        if warm_up is not None:
+            with STARTUP.phase('wait_camera'):
+                warm_up.join()
+        with STARTUP.phase('first_capture'):
+            jpeg = bot.camera.camera.capture_test_jpeg()
+        print(STARTUP.report())
+        print(f"Camera OK, test capture of {len(jpeg)} bytes")
+        return True
+    except Exception as e:
+        print(STARTUP.report())
+        print(f"Camera check failed: {e}")
+        return False
+    finally:
+        bot.close()
 
 def main():
     """Start the bot."""
+    parser = argparse.ArgumentParser(description="Raspberry Pi Camera Telegram bot")
+    parser.add_argument("--check", action="store_true",
+                        help="time the startup up to a test capture, then exit without connecting to Telegram")
+    args = parser.parse_args()
+    with STARTUP.phase('logging'):
+        setup_logging()
+    if args.check:
+        sys.exit(0 if check() else 1)
     try:
         logger.info("Starting Pi Camera Bot...")
-        bot = PiCameraBot()
+        bot, _ = create_bot()
+        logger.info(f"Startup phases:\n{STARTUP.report()}")
         bot.run()
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
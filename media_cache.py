@@ -0,0 +1,99 @@
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from config import DB_FILE
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS media_file_ids (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file_id TEXT NOT NULL
+);
+"""
+
+class FileIdCache:
+    """Telegram file_id of every uploaded media file, persisted in SQLite.
+
+    Entries are keyed by path and only match while the file's size and
+    mtime are unchanged, so a replaced file is uploaded again. Lookups and
+    updates use an in-memory copy; writes to SQLite happen on a background
+    thread, so callers on the event loop never wait for the database.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_file), check_same_thread=False)
+        self._conn.executescript(CREATE_TABLE)
+        self._entries = {
+            path: (size, mtime_ns, file_id)
+            for path, size, mtime_ns, file_id in self._conn.execute(
+                "SELECT path, size, mtime_ns, file_id FROM media_file_ids"
+            )
+        }
+        logger.debug(f"Loaded {len(self._entries)} cached file ids")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-id-writer")
+
+    @staticmethod
+    def _stat(path) -> tuple:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, path) -> str:
+        """Return the cached file_id for path, or None if it must be uploaded."""
+        path = str(Path(path))
+        entry = self._entries.get(path)
+        if entry is not None:
+            try:
+                if self._stat(path) == entry[:2]:
+                    CACHE_LOOKUPS.labels('file_id', 'hit').inc()
+                    return entry[2]
+            except FileNotFoundError:
+                pass
+            self.invalidate(path)
+        CACHE_LOOKUPS.labels('file_id', 'miss').inc()
+        return None
+
+    def put(self, path, file_id: str):
+        """Remember the file_id returned by uploading path."""
+        path = str(Path(path))
+        try:
+            size, mtime_ns = self._stat(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._entries[path] = (size, mtime_ns, file_id)
+        self._write(
+            "INSERT OR REPLACE INTO media_file_ids (path, size, mtime_ns, file_id) VALUES (?, ?, ?, ?)",
+            (path, size, mtime_ns, file_id)
+        )
+
+    def invalidate(self, path):
+        """Forget the file_id of path, e.g. after the file was deleted."""
+        path = str(Path(path))
+        with self._lock:
+            if self._entries.pop(path, None) is None:
+                return
+        self._write("DELETE FROM media_file_ids WHERE path = ?", (path,))
+
+    def _write(self, sql: str, parameters: tuple):
+        """Run a statement on the writer thread; writes keep the order they were made in."""
+        self._writer.submit(self._execute, sql, parameters)
+
+    def _execute(self, sql: str, parameters: tuple):
+        try:
+            with self._conn:
+                self._conn.execute(sql, parameters)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing file id: {e}")
+
+    def close(self):
+        """Finish the pending writes and close the database connection."""
+        self._writer.shutdown(wait=True)
+        self._conn.close()
@@ -0,0 +1,258 @@
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from a lock hand-over to a long upload
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower  # beyond the last bucket all we know is the lower bound
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Gauge:
+    """Value read from a callback when metrics are collected."""
+
+    __slots__ = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    @property
+    def value(self) -> float:
+        return self.func()
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: tuple, factory):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = labelnames
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The child for the given label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def children(self) -> list:
+        return list(self._children.items())
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._families = {}
+
+    def _family(self, name: str, help_text: str, kind: str, labelnames: tuple, factory) -> MetricFamily:
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = MetricFamily(name, help_text, kind, labelnames, factory)
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> MetricFamily:
+        return self._family(name, help_text, 'counter', labelnames, Counter)
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._family(name, help_text, 'histogram', labelnames, lambda: Histogram(buckets))
+
+    def gauge(self, name: str, help_text: str, func):
+        """Register a gauge read from func; registering a name again replaces its callback."""
+        family = self._family(name, help_text, 'gauge', (), None)
+        family._children[()] = Gauge(func)
+
+    @staticmethod
+    def _labels(family: MetricFamily, values: tuple, extra: str = None) -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(family.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.children():
+                if family.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip((*child.buckets, '+Inf'), child.counts):
+                        cumulative += count
+                        labels = self._labels(family, values, f'le="{bound}"')
+                        lines.append(f"{family.name}_bucket{labels} {cumulative}")
+                    labels = self._labels(family, values)
+                    lines.append(f"{family.name}_sum{labels} {child.sum}")
+                    lines.append(f"{family.name}_count{labels} {child.count}")
+                else:
+                    try:
+                        value = child.value
+                    except Exception as e:
+                        logger.warning(f"Could not read {family.name}: {e}")
+                        continue
+                    lines.append(f"{family.name}{self._labels(family, values)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Human-readable overview: histogram count, p50 and p95, counter and gauge values."""
+        lines = []
+        for family in self._families.values():
+            for values, child in sorted(family.children(), key=lambda item: item[0]):
+                name = family.name + (f"[{','.join(map(str, values))}]" if values else "")
+                if family.kind == 'histogram':
+                    if child.count:
+                        lines.append(
+                            f"{name}: n={child.count} p50={child.quantile(0.5) * 1000:.1f}ms "
+                            f"p95={child.quantile(0.95) * 1000:.1f}ms"
+                        )
+                else:
+                    try:
+                        lines.append(f"{name}: {child.value:g}")
+                    except Exception as e:
+                        lines.append(f"{name}: error ({e})")
+        return "\n".join(lines)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'picamera_stage_seconds', 'Duration of capture pipeline stages', ('stage',)
+)
+STAGE_ERRORS = REGISTRY.counter('picamera_stage_errors_total', 'Stages that raised an error', ('stage',))
+UPLOAD_BYTES = REGISTRY.counter('picamera_upload_bytes_total', 'Bytes uploaded to Telegram', ('kind',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'picamera_cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result')
+)
+
+
+class _Span:
+    __slots__ = ('stage', 'histogram', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.histogram = STAGE_SECONDS.labels(stage)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.started)
+        if exc_type is not None:
+            STAGE_ERRORS.labels(self.stage).inc()
+        return False
+
+
+def span(stage: str) -> _Span:
+    """Context manager timing a pipeline stage into STAGE_SECONDS; errors are counted too."""
+    return _Span(stage)
+
+
+def timed(stage: str):
+    """Decorator timing every call of a coroutine function as a stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with _Span(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics request from {self.address_string()}: {format % args}")
+
+
+class MetricsServer:
+    """Serves REGISTRY at /metrics from a background thread."""
+
+    def __init__(self, port: int, host: str = ''):
+        self._server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Serving metrics on port {self.port}")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
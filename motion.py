@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+import numpy as np
+from config import (
+    MOTION_FPS, MOTION_DOWNSCALE, MOTION_THRESHOLD, MOTION_MIN_AREA, MOTION_MAX_AREA,
+    MOTION_TRIGGER_FRAMES, MOTION_BACKGROUND_ALPHA, MOTION_REGIONS, MOTION_COOLDOWN
+)
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def region_mask(shape: tuple, regions: list) -> np.ndarray:
+    """Boolean mask of the watched pixels; regions are (left, top, right, bottom) fractions.
+
+    Returns None, meaning the whole frame, when regions is empty.
+    """
+    if not regions:
+        return None
+    height, width = shape
+    mask = np.zeros(shape, dtype=bool)
+    for left, top, right, bottom in regions:
+        mask[int(top * height):int(bottom * height), int(left * width):int(right * width)] = True
+    return mask
+
+
+class MotionDetector:
+    """Frame differencing against an adaptive background, fully vectorized.
+
+    Frames are 2D uint8 luminance arrays. A pixel is moving when it differs
+    from the running-average background by more than threshold; motion is
+    detected when the moving share of the watched pixels exceeds min_area
+    for trigger_frames frames in a row. Changes above max_area are taken to
+    be lighting changes and reset the background instead.
+    """
+
+    def __init__(self, threshold: float = MOTION_THRESHOLD, min_area: float = MOTION_MIN_AREA,
+                 max_area: float = MOTION_MAX_AREA, trigger_frames: int = MOTION_TRIGGER_FRAMES,
+                 alpha: float = MOTION_BACKGROUND_ALPHA, regions: list = MOTION_REGIONS,
+                 downscale: int = MOTION_DOWNSCALE):
+        self.threshold = threshold
+        self.min_area = min_area
+        self.max_area = max_area
+        self.trigger_frames = trigger_frames
+        self.alpha = alpha
+        self.regions = regions
+        self.downscale = downscale
+        self.moving_frames = 0
+        self._background = None
+
+    def _allocate(self, frame: np.ndarray):
+        # Work buffers are reused for every frame to avoid allocations in the hot loop
+        self._background = frame.astype(np.float32)
+        self._delta = np.empty_like(self._background)
+        self._magnitude = np.empty_like(self._background)
+        self._moving = np.empty(frame.shape, dtype=bool)
+        self._mask = region_mask(frame.shape, self.regions)
+        self._area = int(np.count_nonzero(self._mask)) if self._mask is not None else frame.size
+
+    def reset(self):
+        """Forget the background, e.g. after the camera was reconfigured."""
+        self._background = None
+        self.moving_frames = 0
+
+    def process(self, frame: np.ndarray) -> float:
+        """Feed a frame; return the share of watched pixels that moved."""
+        if self.downscale > 1:
+            frame = frame[::self.downscale, ::self.downscale]
+        if self._background is None or self._background.shape != frame.shape:
+            self._allocate(frame)
+            return 0.0
+
+        np.subtract(frame, self._background, out=self._delta)
+        np.abs(self._delta, out=self._magnitude)
+        np.greater(self._magnitude, self.threshold, out=self._moving)
+        if self._mask is not None:
+            np.logical_and(self._moving, self._mask, out=self._moving)
+        changed = np.count_nonzero(self._moving) / self._area
+
+        if changed > self.max_area:
+            np.copyto(self._background, frame)
+            self.moving_frames = 0
+            return changed
+        # background += alpha * (frame - background), ten times slower where something
+        # is moving so passing objects leave no ghost but parked ones fade in
+        self._delta *= self.alpha
+        np.multiply(self._delta, 0.1, out=self._delta, where=self._moving)
+        self._background += self._delta
+        self.moving_frames = self.moving_frames + 1 if changed >= self.min_area else 0
+        return changed
+
+    @property
+    def triggered(self) -> bool:
+        """Whether the last frames contained enough motion to act on."""
+        return self.moving_frames >= self.trigger_frames
+
+
+class MotionMonitor:
+    """Runs a MotionDetector on a background thread.
+
+    frame_source() returns the current luminance frame, or None when no frame
+    is available right now (e.g. the camera is busy with a request).
+    on_motion(changed) is called from the monitor thread, at most once per
+    cooldown seconds.
+    """
+
+    def __init__(self, frame_source, on_motion, detector: MotionDetector = None,
+                 fps: float = MOTION_FPS, cooldown: float = MOTION_COOLDOWN):
+        self.frame_source = frame_source
+        self.on_motion = on_motion
+        self.detector = detector or MotionDetector()
+        self.fps = fps
+        self.cooldown = cooldown
+        self.frames = 0
+        self.skipped = 0
+        self.triggers = 0
+        self._last_trigger = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="motion", daemon=True)
+        self._thread.start()
+        logger.info(f"Motion detection started at {self.fps} fps")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        interval = 1 / self.fps
+        next_frame = time.monotonic()
+        while not self._stop.wait(max(0.0, next_frame - time.monotonic())):
+            next_frame = max(next_frame + interval, time.monotonic())
+            try:
+                frame = self.frame_source()
+            except Exception as e:
+                logger.error(f"Error reading motion frame: {e}", exc_info=True)
+                self.detector.reset()
+                next_frame += 1  # back off while the camera is failing
+                continue
+            if frame is None:
+                self.skipped += 1
+                self.detector.reset()
+                continue
+            self.check(frame)
+
+    def check(self, frame: np.ndarray) -> bool:
+        """Process one frame and fire on_motion if it triggers; return whether it did."""
+        started = time.perf_counter()
+        changed = self.detector.process(frame)
+        STAGE_SECONDS.labels('motion_frame').observe(time.perf_counter() - started)
+        self.frames += 1
+        if not self.detector.triggered:
+            return False
+        now = time.monotonic()
+        if self._last_trigger is not None and now - self._last_trigger < self.cooldown:
+            return False
+        self._last_trigger = now
+        self.triggers += 1
+        logger.info(f"Motion detected: {changed:.1%} of the watched area changed")
+        try:
+            self.on_motion(changed)
+        except Exception as e:
+            logger.error(f"Error handling motion: {e}", exc_info=True)
+        return True
+
+    def stats(self) -> dict:
+        return {'frames': self.frames, 'skipped': self.skipped, 'triggers': self.triggers}
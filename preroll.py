@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import NamedTuple
+from video_output import mux_h264
+
+logger = logging.getLogger(__name__)
+
+class EncodedFrame(NamedTuple):
+    """One H.264 access unit as produced by the encoder."""
+    timestamp: float  # time.monotonic() on arrival
+    keyframe: bool
+    data: bytes
+
+
+class FrameRingBuffer:
+    """Bounded ring of encoded frames fed by an always-on H.264 encoder.
+
+    The buffer holds at most max_seconds of footage and max_bytes of data and
+    always starts at a keyframe, so any suffix starting at a keyframe can be
+    written out as a playable stream.
+    """
+
+    def __init__(self, max_seconds: float, max_bytes: int):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self._frames = deque()
+        self._bytes = 0
+        self._taps = []
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        """Bytes currently held in the ring."""
+        return self._bytes
+
+    def write_frame(self, data: bytes, keyframe: bool):
+        """Encoder sink: append a frame and drop the oldest beyond the limits."""
+        frame = EncodedFrame(time.monotonic(), keyframe, data)
+        with self._lock:
+            for tap in self._taps:
+                # Like the ring, a tap that is still empty waits for a keyframe
+                if tap or keyframe:
+                    tap.append(frame)
+            if not self._frames and not keyframe:
+                return  # a stream must start at a keyframe
+            self._frames.append(frame)
+            self._bytes += len(data)
+            self._trim(frame.timestamp)
+
+    def _trim(self, now: float):
+        frames = self._frames
+        while frames and (self._bytes > self.max_bytes or now - frames[0].timestamp > self.max_seconds):
+            self._bytes -= len(frames.popleft().data)
+            # Drop up to the next keyframe so the ring stays decodable
+            while frames and not frames[0].keyframe:
+                self._bytes -= len(frames.popleft().data)
+
+    def clear(self):
+        """Drop all buffered frames, e.g. when the encoder is stopped."""
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+    def _last_seconds(self, seconds: float) -> list:
+        """Frames covering the last seconds, starting at a keyframe; lock must be held."""
+        cutoff = time.monotonic() - seconds
+        start = 0
+        for index, frame in enumerate(self._frames):
+            if frame.timestamp > cutoff:
+                break
+            if frame.keyframe:
+                start = index
+        return list(self._frames)[start:]
+
+    def snapshot(self, seconds: float) -> list:
+        """Return the frames of the last seconds of footage."""
+        with self._lock:
+            return self._last_seconds(seconds)
+
+    def start_tap(self, seconds: float) -> list:
+        """Start collecting live frames, prefilled with the last seconds of footage.
+
+        The returned list grows until it is passed to stop_tap, and always
+        starts at a keyframe.
+        """
+        with self._lock:
+            tap = self._last_seconds(seconds)
+            self._taps.append(tap)
+        return tap
+
+    def stop_tap(self, tap: list) -> list:
+        """Stop collecting frames into tap and return it."""
+        with self._lock:
+            self._taps.remove(tap)
+        return tap
+
+
+def write_mp4(frames: list, path: Path, framerate: float):
+    """Write buffered frames to an upload-ready MP4."""
+    if not frames:
+        raise RuntimeError("No frames to write")
+    mux_h264(b''.join(frame.data for frame in frames), path, framerate)
+    logger.debug(f"Wrote {len(frames)} frames to {path}")
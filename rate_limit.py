@@ -0,0 +1,33 @@
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, holding at most capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if available; never waits."""
+        self._refill(time.monotonic())
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1) -> float:
+        """Seconds until tokens will be available (0 if they are now)."""
+        self._refill(time.monotonic())
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def is_full(self) -> bool:
+        """Whether the bucket has refilled completely, i.e. is idle."""
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
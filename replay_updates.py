@@ -0,0 +1,128 @@
+"""Replay recorded Telegram updates against the bot's webhook server, without Telegram.
+
+The bot runs in webhook mode on a local port with a fake camera and a local
+stand-in for the Bot API. Every update is posted to the webhook like Telegram
+would, then the bot is shut down gracefully and the Bot API calls it made are
+summarized. Updates are read from a file holding one update per line, a JSON
+list, or a saved getUpdates response; without a file a short sample session
+is replayed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def load_updates(path: str) -> list:
+    text = Path(path).read_text(encoding='utf-8').strip()
+    if text.startswith(('[', '{"ok"')):
+        data = json.loads(text)
+        return data['result'] if isinstance(data, dict) else data
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def sample_updates(chat_id: int = 1001) -> list:
+    """A short session: start, photo, latest photo, a video conversation and a callback."""
+    user = {'id': chat_id, 'is_bot': False, 'first_name': "Replay"}
+    chat = {'id': chat_id, 'type': 'private'}
+    texts = ["/start", "📸 Capture Photo", "🖼️ Show Latest Photo", "📹 Record Video", "2"]
+    updates = []
+    for update_id, text in enumerate(texts, start=1):
+        message = {'message_id': update_id, 'date': int(time.time()), 'chat': chat, 'from': user, 'text': text}
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        updates.append({'update_id': update_id, 'message': message})
+    updates.append({
+        'update_id': len(updates) + 1,
+        'callback_query': {'id': '1', 'from': user, 'chat_instance': '1', 'data': 'star',
+                           'message': {'message_id': 1, 'date': int(time.time()), 'chat': chat}},
+    })
+    return updates
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_serving(application, server: asyncio.Task):
+    while not (application.updater.running and application.running):
+        if server.done():
+            server.result()  # raises the startup error
+        await asyncio.sleep(0.05)
+
+
+async def replay(updates: list, args) -> bool:
+    import httpx
+    from bot import PiCameraBot
+    from camera_backend import FakeCameraBackend
+    from config import WEBHOOK_PATH
+    from fake_telegram import FakeBotAPI
+
+    api = FakeBotAPI(bandwidth=args.bandwidth, latency=args.latency)
+    bot = PiCameraBot(backend=FakeCameraBackend(capture_delay=args.capture_delay), request=api)
+    bot.setup_handlers()
+    port = _free_port()
+    secret = secrets.token_urlsafe(16)
+    stop = asyncio.Event()
+    server = asyncio.create_task(bot.serve_webhook('127.0.0.1', port, secret_token=secret, stop_event=stop))
+    ok = True
+    try:
+        await _wait_until_serving(bot.application, server)
+        url = f"http://127.0.0.1:{port}/{WEBHOOK_PATH}"
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json=updates[0], headers={SECRET_HEADER: 'wrong'})
+            if response.status_code != 403:
+                print(f"Request with a wrong secret token got HTTP {response.status_code}, expected 403")
+                ok = False
+            statuses = Counter()
+            for update in updates:
+                response = await client.post(url, json=update, headers={SECRET_HEADER: secret})
+                statuses[response.status_code] += 1
+                await asyncio.sleep(args.interval)
+        print(f"Posted {len(updates)} updates, HTTP statuses: {dict(statuses)}")
+        ok = ok and set(statuses) == {200}
+    finally:
+        stop.set()
+        started = time.perf_counter()
+        await server
+        print(f"Shut down in {time.perf_counter() - started:.2f}s")
+        bot.close()
+
+    methods = Counter(method for method, _, _ in api.calls)
+    print(f"Bot API calls: {dict(methods)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("updates", nargs="?", help="recorded updates (JSON lines, list or getUpdates response)")
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between posted updates")
+    parser.add_argument("--capture-delay", type=float, default=0.3)
+    parser.add_argument("--bandwidth", type=float, default=2_000_000, help="upload bytes per second")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per Bot API call")
+    args = parser.parse_args()
+
+    if 'PICAMERA_BOT_DATA_DIR' not in os.environ:
+        # Run in a child process whose media and databases live in a scratch directory
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, 'PICAMERA_BOT_DATA_DIR': tmp}
+            sys.exit(subprocess.run([sys.executable, *sys.argv], env=env).returncode)
+
+    updates = load_updates(args.updates) if args.updates else sample_updates()
+    sys.exit(0 if asyncio.run(replay(updates, args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from config import RETENTION_POLICIES, RETENTION_INTERVAL, RETENTION_BATCH_SIZE
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+class RetentionWorker:
+    """Background thread that enforces RETENTION_POLICIES on the media directories.
+
+    Each policy may limit the number of files ('max_files'), their total size
+    ('max_bytes') and their age in seconds ('max_age'); oldest files are
+    deleted first, in batches, without touching the camera. The worker runs
+    every RETENTION_INTERVAL seconds and whenever trigger() is called.
+    """
+
+    def __init__(self, file_manager, policies: dict = None, interval: float = RETENTION_INTERVAL,
+                 batch_size: int = RETENTION_BATCH_SIZE):
+        self.file_manager = file_manager
+        self.policies = RETENTION_POLICIES if policies is None else policies
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self.runs = 0
+        self.deleted_files = {kind: 0 for kind in self.policies}
+        self.reclaimed_bytes = {kind: 0 for kind in self.policies}
+        self.last_run_seconds = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background thread."""
+        if self.is_running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after its current batch."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stopping.clear()
+
+    def trigger(self):
+        """Ask the worker to run as soon as possible."""
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error enforcing retention: {e}", exc_info=True)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def _expired(self, files: list, policy: dict) -> list:
+        """Select the files violating policy from files listed oldest first."""
+        now = time.time()
+        max_files = policy.get('max_files')
+        max_bytes = policy.get('max_bytes')
+        max_age = policy.get('max_age')
+        keep_from = 0
+        if max_files is not None:
+            keep_from = max(keep_from, len(files) - max_files)
+        if max_age is not None:
+            while keep_from < len(files) and now - files[keep_from][0] > max_age:
+                keep_from += 1
+        expired = [(path, None) for _, path in files[:keep_from]]
+        if max_bytes is not None:
+            # Walk newest to oldest so the newest files within the quota are kept
+            total = 0
+            for _, path in reversed(files[keep_from:]):
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    continue
+                total += size
+                if total > max_bytes:
+                    expired.append((path, size))
+        return expired
+
+    def run_once(self) -> tuple:
+        """Apply every policy once; return (files deleted, bytes reclaimed)."""
+        with self._run_lock, span('retention'):
+            started = time.monotonic()
+            run_files = run_bytes = 0
+            for kind, policy in self.policies.items():
+                expired = self._expired(self.file_manager.media_files(kind), policy)
+                for batch_start in range(0, len(expired), self.batch_size):
+                    if self._stopping.is_set():
+                        break
+                    for path, size in expired[batch_start:batch_start + self.batch_size]:
+                        if size is None:
+                            try:
+                                size = path.stat().st_size
+                            except FileNotFoundError:
+                                size = 0
+                        if self.file_manager.delete_file(path):
+                            self.deleted_files[kind] += 1
+                            self.reclaimed_bytes[kind] += size
+                            run_files += 1
+                            run_bytes += size
+                    time.sleep(0)  # let capture threads run between batches
+            self.runs += 1
+            self.last_run_seconds = time.monotonic() - started
+        if run_files:
+            logger.info(f"Retention deleted {run_files} files, reclaimed {run_bytes} bytes")
+        return run_files, run_bytes
+
+    def stats(self) -> dict:
+        """Counters describing the work done so far."""
+        return {
+            'runs': self.runs,
+            'deleted_files': dict(self.deleted_files),
+            'reclaimed_bytes': dict(self.reclaimed_bytes),
+            'last_run_seconds': self.last_run_seconds,
+        }
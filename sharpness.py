@@ -0,0 +1,63 @@
+import heapq
+import numpy as np
+from config import BURST_SCORE_STEP
+
+
+def luminance(frame: np.ndarray, step: int = BURST_SCORE_STEP) -> np.ndarray:
+    """Every step-th pixel of a frame as a 2D array; colour frames use their green channel.
+
+    Green carries most of the luminance, and taking it avoids a colour
+    conversion of the whole frame.
+    """
+    if frame.ndim == 3:
+        frame = frame[..., 1]
+    return frame[::step, ::step]
+
+
+def laplacian_variance(frame: np.ndarray, step: int = BURST_SCORE_STEP) -> float:
+    """Sharpness of a frame: the variance of its 4-neighbour Laplacian.
+
+    Blur removes the fine detail the Laplacian responds to, so sharper
+    frames score higher. Scores are only comparable between frames of the
+    same scene and size.
+    """
+    gray = luminance(frame, step).astype(np.float32)
+    laplacian = gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+    laplacian -= 4 * gray[1:-1, 1:-1]
+    return float(laplacian.var())
+
+
+class SharpestFrames:
+    """Keeps the keep sharpest of the frames added to it, so a burst never holds more frames than that.
+
+    Frames are scored on every step-th pixel of one channel, a copy a
+    fraction of the frame's size.
+    """
+
+    def __init__(self, keep: int, step: int = BURST_SCORE_STEP):
+        self.keep = keep
+        self.step = step
+        self.scores = []  # score of every frame added, in order
+        self._heap = []   # (score, index, frame or conversion), the least sharp kept frame first
+
+    def add(self, frame: np.ndarray, convert=None):
+        """Score a frame and keep it if it is among the keep sharpest so far.
+
+        With convert, convert(frame) is kept instead of a kept frame, e.g. to
+        start encoding it without holding on to it. Returns the frame or
+        conversion pushed out of the kept set, or None.
+        """
+        score = laplacian_variance(frame, self.step)
+        index = len(self.scores)
+        self.scores.append(score)
+        if len(self._heap) == self.keep and score <= self._heap[0][0]:
+            return None
+        entry = (score, index, convert(frame) if convert is not None else frame)
+        if len(self._heap) < self.keep:
+            heapq.heappush(self._heap, entry)
+            return None
+        return heapq.heapreplace(self._heap, entry)[2]
+
+    def best(self) -> list:
+        """(score, index, frame or conversion) of the kept frames, sharpest first."""
+        return sorted(self._heap, key=lambda entry: entry[0], reverse=True)
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from config import SNAPSHOT_FPS, SNAPSHOT_MAX_AGE, SNAPSHOT_IDLE_TIMEOUT
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """Keeps the latest JPEG of the video stream in memory, for instant replies.
+
+    frame_source() returns a JPEG, or None when the camera is busy with a
+    request. A background thread calls it fps times a second while snapshots
+    were asked for in the last idle_timeout seconds, then pauses so the camera
+    can close; the next get() resumes it. get() only returns frames at most
+    max_age seconds old.
+    """
+
+    def __init__(self, frame_source, fps: float = SNAPSHOT_FPS, max_age: float = SNAPSHOT_MAX_AGE,
+                 idle_timeout: float = SNAPSHOT_IDLE_TIMEOUT):
+        self.frame_source = frame_source
+        self.fps = fps
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.frames = 0
+        self.skipped = 0
+        self._latest = None  # (monotonic time the capture started, JPEG)
+        self._last_request = float('-inf')
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_paused(self) -> bool:
+        return time.monotonic() - self._last_request > self.idle_timeout
+
+    def age(self) -> float:
+        """Seconds since the cached frame was captured, or NaN if there is none."""
+        latest = self._latest
+        return time.monotonic() - latest[0] if latest is not None else float('nan')
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get(self):
+        """(JPEG, age in seconds) of the cached frame if it is fresh enough, else None.
+
+        Every call keeps the refresh loop running, or resumes it.
+        """
+        self._last_request = time.monotonic()
+        self._wake.set()
+        latest = self._latest
+        if latest is not None and (age := time.monotonic() - latest[0]) <= self.max_age:
+            self.hits += 1
+            CACHE_LOOKUPS.labels('snapshot', 'hit').inc()
+            return latest[1], age
+        self.misses += 1
+        CACHE_LOOKUPS.labels('snapshot', 'miss').inc()
+        return None
+
+    def _loop(self):
+        interval = 1 / self.fps
+        while not self._stop.is_set():
+            if self.is_paused:
+                self._wake.clear()
+                # A get() between the check and the clear has already updated _last_request
+                if self.is_paused:
+                    logger.debug("Snapshot refresh paused")
+                    self._wake.wait()
+                continue
+            started = time.monotonic()
+            try:
+                data = self.frame_source()
+            except Exception as e:
+                logger.error(f"Error capturing snapshot: {e}", exc_info=True)
+                self._stop.wait(1)  # back off while the camera is failing
+                continue
+            if data is None:
+                self.skipped += 1
+            else:
+                self._latest = (started, data)
+                self.frames += 1
+            self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'age': round(self.age(), 1),
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'paused': self.is_paused,
+        }
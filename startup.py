@@ -0,0 +1,39 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class StartupTimer:
+    """Wall time of the startup phases, measured from when this module was first imported.
+
+    Phases may overlap, e.g. the camera warming up while the bot is built, so
+    each is reported with the offset at which it started.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # name -> (start offset, seconds)
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the body of the with statement as a startup phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = (started - self.started, time.perf_counter() - started)
+
+    def report(self) -> str:
+        """One line per phase in start order, then the total so far."""
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1][0])
+        lines = [f"{name:<16} +{offset:5.2f}s {seconds:6.2f}s" for name, (offset, seconds) in phases]
+        lines.append(f"{'total':<16} {self.elapsed():14.2f}s")
+        return "\n".join(lines)
+
+
+STARTUP = StartupTimer()
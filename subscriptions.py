@@ -0,0 +1,51 @@
+import logging
+import sqlite3
+import threading
+from config import DB_FILE
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    created TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (topic, chat_id)
+);
+"""
+
+class SubscriptionStore:
+    """Chats subscribed to a notification topic (e.g. 'motion'), persisted in SQLite."""
+
+    def __init__(self, db_file=DB_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_file), check_same_thread=False)
+        self._conn.executescript(CREATE_TABLE)
+
+    def add(self, chat_id: int, topic: str) -> bool:
+        """Subscribe chat_id to topic; return False if it already was."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO subscriptions (chat_id, topic) VALUES (?, ?)", (chat_id, topic)
+            )
+        return cursor.rowcount > 0
+
+    def remove(self, chat_id: int, topic: str) -> bool:
+        """Unsubscribe chat_id from topic; return False if it was not subscribed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM subscriptions WHERE chat_id = ? AND topic = ?", (chat_id, topic)
+            )
+        return cursor.rowcount > 0
+
+    def chats(self, topic: str) -> list:
+        """Chat ids subscribed to topic."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT chat_id FROM subscriptions WHERE topic = ? ORDER BY created", (topic,)
+            )]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,56 @@
+"""Synthetic camera frames and photos with known answers, shared by the tests and benchmark.py."""
+import io
+
+import numpy as np
+
+
+def synthetic_motion_frames(count: int, size: tuple, seed: int):
+    """Noisy static scene with a lighting change at 1/4 and a bright blob crossing it in the second half.
+
+    Returns the frames and the (first, last) index of the frames containing the blob.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    scene = rng.integers(40, 120, (height, width)).astype(np.int16)
+    frames = np.empty((count, height, width), dtype=np.uint8)
+    moving = (count // 2, count * 3 // 4)
+    blob = max(4, min(width, height) // 6)
+    for index in range(count):
+        frame = scene + rng.integers(-4, 5, (height, width))  # sensor noise
+        if index >= count // 4:
+            frame += 60  # lights switched on
+        if moving[0] <= index < moving[1]:
+            x = (index - moving[0]) * (width - blob) // max(1, moving[1] - moving[0] - 1)
+            frame[height // 2 - blob // 2:height // 2 + blob // 2, x:x + blob] = 250
+        frames[index] = np.clip(frame, 0, 255)
+    return frames, moving
+
+
+def synthetic_burst_frames(count: int, size: tuple, seed: int):
+    """A textured RGB scene and copies of it blurred to different degrees, in random order.
+
+    Returns the frames and the index of the only unblurred one.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    scene = rng.integers(0, 256, (height, width, 3)).astype(np.float32)
+    scene = (scene + np.roll(scene, 1, axis=0) + np.roll(scene, 1, axis=1)) / 3  # some spatial structure
+    frames = np.empty((count, height, width, 3), dtype=np.uint8)
+    sharpest = int(rng.integers(count))
+    radii = rng.permutation(count - 1) + 1
+    for index in range(count):
+        frame = scene
+        radius = 0 if index == sharpest else radii[index - (index > sharpest)]
+        for axis in (0, 1):  # box blur, as camera shake or missed focus would
+            frame = sum(np.roll(frame, shift, axis=axis) for shift in range(-radius, radius + 1)) / (2 * radius + 1)
+        frames[index] = np.clip(frame + rng.normal(0, 2, frame.shape), 0, 255)  # sensor noise
+    return frames, sharpest
+
+
+def sample_jpeg(size: tuple) -> bytes:
+    """A noisy JPEG of size, compressing about as badly as a real photo."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
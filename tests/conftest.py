@@ -0,0 +1,17 @@
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Media, databases and logs written by the tests go to a scratch directory
+os.environ.setdefault('PICAMERA_BOT_DATA_DIR', tempfile.mkdtemp(prefix='picamera-bot-tests-'))
+
+if importlib.util.find_spec('settings') is None:
+    # config reads the bot token from settings.py, which is not part of the repository. A file
+    # rather than a module object, so worker processes started by the tests find it too
+    _settings_dir = tempfile.mkdtemp(prefix='picamera-bot-settings-')
+    Path(_settings_dir, 'settings.py').write_text("TOKEN = '123:test'\n")
+    sys.path.append(_settings_dir)
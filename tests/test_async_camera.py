@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import async_camera
+from async_camera import AsyncCameraHandler
+from camera_backend import FakeCameraBackend
+from camera_handler import CameraHandler
+
+
+@pytest.fixture
+def slow_camera():
+    backend = FakeCameraBackend(capture_delay=0.5)
+    camera = AsyncCameraHandler(CameraHandler(backend=backend))
+    yield camera, backend
+    camera.close()
+
+
+def test_concurrent_requests_share_one_capture(slow_camera):
+    camera, backend = slow_camera
+
+    async def main():
+        return await asyncio.gather(*(camera.capture_photo_data() for _ in range(20)))
+
+    photos = asyncio.run(main())
+    assert backend.capture_count == 1
+    assert len({photo.path for photo in photos}) == 1
+
+
+def test_waiter_timing_out_does_not_abort_the_capture(slow_camera):
+    camera, backend = slow_camera
+
+    async def main():
+        impatient = asyncio.ensure_future(camera.capture_photo_data(timeout=0.1))
+        patient = asyncio.ensure_future(camera.capture_photo_data())
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        return await patient
+
+    photo = asyncio.run(main())
+    assert photo.data == backend.jpeg_sample
+    assert backend.capture_count == 1
+
+
+def test_cancelled_waiter_does_not_abort_the_capture(slow_camera):
+    camera, backend = slow_camera
+
+    async def main():
+        cancelled = asyncio.ensure_future(camera.capture_photo_data())
+        waiting = asyncio.ensure_future(camera.capture_photo_data())
+        await asyncio.sleep(0.1)
+        cancelled.cancel()
+        photo = await waiting
+        assert cancelled.cancelled()
+        return photo
+
+    photo = asyncio.run(main())
+    assert photo.data == backend.jpeg_sample
+    assert backend.capture_count == 1
+
+
+def test_recent_result_is_reused_then_forgotten(monkeypatch, slow_camera):
+    monkeypatch.setattr(async_camera, 'PHOTO_COALESCE_WINDOW', 0.2)
+    camera, backend = slow_camera
+
+    async def main():
+        first = await camera.capture_photo_data()
+        assert await camera.capture_photo_data() is first
+        assert camera._last_results
+        await asyncio.sleep(0.3)
+        assert not camera._last_results
+        return first, await camera.capture_photo_data()
+
+    first, later = asyncio.run(main())
+    assert later is not first
+    assert backend.capture_count == 2
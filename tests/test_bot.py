@@ -0,0 +1,49 @@
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+from telegram import Update
+
+from bot import PiCameraBot
+from camera_backend import FakeCameraBackend
+from config import DATA_DIR, IMAGE_DIR
+from fake_telegram import FakeBotAPI
+
+
+def _callback_update(update_id: int, data: str) -> dict:
+    user = {'id': 1001, 'is_bot': False, 'first_name': "Test"}
+    chat = {'id': 1001, 'type': 'private'}
+    return {
+        'update_id': update_id,
+        'callback_query': {'id': str(update_id), 'from': user, 'chat_instance': '1', 'data': data,
+                           'message': {'message_id': 1, 'date': int(time.time()), 'chat': chat}},
+    }
+
+
+@pytest.mark.parametrize('name', ['../secret.jpg', '..', '', 'missing.jpg'])
+def test_full_resolution_only_sends_existing_photos(name):
+    IMAGE_DIR.mkdir(exist_ok=True)
+    (DATA_DIR / 'secret.jpg').write_bytes(b'jpeg')
+    photo = IMAGE_DIR / '20240101_12_00_00.jpg'
+    photo.write_bytes(b'jpeg')
+
+    async def main():
+        api = FakeBotAPI()
+        bot = PiCameraBot(backend=FakeCameraBackend(), request=api)
+        bot.setup_handlers()
+        application = bot.application
+        await application.initialize()
+        try:
+            for update_id, data in enumerate([f"full:{name}", f"full:{photo.name}"], start=1):
+                await application.process_update(Update.de_json(_callback_update(update_id, data), application.bot))
+        finally:
+            await application.shutdown()
+            await asyncio.to_thread(bot.close)
+        return api
+
+    api = asyncio.run(main())
+    methods = Counter(method for method, _, _ in api.calls)
+    # The first callback gets "no longer available", the second the photo
+    assert methods['sendMessage'] == 1
+    assert methods['sendDocument'] == 1
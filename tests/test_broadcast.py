@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from telegram import Bot
+
+from broadcast import Broadcaster
+from fake_telegram import FakeBotAPI
+from media_cache import FileIdCache
+from subscriptions import SubscriptionStore
+from synthetic_media import sample_jpeg
+
+CHATS = list(range(1, 6))
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(sample_jpeg((64, 48)))
+    return path
+
+
+@pytest.fixture
+def stores(tmp_path):
+    subscriptions = SubscriptionStore(tmp_path / 'bot.db')
+    file_ids = FileIdCache(tmp_path / 'bot.db')
+    for chat_id in CHATS:
+        subscriptions.add(chat_id, 'photos')
+    yield subscriptions, file_ids
+    subscriptions.close()
+    file_ids.close()
+
+
+def _broadcast(api, stores, photo) -> dict:
+    subscriptions, file_ids = stores
+
+    async def main():
+        async with Bot('123:test', request=api) as bot:
+            broadcaster = Broadcaster(bot, subscriptions, file_ids, rate=1000, chat_rate=1000)
+            return await broadcaster.broadcast('photos', photo)
+    return asyncio.run(main())
+
+
+def _uploads(api) -> int:
+    return sum(1 for method, _, size in api.calls if method == 'sendPhoto' and size)
+
+
+def test_uploads_once_and_reuses_the_file_id(stores, photo):
+    api = FakeBotAPI(latency=0, bandwidth=1e9)
+    results = _broadcast(api, stores, photo)
+    assert results['sent'] == len(CHATS)
+    assert _uploads(api) == 1
+    assert stores[1].get(photo) is not None
+
+
+def test_rejected_cached_file_id_is_uploaded_again(stores, photo):
+    subscriptions, file_ids = stores
+    file_ids.put(photo, 'stale-file-id')
+    api = FakeBotAPI(latency=0, bandwidth=1e9, invalid_file_ids={'stale-file-id'})
+    results = _broadcast(api, stores, photo)
+    assert results['sent'] == len(CHATS) and results['failed'] == 0
+    assert api.rejected[400] == 1
+    assert _uploads(api) == 1
+    assert file_ids.get(photo) not in (None, 'stale-file-id')
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+import camera_handler
+from camera_backend import FakeCameraBackend
+from camera_handler import CameraHandler
+
+
+@pytest.fixture
+def backend():
+    return FakeCameraBackend()
+
+
+@pytest.fixture
+def camera(backend):
+    camera = CameraHandler(backend=backend)
+    yield camera
+    camera.close()
+
+
+def _photo(camera):
+    camera.capture_photo_data().saved.result(timeout=5)
+
+
+def test_camera_opens_on_first_use_and_stays_warm():
+    backend = FakeCameraBackend(open_delay=0.2)
+    camera = CameraHandler(backend=backend)
+    try:
+        assert backend.open_count == 0 and not camera.is_open
+        started = time.monotonic()
+        _photo(camera)
+        assert time.monotonic() - started >= 0.2
+        assert backend.open_count == 1 and camera.is_open
+
+        started = time.monotonic()
+        _photo(camera)
+        assert time.monotonic() - started < 0.2
+        assert backend.open_count == 1
+    finally:
+        camera.close()
+
+
+def test_reconfigures_only_when_the_mode_changes(camera, backend):
+    _photo(camera)
+    _photo(camera)
+    assert backend.configure_count == 1 and backend.mode[0] == 'still'
+    camera.capture_frame(timeout=1)
+    camera.capture_frame(timeout=1)
+    assert backend.configure_count == 2 and backend.mode[0] == 'video'
+    _photo(camera)
+    assert backend.configure_count == 3 and backend.mode[0] == 'still'
+    assert backend.open_count == 1
+
+
+def test_closes_after_the_idle_timeout(monkeypatch, camera, backend):
+    monkeypatch.setattr(camera_handler, 'CAMERA_IDLE_TIMEOUT', 0.2)
+    _photo(camera)
+    assert camera.is_open
+    time.sleep(0.5)
+    assert not camera.is_open and not backend.is_open
+
+    _photo(camera)
+    assert backend.open_count == 2
+
+
+def test_close(camera, backend):
+    _photo(camera)
+    camera.close()
+    assert not camera.is_open and not backend.is_open
+    camera.close()
+
+    _photo(camera)
+    assert backend.open_count == 2 and backend.mode[0] == 'still'
+
+
+def test_motion_frames_wait_for_the_still_hold(monkeypatch, camera, backend):
+    monkeypatch.setattr(camera_handler, 'MOTION_ENABLED', True)
+    assert camera.capture_lores() is not None
+    camera.capture_photo_data().saved.result(timeout=5)
+    configured = backend.configure_count
+
+    assert camera.capture_lores() is None
+    camera.capture_photo_data().saved.result(timeout=5)
+    assert backend.configure_count == configured
+
+    monkeypatch.setattr(camera_handler, 'CAMERA_STILL_HOLD', 0)
+    assert camera.capture_lores() is not None
+    assert backend.mode[0] == 'video'
+
+
+def test_snapshots_wait_for_the_still_hold(monkeypatch, camera, backend):
+    assert camera.capture_snapshot() == backend.jpeg_sample
+    camera.capture_photo_data().saved.result(timeout=5)
+    configured = backend.configure_count
+
+    assert camera.capture_snapshot() is None
+    assert backend.configure_count == configured
+    assert backend.mode[0] == 'still'
+
+    monkeypatch.setattr(camera_handler, 'CAMERA_STILL_HOLD', 0)
+    assert camera.capture_snapshot() == backend.jpeg_sample
+    assert backend.mode[0] == 'video'
+
+
+def test_requested_snapshot_takes_a_video_frame_during_the_hold(camera, backend):
+    _photo(camera)
+    assert camera.capture_snapshot() is None
+    assert camera.capture_snapshot(wait=True) == backend.jpeg_sample
+    assert backend.mode[0] == 'video'
+    assert camera.capture_snapshot() == backend.jpeg_sample
+
+
+def test_warm_up_does_not_start_the_still_hold(camera, backend):
+    camera.warm_up()
+    assert backend.mode[0] == 'still'
+    assert camera.capture_snapshot() == backend.jpeg_sample
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+from camera_scheduler import CameraBusyError, CameraScheduler, QueueFullError, RateLimitedError
+
+
+def test_stop_fails_jobs_that_are_still_running():
+    async def main():
+        scheduler = CameraScheduler()
+        scheduler.start()
+        job = scheduler.submit('photo', 1, lambda: asyncio.sleep(10))
+        await asyncio.sleep(0)
+        await scheduler.drain(0.2)
+        await scheduler.stop()
+        assert job.future.done()
+        with pytest.raises(CameraBusyError):
+            await asyncio.wait_for(job, 1)
+
+    asyncio.run(main())
+
+
+def test_bursts_run_one_at_a_time_with_their_own_estimate():
+    async def main():
+        scheduler = CameraScheduler(user_rate=100, user_burst=100, photo_estimate=1, burst_estimate=4)
+        scheduler.start()
+        running = []
+
+        async def burst():
+            running.append(len(scheduler._running))
+            await asyncio.sleep(0.05)
+
+        jobs = [scheduler.submit('burst', user_id, burst) for user_id in (1, 2, 3)]
+        assert [job.position for job in jobs] == [0, 1, 2]
+        assert [job.eta for job in jobs] == [0, 4, 8]
+        await asyncio.gather(*jobs)
+        await scheduler.stop()
+        assert running == [1, 1, 1]
+        assert scheduler._estimates['photo'] == 1
+        assert scheduler._estimates['burst'] < 4
+
+    asyncio.run(main())
+
+
+def _scheduler(**kwargs):
+    limits = {'user_rate': 100, 'user_burst': 100, 'photo_estimate': 1, 'burst_estimate': 4, 'video_overhead': 2}
+    return CameraScheduler(**{**limits, **kwargs})
+
+
+def _recorder(started: list, name, seconds: float = 0):
+    async def run():
+        started.append(name)
+        await asyncio.sleep(seconds)
+        return name
+    return run
+
+
+def test_photos_go_first_then_bursts_then_videos():
+    async def main():
+        scheduler = _scheduler()
+        started = []
+        jobs = [
+            scheduler.submit('video', 1, _recorder(started, 'video'), 1),
+            scheduler.submit('burst', 2, _recorder(started, 'burst')),
+            scheduler.submit('photo', 3, _recorder(started, 'photo')),
+        ]
+        scheduler.start()
+        await asyncio.gather(*jobs)
+        await scheduler.stop()
+        assert started == ['photo', 'burst', 'video']
+
+    asyncio.run(main())
+
+
+def test_users_take_turns_within_a_priority():
+    async def main():
+        scheduler = _scheduler()
+        started = []
+        jobs = [scheduler.submit('video', user, _recorder(started, (user, index)), 1)
+                for user, index in ((1, 0), (1, 1), (2, 0), (2, 1))]
+        scheduler.start()
+        await asyncio.gather(*jobs)
+        await scheduler.stop()
+        assert started == [(1, 0), (2, 0), (1, 1), (2, 1)]
+
+    asyncio.run(main())
+
+
+def test_queued_photos_start_together():
+    async def main():
+        scheduler = _scheduler()
+        started = []
+        jobs = [scheduler.submit('photo', user, _recorder(started, user, 0.05)) for user in (1, 2, 3)]
+        scheduler.start()
+        await asyncio.sleep(0.01)
+        assert sorted(started) == [1, 2, 3]
+        assert len(scheduler._running) == 3
+        await asyncio.gather(*jobs)
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_admission_control():
+    async def main():
+        scheduler = _scheduler(max_queue=3, max_jobs_per_user=2)
+        run = _recorder([], None)
+        scheduler.submit('photo', 1, run)
+        scheduler.submit('photo', 1, run)
+        with pytest.raises(RateLimitedError):
+            scheduler.submit('photo', 1, run)
+        scheduler.submit('photo', 2, run)
+        with pytest.raises(QueueFullError):
+            scheduler.submit('photo', 3, run)
+        assert scheduler.queue_depth == 3
+
+        limited = _scheduler(user_rate=0.01, user_burst=1)
+        limited.submit('photo', 1, run)
+        with pytest.raises(RateLimitedError, match="try again in"):
+            limited.submit('video', 1, run, 1)
+
+        await scheduler.stop()
+        with pytest.raises(CameraBusyError):
+            scheduler.submit('photo', 4, run)
+
+    asyncio.run(main())
+
+
+def test_position_and_eta():
+    async def main():
+        scheduler = _scheduler()
+        run = _recorder([], None)
+        first = scheduler.submit('video', 1, run, 10)
+        second = scheduler.submit('video', 2, run, 5)
+        burst = scheduler.submit('burst', 3, run)
+        photo = scheduler.submit('photo', 4, run)
+        late_photo = scheduler.submit('photo', 5, run)
+        assert (first.position, first.eta) == (0, 0)
+        assert (second.position, second.eta) == (1, 12)
+        assert (burst.position, burst.eta) == (0, 0)
+        assert (photo.position, photo.eta) == (0, 0)
+        assert (late_photo.position, late_photo.eta) == (0, 0)
+
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_running_jobs_count_as_ahead_for_their_time_left():
+    async def main():
+        scheduler = _scheduler()
+        running = scheduler.submit('video', 1, _recorder([], None, 0.1), 10)
+        scheduler.start()
+        while running.started_at is None:
+            await asyncio.sleep(0.01)
+        waiting = scheduler.submit('photo', 2, _recorder([], None))
+        assert waiting.position == 1
+        assert 11 < waiting.eta <= 12
+        await asyncio.gather(running, waiting)
+        await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_jobs_cancelled_while_queued_do_not_change_the_estimate():
+    async def main():
+        scheduler = _scheduler()
+        started = []
+        blocker = scheduler.submit('photo', 1, _recorder(started, 'photo', 0.05))
+        cancelled = scheduler.submit('video', 2, _recorder(started, 'video'), 1)
+        cancelled.future.cancel()
+        scheduler.start()
+        await blocker
+        await scheduler.drain(1)
+        await scheduler.stop()
+        assert started == ['photo']
+        assert scheduler._estimates['video'] == 2
+
+    asyncio.run(main())
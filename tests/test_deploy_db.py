@@ -0,0 +1,105 @@
+import sqlite3
+import time
+from collections import Counter
+
+import pytest
+
+from check_db import (
+    fetch_commands_per_day, fetch_commands_per_hour, fetch_last_actions, fetch_last_actions_full_scan,
+    fetch_top_users
+)
+from deploy_db import CREATE_TABLES, MIGRATIONS, migrate
+
+NOW = int(time.time()) // 3600 * 3600 - 1800  # half past an hour, so hours ago stay within the same hour
+
+# (user, hours ago, command) of the rows in the database before the rollups existed
+BASELINE = [
+    ('alice', 30, '/start'), ('alice', 5, '📸 Capture Photo'), ('alice', 2, '📸 Capture Photo'),
+    ('bob', 50, '/start'), ('bob', 2, '📹 Record Video'),
+    ('carol', 1, '/start'),
+]
+
+
+def _timestamp(ts: int) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """A database written before schema versions, with only the interactions table."""
+    conn = sqlite3.connect(str(tmp_path / 'bot.db'))
+    conn.executescript(CREATE_TABLES)
+    with conn:
+        conn.executemany(
+            "INSERT INTO interactions (user_id, timestamp, command) VALUES (?, ?, ?)",
+            [(user, _timestamp(NOW - hours * 3600), command) for user, hours, command in BASELINE]
+        )
+    yield conn
+    conn.close()
+
+
+def _insert(conn, user: str, hours: float, command: str):
+    ts = int(NOW - hours * 3600)
+    with conn:
+        conn.execute(
+            "INSERT INTO interactions (user_id, timestamp, ts, command) VALUES (?, ?, ?, ?)",
+            (user, _timestamp(ts), ts, command)
+        )
+
+
+def _expected_counts(rows, bucket) -> dict:
+    return Counter((bucket(NOW - hours * 3600), command) for _, hours, command in rows)
+
+
+def _check_rollups(conn, rows):
+    assert sorted(fetch_last_actions(conn)) == sorted(fetch_last_actions_full_scan(conn))
+    totals = Counter(user for user, _, _ in rows)
+    assert {user: total for user, total, _ in fetch_top_users(conn)} == totals
+    assert [user for user, _, _ in fetch_top_users(conn, 1)] == [totals.most_common(1)[0][0]]
+
+    daily = _expected_counts(rows, lambda ts: time.strftime('%Y-%m-%d', time.localtime(ts)))
+    assert {(day, command): count for day, command, count in fetch_commands_per_day(conn, 7)} == daily
+    # Hours are epoch-aligned, so in half-hour time zones they are labelled by the local hour they start in
+    hourly = _expected_counts(
+        [row for row in rows if row[1] < 24],
+        lambda ts: time.strftime('%Y-%m-%d %H:00', time.localtime(ts // 3600 * 3600))
+    )
+    assert {(hour, command): count for hour, command, count in fetch_commands_per_hour(conn, 24)} == hourly
+
+
+def test_baseline_database_is_migrated_to_the_latest_version(conn):
+    assert migrate(conn) == len(MIGRATIONS)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    assert migrate(conn) == len(MIGRATIONS)
+    backfilled = [ts for ts, in conn.execute("SELECT ts FROM interactions ORDER BY id")]
+    assert backfilled == [NOW - hours * 3600 for _, hours, _ in BASELINE]
+
+
+def test_rollups_are_built_from_existing_rows(conn):
+    migrate(conn)
+    _check_rollups(conn, BASELINE)
+    last = {user: command for _, user, _, command in fetch_last_actions(conn)}
+    assert last == {'alice': '📸 Capture Photo', 'bob': '📹 Record Video', 'carol': '/start'}
+
+
+def test_trigger_keeps_rollups_up_to_date(conn):
+    migrate(conn)
+    added = [('carol', 0.5, '🎥 Show Latest Video'), ('dave', 3, '/start'), ('alice', 10, 'callback:star')]
+    for user, hours, command in added:
+        _insert(conn, user, hours, command)
+    _check_rollups(conn, BASELINE + added)
+    last = {user: command for _, user, _, command in fetch_last_actions(conn)}
+    # alice's late-arriving older row counts towards her total but is not her last action
+    assert last['alice'] == '📸 Capture Photo'
+    assert last['carol'] == '🎥 Show Latest Video'
+    assert fetch_last_actions(conn, 1)[0][1] == 'carol'
+
+
+def test_failed_migration_is_rolled_back(conn, monkeypatch):
+    import deploy_db
+
+    monkeypatch.setattr(deploy_db, 'MIGRATIONS', MIGRATIONS + ["CREATE TABLE interactions (id INTEGER);"])
+    with pytest.raises(sqlite3.Error):
+        deploy_db.migrate(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    assert not conn.in_transaction
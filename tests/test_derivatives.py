@@ -0,0 +1,40 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from config import IMAGE_DIR
+from derivatives import DerivativeGenerator
+from file_manager import FileManager
+from media_cache import FileIdCache
+from synthetic_media import sample_jpeg
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return tmp_path / 'file_ids.db'
+
+
+@pytest.fixture
+def generator(db_file):
+    file_ids = FileIdCache(db_file)
+    generator = DerivativeGenerator(FileManager(), file_ids, workers=1)
+    yield generator
+    generator.close()
+    file_ids.close()
+
+
+def test_removing_a_photo_drops_its_derivatives_and_their_file_ids(generator, db_file):
+    photo_path = IMAGE_DIR / '20240101_12_00_00.jpg'
+    photo_path.write_bytes(sample_jpeg((640, 480)))
+    preview = asyncio.run(generator.preview(photo_path))
+    preview.saved.result(timeout=5)
+    generator.file_ids.put(preview.path, 'preview-file-id')
+    assert generator.file_ids.get(preview.path) == 'preview-file-id'
+
+    generator.remove(photo_path)
+    assert not any(path.exists() for path in generator.paths(photo_path))
+    assert generator.file_ids.get(preview.path) is None
+    generator.file_ids.close()  # finishes the pending writes
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT count(*) FROM media_file_ids").fetchone() == (0,)
@@ -0,0 +1,88 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from config import FILE_DATE_FORMAT
+from file_manager import MediaIndex
+
+
+def _name(day: int) -> str:
+    return f"{datetime(2024, 1, day, 12).strftime(FILE_DATE_FORMAT)}.jpg"
+
+
+def _touch_directory(directory):
+    """Move the directory mtime forward, as a change outside the bot a moment later would."""
+    mtime = directory.stat().st_mtime_ns + 1_000_000_000
+    os.utime(directory, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def index(tmp_path):
+    for day in (3, 1, 2):
+        (tmp_path / _name(day)).write_bytes(b'jpeg')
+    (tmp_path / 'notes.txt').write_text('not media')
+    index = MediaIndex(tmp_path, '*.jpg')
+    index.rescan()
+    scans = []
+    rescan = index._rescan
+    index._rescan = lambda: scans.append(1) or rescan()
+    index.scans = scans
+    return index
+
+
+def test_files_are_ordered_by_the_timestamp_in_their_name(index, tmp_path):
+    assert [path.name for path in index.latest()] == [_name(3), _name(2), _name(1)]
+    assert index.latest(2) == [tmp_path / _name(3), tmp_path / _name(2)]
+    assert index.latest(0) == []
+    timestamps = [timestamp for timestamp, _ in index.files()]
+    assert timestamps == [datetime(2024, 1, day, 12).timestamp() for day in (1, 2, 3)]
+
+
+def test_names_without_a_timestamp_use_the_ctime(index, tmp_path):
+    path = tmp_path / 'upload.jpg'
+    path.write_bytes(b'jpeg')
+    index.add(path)
+    assert index.latest(1) == [path]
+    assert index.files()[-1][0] == path.stat().st_ctime
+
+
+def test_files_added_and_removed_by_the_bot_need_no_rescan(index, tmp_path):
+    path = tmp_path / _name(4)
+    path.write_bytes(b'jpeg')
+    index.add(path)
+    assert index.latest(1) == [path]
+    path.unlink()
+    index.remove(path)
+    assert index.latest(1) == [tmp_path / _name(3)]
+    assert len(index) == 3
+    assert index.scans == []
+
+
+def test_files_added_outside_the_bot_are_found(index, tmp_path):
+    (tmp_path / _name(5)).write_bytes(b'jpeg')
+    _touch_directory(tmp_path)
+    assert index.latest(1) == [tmp_path / _name(5)]
+    assert index.scans == [1]
+    index.latest()
+    assert index.scans == [1]
+
+
+def test_files_deleted_outside_the_bot_are_dropped(index, tmp_path):
+    (tmp_path / _name(3)).unlink()
+    _touch_directory(tmp_path)
+    assert [path.name for path in index.latest()] == [_name(2), _name(1)]
+
+
+def test_files_replaced_outside_the_bot_are_reordered(index, tmp_path):
+    os.rename(tmp_path / _name(1), tmp_path / _name(9))
+    _touch_directory(tmp_path)
+    assert [path.name for path in index.latest()] == [_name(9), _name(3), _name(2)]
+
+
+def test_missing_directory_is_empty(tmp_path):
+    index = MediaIndex(tmp_path / 'missing', '*.jpg')
+    assert index.latest() == []
+    (tmp_path / 'missing').mkdir()
+    (tmp_path / 'missing' / _name(1)).write_bytes(b'jpeg')
+    assert [path.name for path in index.latest()] == [_name(1)]
@@ -0,0 +1,75 @@
+import sqlite3
+import time
+
+import pytest
+
+from interaction_log import InteractionRecorder
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return tmp_path / 'interactions.db'
+
+
+def _stored(db_file) -> list:
+    with sqlite3.connect(str(db_file)) as conn:
+        return [row[0] for row in conn.execute("SELECT command FROM interactions ORDER BY id")]
+
+
+def _wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_events_are_dropped_while_the_queue_is_full(db_file):
+    recorder = InteractionRecorder(db_file, queue_size=3, flush_interval=60)
+    for index in range(5):
+        recorder.record(1, f"/command{index}")
+    assert recorder.dropped == 2
+    assert recorder.stats()['pending'] == 3
+    recorder.start()
+    recorder.close()
+    assert _stored(db_file) == ["/command0", "/command1", "/command2"]
+    assert recorder.stats()['recorded'] == 3
+
+
+def test_full_batches_are_written_in_one_transaction_each(db_file):
+    recorder = InteractionRecorder(db_file, batch_size=10, flush_interval=60)
+    recorder.start()
+    try:
+        for index in range(25):
+            recorder.record(index % 3, f"/command{index}")
+        assert _wait_for(lambda: recorder.recorded == 20)
+        assert recorder.flushes == 2
+    finally:
+        recorder.close()
+    assert recorder.flushes == 3
+    assert _stored(db_file) == [f"/command{index}" for index in range(25)]
+
+
+def test_partial_batches_are_written_after_the_flush_interval(db_file):
+    recorder = InteractionRecorder(db_file, batch_size=100, flush_interval=0.1)
+    recorder.start()
+    try:
+        recorder.record(1, "/start")
+        recorder.record(2, "/photo")
+        assert _wait_for(lambda: recorder.recorded == 2)
+        assert recorder.flushes == 1
+        assert _stored(db_file) == ["/start", "/photo"]
+    finally:
+        recorder.close()
+
+
+def test_close_drains_pending_events(db_file):
+    recorder = InteractionRecorder(db_file, batch_size=100, flush_interval=60)
+    recorder.start()
+    for index in range(7):
+        recorder.record(1, f"/command{index}")
+    recorder.close()
+    assert recorder.stats() == {'recorded': 7, 'dropped': 0, 'flushes': 1, 'pending': 0}
+    assert len(_stored(db_file)) == 7
+    # Closing again, or without starting, does nothing
+    recorder.close()
+    InteractionRecorder(db_file).close()
@@ -0,0 +1,51 @@
+import sqlite3
+import time
+
+import pytest
+
+from media_cache import FileIdCache
+
+
+@pytest.fixture
+def media_file(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'jpeg')
+    return path
+
+
+def test_file_ids_persist_across_restarts(tmp_path, media_file):
+    db_file = tmp_path / 'file_ids.db'
+    cache = FileIdCache(db_file)
+    cache.put(media_file, 'file-id')
+    cache.close()
+
+    cache = FileIdCache(db_file)
+    assert cache.get(media_file) == 'file-id'
+    cache.invalidate(media_file)
+    cache.close()
+    assert FileIdCache(db_file).get(media_file) is None
+
+
+def test_changed_file_is_uploaded_again(tmp_path, media_file):
+    cache = FileIdCache(tmp_path / 'file_ids.db')
+    cache.put(media_file, 'file-id')
+    media_file.write_bytes(b'another jpeg')
+    assert cache.get(media_file) is None
+    cache.close()
+
+
+def test_updates_do_not_wait_for_a_locked_database(tmp_path, media_file):
+    db_file = tmp_path / 'file_ids.db'
+    cache = FileIdCache(db_file)
+    other = sqlite3.connect(str(db_file), isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # holds the write lock, as a long interaction log flush would
+    try:
+        started = time.monotonic()
+        cache.put(media_file, 'file-id')
+        assert time.monotonic() - started < 0.5
+        assert cache.get(media_file) == 'file-id'
+    finally:
+        other.execute("COMMIT")
+        other.close()
+    cache.close()
+    assert FileIdCache(db_file).get(media_file) == 'file-id'
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from motion import MotionDetector, region_mask
+from synthetic_media import synthetic_motion_frames
+
+
+@pytest.fixture(scope='module')
+def recording(tmp_path_factory):
+    """A stored .npy sequence: noise, a light switched on at 1/4, a blob crossing the middle in the second half."""
+    frames, moving = synthetic_motion_frames(120, (160, 120), seed=1)
+    path = tmp_path_factory.mktemp('motion') / 'frames.npy'
+    np.save(path, frames)
+    return path, moving
+
+
+def _triggers(detector: MotionDetector, frames) -> list:
+    triggered = []
+    for index, frame in enumerate(frames):
+        detector.process(frame)
+        if detector.triggered:
+            triggered.append(index)
+    return triggered
+
+
+def test_triggers_once_the_blob_has_moved_for_trigger_frames(recording):
+    path, (first, last) = recording
+    detector = MotionDetector(trigger_frames=3)
+    triggered = _triggers(detector, np.load(path))
+    assert triggered
+    assert triggered[0] == first + detector.trigger_frames - 1
+
+
+def test_no_triggers_on_noise_or_a_light_change(recording):
+    path, (first, last) = recording
+    detector = MotionDetector(trigger_frames=3)
+    triggered = _triggers(detector, np.load(path))
+    assert all(first <= index < last + detector.trigger_frames for index in triggered)
+
+
+def test_motion_outside_the_regions_is_ignored(recording):
+    path, _ = recording
+    frames = np.load(path)
+    # The blob crosses the vertical middle of the frame
+    assert not _triggers(MotionDetector(regions=[(0, 0, 1, 0.3)]), frames)
+    assert _triggers(MotionDetector(regions=[(0, 0.3, 1, 0.7)]), frames)
+
+
+def test_region_mask():
+    mask = region_mask((10, 20), [(0, 0, 0.5, 0.5), (0.5, 0.5, 1, 1)])
+    assert mask[:5, :10].all() and mask[5:, 10:].all()
+    assert not mask[:5, 10:].any() and not mask[5:, :10].any()
+    assert region_mask((10, 20), []) is None
+
+
+def test_change_above_max_area_resets_the_background():
+    rng = np.random.default_rng(2)
+    scene = rng.integers(40, 120, (60, 80)).astype(np.uint8)
+    detector = MotionDetector(downscale=1, max_area=0.8, trigger_frames=1)
+    detector.process(scene)
+    assert detector.process(scene) == 0.0
+
+    lit = scene + 80
+    assert detector.process(lit) > detector.max_area
+    assert not detector.triggered
+    # The lit scene is now the background: the same frame again shows no motion
+    assert detector.process(lit) == 0.0
+    assert not detector.triggered
@@ -0,0 +1,53 @@
+import pytest
+
+from preroll import FrameRingBuffer
+
+
+@pytest.fixture
+def ring():
+    return FrameRingBuffer(max_seconds=60, max_bytes=1000)
+
+
+def _feed(ring, pattern: str):
+    """Write one frame per character: K is a keyframe, anything else is not."""
+    for char in pattern:
+        ring.write_frame(char.encode(), char == 'K')
+
+
+def _stream(frames) -> str:
+    return b''.join(frame.data for frame in frames).decode()
+
+
+def test_ring_starts_at_a_keyframe(ring):
+    _feed(ring, 'ppKpp')
+    assert _stream(ring.snapshot(60)) == 'Kpp'
+
+
+def test_ring_drops_whole_groups_beyond_the_byte_limit():
+    ring = FrameRingBuffer(max_seconds=60, max_bytes=5)
+    _feed(ring, 'KppKppK')
+    assert _stream(ring.snapshot(60)) == 'KppK'
+    assert ring.size_bytes == 4
+
+
+def test_empty_tap_waits_for_a_keyframe(ring):
+    tap = ring.start_tap(60)
+    _feed(ring, 'ppKpKp')
+    assert _stream(ring.stop_tap(tap)) == 'KpKp'
+
+
+def test_tap_is_prefilled_from_the_last_keyframe(ring):
+    _feed(ring, 'Kpp')
+    tap = ring.start_tap(60)
+    _feed(ring, 'pKp')
+    ring.stop_tap(tap)
+    _feed(ring, 'pp')
+    assert _stream(tap) == 'KpppKp'
+
+
+def test_tap_after_clear_waits_for_a_keyframe(ring):
+    _feed(ring, 'Kpp')
+    ring.clear()
+    tap = ring.start_tap(60)
+    _feed(ring, 'pK')
+    assert _stream(ring.stop_tap(tap)) == 'K'
@@ -0,0 +1,97 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import file_manager
+from config import FILE_DATE_FORMAT
+from file_manager import FileManager
+from retention import RetentionWorker
+
+
+@pytest.fixture
+def clips(monkeypatch, tmp_path):
+    """A FileManager indexing only tmp_path, and a function writing clips of a given age there."""
+    monkeypatch.setattr(file_manager, 'MEDIA_KINDS', {'clip': (tmp_path, '*.mp4')})
+    manager = FileManager()
+    deleted = []
+    manager.add_delete_listener(deleted.append)
+
+    def write(hours_old: float, size: int = 100):
+        name = (datetime.now() - timedelta(hours=hours_old)).strftime(FILE_DATE_FORMAT)
+        path = tmp_path / f"{name}.mp4"
+        path.write_bytes(bytes(size))
+        manager.add_file(path)
+        return path
+
+    yield manager, write, deleted
+    manager.close()
+
+
+def _worker(manager, batch_size: int = 50, **policy) -> RetentionWorker:
+    limits = {'max_files': None, 'max_bytes': None, 'max_age': None}
+    return RetentionWorker(manager, {'clip': {**limits, **policy}}, batch_size=batch_size)
+
+
+def test_oldest_files_over_the_count_are_deleted(clips):
+    manager, write, deleted = clips
+    paths = [write(hours) for hours in (5, 4, 3, 2, 1)]
+    worker = _worker(manager, max_files=3)
+    assert worker.run_once() == (2, 200)
+    assert deleted == paths[:2]
+    assert [path for _, path in manager.media_files('clip')] == paths[2:]
+    assert worker.stats()['deleted_files'] == {'clip': 2}
+    assert worker.stats()['reclaimed_bytes'] == {'clip': 200}
+
+
+def test_newest_files_within_the_byte_quota_are_kept(clips):
+    manager, write, deleted = clips
+    paths = [write(hours, size) for hours, size in ((4, 100), (3, 300), (2, 100), (1, 100))]
+    worker = _worker(manager, max_bytes=250)
+    assert worker.run_once() == (2, 400)
+    assert sorted(deleted) == paths[:2]
+    assert all(path.exists() for path in paths[2:])
+
+
+def test_files_older_than_max_age_are_deleted(clips):
+    manager, write, deleted = clips
+    paths = [write(hours) for hours in (72, 48, 24, 1)]
+    worker = _worker(manager, max_age=36 * 3600)
+    worker.run_once()
+    assert deleted == paths[:2]
+    assert worker.run_once() == (0, 0)
+
+
+def test_files_within_every_limit_are_kept(clips):
+    manager, write, deleted = clips
+    for hours in (3, 2, 1):
+        write(hours)
+    assert _worker(manager, max_files=3, max_bytes=300, max_age=4 * 3600).run_once() == (0, 0)
+    assert deleted == []
+
+
+def test_deletions_stop_between_batches(clips):
+    manager, write, deleted = clips
+    paths = [write(hours) for hours in range(6, 0, -1)]
+    worker = _worker(manager, batch_size=2, max_files=1)
+    manager.add_delete_listener(lambda path: len(deleted) == 3 and worker._stopping.set())
+    worker.run_once()
+    # The batch in progress is finished, the next one is not started
+    assert deleted == paths[:4]
+
+
+def test_trigger_runs_the_background_worker(clips):
+    manager, write, deleted = clips
+    worker = _worker(manager, max_files=1)
+    worker.interval = 60
+    worker.start()
+    try:
+        first = write(2)
+        write(1)
+        worker.trigger()
+        deadline = time.monotonic() + 5
+        while not deleted and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+    assert deleted == [first]
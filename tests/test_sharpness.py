@@ -0,0 +1,122 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from camera_backend import FakeCameraBackend
+from camera_handler import CameraHandler
+from config import BURST_DIR, IMAGE_DIR
+from sharpness import SharpestFrames, laplacian_variance
+from synthetic_media import synthetic_burst_frames
+
+
+@pytest.fixture(scope='module')
+def burst():
+    """Ten 160x120 RGB frames, all but one blurred, and the index of the sharp one."""
+    return synthetic_burst_frames(10, (160, 120), seed=3)
+
+
+def _sharpest_index(frames, keep=1, step=1):
+    selector = SharpestFrames(keep, step)
+    for frame in frames:
+        selector.add(frame)
+    return [index for _, index, _ in selector.best()]
+
+
+@pytest.mark.parametrize('step', [1, 2])
+def test_unblurred_frame_ranks_first(burst, step):
+    frames, sharpest = burst
+    assert _sharpest_index(frames, step=step)[0] == sharpest
+
+
+def test_blur_lowers_the_score(burst):
+    frames, sharpest = burst
+    scores = [laplacian_variance(frame, 1) for frame in frames]
+    assert scores[sharpest] == max(scores)
+    assert all(score < scores[sharpest] for index, score in enumerate(scores) if index != sharpest)
+
+
+def test_only_the_keep_sharpest_are_kept(burst):
+    frames, _ = burst
+    selector = SharpestFrames(3, 1)
+    for frame in frames:
+        selector.add(frame)
+    best = selector.best()
+    assert len(selector.scores) == len(frames)
+    assert [index for _, index, _ in best] == list(np.argsort(selector.scores)[::-1][:3])
+    assert [score for score, _, _ in best] == sorted(selector.scores, reverse=True)[:3]
+    for _, index, frame in best:
+        assert np.array_equal(frame, frames[index])
+
+
+def test_grayscale_and_four_channel_frames_score_like_rgb(burst):
+    frames, sharpest = burst
+    green = frames[..., 1]
+    rgbx = np.concatenate([frames, np.zeros(frames.shape[:3] + (1,), dtype=np.uint8)], axis=3)
+    expected = [laplacian_variance(frame) for frame in frames]
+    assert [laplacian_variance(frame) for frame in green] == expected
+    assert [laplacian_variance(frame) for frame in rgbx] == expected
+    assert _sharpest_index(green)[0] == sharpest
+    assert _sharpest_index(rgbx)[0] == sharpest
+
+
+def test_capture_burst_with_fake_camera(burst):
+    frames, sharpest = burst
+    backend = FakeCameraBackend(burst_frames=frames)
+    camera = CameraHandler(backend=backend)
+    try:
+        photos = camera.capture_burst(len(frames), keep=2)
+        for photo in photos:
+            photo.saved.result(timeout=5)
+    finally:
+        camera.close()
+    assert len(photos) == 2
+    assert all(Path(photo.path).parent == BURST_DIR for photo in photos)
+    assert photos[0].path.endswith(f"_burst{sharpest + 1:02d}.jpg")
+    assert photos[0].data == backend.jpeg_sample
+
+
+def test_bursts_do_not_push_out_other_photos(burst):
+    frames, _ = burst
+    camera = CameraHandler(backend=FakeCameraBackend(burst_frames=frames))
+    try:
+        camera.capture_photo_data().saved.result(timeout=5)
+        photos = set(IMAGE_DIR.glob('*.jpg'))
+        for photo in camera.capture_burst(len(frames), keep=len(frames)):
+            photo.saved.result(timeout=5)
+        camera.file_manager.cleanup_old_files()
+    finally:
+        camera.close()
+    assert set(IMAGE_DIR.glob('*.jpg')) == photos
+    assert len(list(BURST_DIR.glob('*.jpg'))) >= len(frames)
+
+
+def test_burst_is_encoded_after_the_camera_is_released(burst):
+    frames, sharpest = burst
+    backend = FakeCameraBackend(burst_frames=frames, encode_delay=0.2)
+    camera = CameraHandler(backend=backend)
+    try:
+        started = time.monotonic()
+        pending = camera.start_burst(len(frames), keep=2)
+        assert time.monotonic() - started < 0.2
+        assert camera.camera_lock.acquire(blocking=False)
+        camera.camera_lock.release()
+        photos = [photo.result(timeout=5) for photo in pending]
+    finally:
+        camera.close()
+    assert photos[0].path.endswith(f"_burst{sharpest + 1:02d}.jpg")
+    assert all(photo.data == backend.jpeg_sample for photo in photos)
+
+
+def test_only_frames_that_make_the_cut_are_converted(burst):
+    frames, sharpest = burst
+    selector = SharpestFrames(1, 1)
+    converted, dropped = [], []
+    for index, frame in enumerate(frames):
+        item = selector.add(frame, lambda _: converted.append(index) or index)
+        if item is not None:
+            dropped.append(item)
+    assert [item for _, _, item in selector.best()] == [sharpest]
+    assert sorted(dropped + [sharpest]) == converted
+    assert max(converted) == sharpest
@@ -0,0 +1,31 @@
+import shutil
+
+import pytest
+
+from synthetic_media import sample_jpeg
+from timelapse import TimelapseEncoder
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg is not installed")
+
+
+@needs_ffmpeg
+def test_frames_are_encoded_into_an_mp4(tmp_path):
+    encoder = TimelapseEncoder(tmp_path / 'timelapse.mp4', 10, framerate=10, codec='libx264')
+    jpeg = sample_jpeg((64, 48))
+    for _ in range(10):
+        encoder.add_frame(jpeg)
+    path = encoder.finish()
+    assert path == tmp_path / 'timelapse.mp4'
+    assert path.stat().st_size > 0
+    assert [file.name for file in tmp_path.iterdir()] == ['timelapse.mp4']
+
+
+@needs_ffmpeg
+def test_ffmpeg_errors_are_reported(tmp_path):
+    encoder = TimelapseEncoder(tmp_path / 'timelapse.mp4', 10, framerate=10, codec='no-such-codec')
+    with pytest.raises(RuntimeError, match="ffmpeg failed: .+"):
+        for _ in range(1000):
+            encoder.add_frame(b'not a jpeg' * 1000)
+        encoder.finish()
+    encoder.abort()
+    assert list(tmp_path.iterdir()) == []
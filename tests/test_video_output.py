@@ -0,0 +1,79 @@
+import shutil
+import struct
+from pathlib import Path
+
+import pytest
+
+from camera_backend import FakeCameraBackend
+from camera_handler import CameraHandler
+from config import VIDEO_MIN_BITRATE, VIDEO_MAX_BITRATE
+from video_output import mux_h264, target_bitrate, video_reply_kwargs
+
+# 2 s of 320x240 test pattern at 10 fps, as raw H.264 like the camera records
+SAMPLE_H264 = Path(__file__).parent / 'data' / 'sample.h264'
+
+needs_ffmpeg = pytest.mark.skipif(
+    shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None, reason="ffmpeg and ffprobe are not installed"
+)
+
+
+def _top_level_atoms(path) -> list:
+    atoms = []
+    with open(path, 'rb') as mp4:
+        while header := mp4.read(8):
+            size, kind = struct.unpack('>I4s', header)
+            if size == 1:
+                size = struct.unpack('>Q', mp4.read(8))[0] - 8
+            atoms.append(kind.decode())
+            mp4.seek(size - 8, 1)
+    return atoms
+
+
+def _assert_faststart(path):
+    atoms = _top_level_atoms(path)
+    assert 'moov' in atoms and 'mdat' in atoms
+    assert atoms.index('moov') < atoms.index('mdat')
+
+
+def test_target_bitrate_is_clamped():
+    assert target_bitrate(1, target_bytes=100 * 1024 * 1024) == VIDEO_MAX_BITRATE
+    assert target_bitrate(3600, target_bytes=1024 * 1024) == VIDEO_MIN_BITRATE
+    bitrate = target_bitrate(10, target_bytes=8 * 1024 * 1024)
+    assert VIDEO_MIN_BITRATE < bitrate < VIDEO_MAX_BITRATE
+    assert bitrate * 10 / 8 <= 8 * 1024 * 1024
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize('from_memory', [False, True])
+def test_mux_puts_the_moov_atom_first(tmp_path, from_memory):
+    output = tmp_path / 'sample.mp4'
+    mux_h264(SAMPLE_H264.read_bytes() if from_memory else SAMPLE_H264, output, 10)
+    _assert_faststart(output)
+    assert not list(tmp_path.glob('.*.tmp'))
+
+
+@needs_ffmpeg
+def test_video_reply_kwargs(tmp_path):
+    output = tmp_path / 'sample.mp4'
+    mux_h264(SAMPLE_H264, output, 10)
+    kwargs = video_reply_kwargs(output)
+    assert (kwargs['duration'], kwargs['width'], kwargs['height']) == (2, 320, 240)
+    assert kwargs['thumbnail'].startswith(b'\xff\xd8')
+    assert kwargs['supports_streaming'] is True
+
+
+def test_video_reply_kwargs_of_an_unreadable_file(tmp_path):
+    broken = tmp_path / 'broken.mp4'
+    broken.write_bytes(b'not a video')
+    assert video_reply_kwargs(broken) == {}
+
+
+@needs_ffmpeg
+def test_record_video_with_a_sample_stream():
+    camera = CameraHandler(backend=FakeCameraBackend(h264_sample=str(SAMPLE_H264)))
+    try:
+        path = camera.record_video(0)
+    finally:
+        camera.close()
+    _assert_faststart(path)
+    assert not list(Path(path).parent.glob('.*.h264'))
@@ -0,0 +1,153 @@
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from config import (
+    TIMELAPSE_DIR, TIMELAPSE_INTERVAL, TIMELAPSE_FRAMERATE, TIMELAPSE_CODEC, FILE_DATE_FORMAT
+)
+from metrics import span
+from video_output import target_bitrate
+
+logger = logging.getLogger(__name__)
+
+
+class TimelapseEncoder:
+    """ffmpeg process encoding JPEG frames into an MP4 as they are written.
+
+    Frames go straight to ffmpeg's stdin, so neither the frames nor the
+    video so far are held in memory. The video is written next to path and
+    only moved into place by finish().
+    """
+
+    def __init__(self, path, frames: int, framerate: float = TIMELAPSE_FRAMERATE, codec: str = TIMELAPSE_CODEC):
+        self.path = Path(path)
+        self.frames = 0
+        self._tmp_path = self.path.with_name(f".{self.path.name}.part")
+        bitrate = target_bitrate(frames / framerate)
+        # A file rather than a pipe, which ffmpeg would block on once full during a long run
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'image2pipe', '-c:v', 'mjpeg',
+             '-framerate', str(framerate), '-i', '-',
+             '-c:v', codec, '-b:v', str(bitrate), '-pix_fmt', 'yuv420p',
+             '-movflags', '+faststart', '-f', 'mp4', str(self._tmp_path)],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr
+        )
+
+    def add_frame(self, jpeg: bytes):
+        """Encode one frame; blocks only while ffmpeg's input pipe is full."""
+        try:
+            self._process.stdin.write(jpeg)
+        except BrokenPipeError:
+            self._process.wait()
+            raise RuntimeError(f"ffmpeg failed: {self._errors()}")
+        self.frames += 1
+
+    def _errors(self) -> str:
+        """What ffmpeg wrote to stderr so far."""
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace').strip()
+
+    def finish(self) -> Path:
+        """Flush the encoder and move the finished video to path."""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            if self._process.wait() != 0:
+                self._tmp_path.unlink(missing_ok=True)
+                raise RuntimeError(f"ffmpeg failed: {self._errors()}")
+        finally:
+            self._stderr.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Stop ffmpeg and delete the partial video."""
+        self._process.kill()
+        self._process.wait()
+        self._stderr.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class Timelapse:
+    """Captures a frame every interval seconds on a background thread until frames are taken.
+
+    Each capture holds the camera only for a single frame, so photo and
+    video requests run in between. A frame is skipped if the camera stays
+    busy for half the interval. done resolves to the path of the video, or
+    None if no frame was captured.
+    """
+
+    def __init__(self, camera, file_manager, frames: int, interval: float = TIMELAPSE_INTERVAL,
+                 framerate: float = TIMELAPSE_FRAMERATE):
+        self.camera = camera
+        self.file_manager = file_manager
+        self.frames = frames
+        self.interval = interval
+        self.framerate = framerate
+        self.skipped = 0
+        self.started_at = None
+        self.done = Future()
+        timestamp = datetime.now().strftime(FILE_DATE_FORMAT)
+        self.path = TIMELAPSE_DIR / f"{timestamp}_timelapse.mp4"
+        self._encoder = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="timelapse", daemon=True)
+
+    @property
+    def captured(self) -> int:
+        return self._encoder.frames if self._encoder is not None else 0
+
+    @property
+    def remaining_seconds(self) -> float:
+        return max(0.0, (self.frames - self.captured - self.skipped) * self.interval)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread.start()
+        logger.info(f"Timelapse started: {self.frames} frames every {self.interval}s")
+
+    def stop(self):
+        """End the timelapse early; the frames taken so far are still encoded."""
+        self._stop.set()
+
+    def _run(self):
+        try:
+            self.done.set_result(self._capture())
+        except Exception as e:
+            logger.error(f"Timelapse failed: {e}", exc_info=True)
+            if self._encoder is not None:
+                self._encoder.abort()
+            self.done.set_exception(e)
+
+    def _capture(self):
+        self._encoder = TimelapseEncoder(self.path, self.frames, self.framerate)
+        next_frame = time.monotonic()
+        while self.captured + self.skipped < self.frames:
+            if self._stop.wait(max(0.0, next_frame - time.monotonic())):
+                break
+            next_frame += self.interval
+            jpeg = self.camera.capture_frame(timeout=self.interval / 2)
+            if jpeg is None:
+                self.skipped += 1
+                logger.warning("Camera busy, skipped a timelapse frame")
+                continue
+            with span('timelapse_encode'):
+                self._encoder.add_frame(jpeg)
+
+        if not self.captured:
+            self._encoder.abort()
+            return None
+        with span('timelapse_finish'):
+            path = self._encoder.finish()
+        self.file_manager.add_file(path)
+        self.file_manager.request_cleanup()
+        logger.info(f"Timelapse saved: {path} ({self.captured} frames, {self.skipped} skipped)")
+        return path
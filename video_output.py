@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import subprocess
+from pathlib import Path
+from config import (
+    VIDEO_TARGET_BYTES, VIDEO_MIN_BITRATE, VIDEO_MAX_BITRATE, THUMBNAIL_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Share of the target size left for the MP4 container and bitrate overshoot
+_CONTAINER_OVERHEAD = 0.05
+
+
+def target_bitrate(duration: float, target_bytes: int = VIDEO_TARGET_BYTES) -> int:
+    """Encoder bitrate in bits per second so that a clip of duration seconds fits target_bytes."""
+    bitrate = int(target_bytes * 8 * (1 - _CONTAINER_OVERHEAD) / max(duration, 1))
+    return max(VIDEO_MIN_BITRATE, min(VIDEO_MAX_BITRATE, bitrate))
+
+
+def _run(command: list, stdin: bytes = None) -> bytes:
+    result = subprocess.run(command, input=stdin, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{command[0]} failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def mux_h264(source, path, framerate: float):
+    """Mux a raw H.264 stream into an MP4 with the moov atom first, without re-encoding.
+
+    source is either the stream itself (bytes) or the path of a .h264 file.
+    With the index at the start Telegram clients can play the video while it
+    is still downloading.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    from_memory = isinstance(source, (bytes, bytearray))
+    try:
+        _run(
+            ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'h264', '-framerate', str(framerate),
+             '-i', '-' if from_memory else str(source),
+             '-c', 'copy', '-movflags', '+faststart', '-f', 'mp4', str(tmp_path)],
+            stdin=source if from_memory else None
+        )
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    logger.debug(f"Muxed {path}")
+
+
+def probe(path) -> dict:
+    """Return duration (whole seconds), width and height of a video."""
+    output = _run([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height:format=duration', '-of', 'json', str(path)
+    ])
+    info = json.loads(output)
+    stream = info['streams'][0]
+    return {
+        'duration': round(float(info['format']['duration'])),
+        'width': stream['width'],
+        'height': stream['height'],
+    }
+
+
+def extract_thumbnail(path, size: tuple = THUMBNAIL_SIZE) -> bytes:
+    """Return the first frame of a video as a JPEG fitting size."""
+    width, height = size
+    return _run([
+        'ffmpeg', '-loglevel', 'error', '-i', str(path), '-frames:v', '1',
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+        '-f', 'image2pipe', '-c:v', 'mjpeg', '-'
+    ])
+
+
+def video_reply_kwargs(path) -> dict:
+    """Keyword arguments for reply_video describing the video at path.
+
+    Returns an empty dict if the video cannot be probed, so sending still works.
+    """
+    try:
+        kwargs = probe(path)
+        kwargs['thumbnail'] = extract_thumbnail(path)
+    except Exception as e:
+        logger.warning(f"Could not read video metadata of {path}: {e}")
+        return {}
+    kwargs['supports_streaming'] = True
+    return kwargs